@@ -3,6 +3,7 @@ from app.schemas.auth_dto import *
 from app.services import auth_service
 from app.core.response import success, fail
 from app.core.otp_limiter import increment_otp_attempt, reset_otp_attempts
+from app.services.session_service import device_info
 
 async def register_controller(payload: RegisterDTO, response: Response):
     try:
@@ -23,9 +24,9 @@ async def verify_otp_controller(payload: OTPVerifyDTO, response: Response):
     except ValueError as e:
         fail(str(e), 400)
 
-async def login_controller(data: LoginDTO, response: Response):
+async def login_controller(data: LoginDTO, request: Request, response: Response):
     try:
-        token_dto, user_info = await auth_service.login_user(data)  # NHẬN 2 GIÁ TRỊ
+        token_dto, user_info = await auth_service.login_user(data, device_info(request))  # NHẬN 2 GIÁ TRỊ
         response.set_cookie(
             key="refreshToken",
             value=token_dto.refreshToken,
@@ -68,16 +69,32 @@ async def forgot_password_controller(payload: ForgotPasswordDTO):
         fail(str(e), 404)
 
 async def reset_password_controller(payload: ResetPasswordDTO):
+    is_locked, msg = increment_otp_attempt(payload.email)
+    if is_locked:
+        fail(msg, 429)
+
     try:
         result = await auth_service.reset_password(payload)
+        reset_otp_attempts(payload.email)
         return success({"message": result["message"]})
     except ValueError as e:
         fail(str(e), 400)
 
-async def logout_controller(user_payload, response: Response):
+async def logout_controller(user_payload, request: Request, response: Response):
     try:
-        result = await auth_service.logout_user(user_payload)
+        result = await auth_service.logout_user(user_payload, request.cookies.get("refreshToken"))
         response.delete_cookie(key="refreshToken")
         return success({"message": result["message"]})
     except ValueError as e:
-        fail(str(e), 400)
\ No newline at end of file
+        fail(str(e), 400)
+
+async def list_sessions_controller(user_payload):
+    result = await auth_service.list_sessions(user_payload)
+    return success({"sessions": result})
+
+async def revoke_session_controller(session_id: str, user_payload):
+    try:
+        result = await auth_service.revoke_session(user_payload, session_id)
+        return success({"message": result["message"]})
+    except ValueError as e:
+        fail(str(e), 404)
@@ -0,0 +1,107 @@
+# app/core/circuit_breaker.py
+import logging
+import threading
+import time
+from typing import Callable, Dict, Tuple, Type
+
+log = logging.getLogger(__name__)
+
+# Breaker cho từng dependency (redis, mongo):
+#   closed    → gọi bình thường, đếm lỗi kết nối liên tiếp
+#   open      → sau FAILURE_THRESHOLD lỗi liên tiếp: không gọi nữa, đi thẳng đường fallback
+#   half_open → hết RESET_TIMEOUT: cho đúng 1 lời gọi thử; thành công → closed, lỗi → open lại
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 10.0
+
+
+breakers: Dict[str, "CircuitBreaker"] = {}
+
+
+class CircuitOpenError(Exception):
+    """Breaker đang open: lời gọi bị chặn ngay, không chờ timeout"""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self.opened_count = 0
+        self.rejected = 0
+        # Listener của pymongo chạy trên thread khác event loop
+        self._lock = threading.Lock()
+        breakers[name] = self
+
+    def available(self) -> bool:
+        """Có nên thử gọi không (không chiếm lượt probe)"""
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == OPEN:
+            return now - self.opened_at >= self.reset_timeout
+        # Probe treo quá lâu (request không chạm tới dependency) → cho probe mới
+        return now - self.probe_started_at >= self.reset_timeout
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if not self.available():
+                self.rejected += 1
+                return False
+            if self.state == OPEN:
+                log.info(f"[CIRCUIT] {self.name} half-open, probing")
+            self.state = HALF_OPEN
+            self.probe_started_at = time.monotonic()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                log.info(f"[CIRCUIT] {self.name} closed")
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                log.error(f"[CIRCUIT] {self.name} open after {self.failures} consecutive failures")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.opened_count += 1
+
+    def call(self, fn: Callable, *args, failure_types: Tuple[Type[BaseException], ...] = (OSError,), **kwargs):
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit open")
+        try:
+            result = fn(*args, **kwargs)
+        except failure_types:
+            self.record_failure()
+            raise
+        except Exception:
+            # Lỗi của chính lệnh (sai kiểu, NOSCRIPT...) → dependency vẫn sống
+            self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    def retry_after(self) -> int:
+        return max(int(self.reset_timeout - (time.monotonic() - self.opened_at)) + 1, 1)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutiveFailures": self.failures,
+            "openedCount": self.opened_count,
+            "rejected": self.rejected
+        }
+
+
+def breaker_stats() -> Dict[str, dict]:
+    return {name: breaker.stats() for name, breaker in breakers.items()}
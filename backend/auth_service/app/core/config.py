@@ -21,9 +21,16 @@ class Settings(BaseSettings):
     # --- CẤU HÌNH EMAIL MỚI ---
     SMTP_SERVER: str = Field(..., env="SMTP_SERVER", description="SMTP Hostname") # Required
     SMTP_PORT: int = Field(default=587, env="SMTP_PORT")
-    SMTP_USER: str = Field(..., env="SMTP_USER", description="SMTP Username")     # Required
-    SMTP_PASSWORD: str = Field(..., env="SMTP_PASSWORD", description="SMTP Password/App Key") # Required
+    SMTP_USER: str = Field(default="", env="SMTP_USER", description="SMTP Username (empty = no login)")
+    SMTP_PASSWORD: str = Field(default="", env="SMTP_PASSWORD", description="SMTP Password/App Key")
+    SMTP_START_TLS: bool = Field(default=True, env="SMTP_START_TLS")
+    # Outbox: số connection SMTP giữ mở / worker, số email tối đa mỗi lần đọc stream
+    SMTP_POOL_SIZE: int = Field(default=2, env="SMTP_POOL_SIZE")
+    EMAIL_BATCH_SIZE: int = Field(default=20, env="EMAIL_BATCH_SIZE")
     REDIS_URL: str = Field(..., env="REDIS_URL")
+    # Thread pool hash password: số worker (mặc định = số core) + số job tối đa đang chờ/chạy, vượt → 503
+    HASH_POOL_WORKERS: int = Field(default=os.cpu_count() or 1, env="HASH_POOL_WORKERS")
+    HASH_POOL_MAX_PENDING: int = Field(default=64, env="HASH_POOL_MAX_PENDING")
     EMAIL_FROM: EmailStr = Field(..., env="EMAIL_FROM", description="Email address used as sender (e.g., no-reply@example.com)") # Required
     EMAIL_FROM_NAME: str = Field(default="Auth Service", env="EMAIL_FROM_NAME", description="Display name for sender")
     # --- END CẤU HÌNH EMAIL MỚI ---
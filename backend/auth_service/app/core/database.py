@@ -1,7 +1,74 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.circuit_breaker import CircuitBreaker
+from pymongo import monitoring, IndexModel, ASCENDING, DESCENDING
 from app.core.config import settings
+import logging
+
+log = logging.getLogger(__name__)
 
 print(f"=== Connecting to MongoDB: {settings.MONGO_URI} ===")
-client = AsyncIOMotorClient(settings.MONGO_URI)
+
+# Circuit breaker cho Mongo: lỗi kết nối / timeout (command event có errtype, heartbeat fail)
+# → failure; command thành công → success. MongoGuardMiddleware chặn request khi breaker open.
+# serverSelectionTimeoutMS mặc định 30s → hạ xuống để request không treo nửa phút khi Mongo rớt.
+MONGO_SERVER_SELECTION_TIMEOUT_MS = 5000
+_CONNECTION_ERRORS = {"AutoReconnect", "NetworkTimeout", "ConnectionFailure", "WaitQueueTimeoutError"}
+mongo_breaker = CircuitBreaker("mongo")
+
+
+class _BreakerCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_breaker.record_success()
+
+    def failed(self, event):
+        if event.failure.get("errtype") in _CONNECTION_ERRORS:
+            mongo_breaker.record_failure()
+
+
+class _BreakerHeartbeatListener(monitoring.ServerHeartbeatListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        mongo_breaker.record_failure()
+
+
+client = AsyncIOMotorClient(
+    settings.MONGO_URI,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    event_listeners=[_BreakerCommandListener(), _BreakerHeartbeatListener()]
+)
 db = client[settings.DATABASE_NAME]
 users_collection = db.get_collection("users")
+sessions_collection = db.get_collection("sessions")
+
+# Index cho các query nóng của service (idempotent, chạy lúc startup)
+# Partial: user cũ chưa backfill (backfill_identity_keys.py) không có key → không đụng unique
+USER_INDEXES = [
+    IndexModel([("emailKey", ASCENDING)], unique=True, partialFilterExpression={"emailKey": {"$type": "string"}}),
+    IndexModel([("usernameKey", ASCENDING)], unique=True, partialFilterExpression={"usernameKey": {"$type": "string"}}),
+]
+SESSION_INDEXES = [
+    # Refresh token chỉ lưu dạng sha256 → lookup / rotate 1 seek
+    IndexModel([("tokenHash", ASCENDING)], unique=True),
+    IndexModel([("userId", ASCENDING), ("lastUsedAt", DESCENDING)]),
+    # TTL: Mongo tự xoá session hết hạn
+    IndexModel([("expiresAt", ASCENDING)], expireAfterSeconds=0),
+]
+
+async def ensure_indexes():
+    """Create the indexes the service queries rely on"""
+    for collection, indexes in (
+        (users_collection, USER_INDEXES),
+        (sessions_collection, SESSION_INDEXES),
+    ):
+        try:
+            await collection.create_indexes(indexes)
+        except Exception as e:
+            log.error(f"[DB] Failed to create indexes on {collection.name}: {e}")
@@ -1,23 +1,70 @@
-from datetime import datetime, timedelta
-from typing import Dict
+import logging
+import time
+import uuid
+
+import redis
+from app.core.token_blacklist import redis_client
+
+log = logging.getLogger(__name__)
+
+# Sliding window trong Redis (dùng chung mọi worker): tối đa MAX_ATTEMPTS lần nhập OTP
+# trong WINDOW_SECONDS, vượt → khoá LOCK_SECONDS. Key tự hết hạn, không cần dọn.
+MAX_ATTEMPTS = 5
+WINDOW_SECONDS = 15 * 60
+LOCK_SECONDS = 15 * 60
+ATTEMPTS_KEY = "otp_attempts:{}"
+LOCK_KEY = "otp_lock:{}"
+
+# 1 round trip / lần check: xem lock, bỏ attempt ngoài window, ghi attempt mới, đếm
+# Trả về 0 = cho qua, > 0 = đang bị khoá (số giây còn lại)
+_ATTEMPT_LUA = """
+local locked = redis.call('TTL', KEYS[2])
+if locked > 0 then
+    return locked
+end
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+redis.call('ZADD', KEYS[1], now, ARGV[3])
+redis.call('PEXPIRE', KEYS[1], window)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[4]) then
+    redis.call('DEL', KEYS[1])
+    redis.call('SET', KEYS[2], 1, 'EX', ARGV[5])
+    return tonumber(ARGV[5])
+end
+return 0
+"""
+_attempt_script = redis_client.register_script(_ATTEMPT_LUA) if redis_client else None
+
+
+def _email_key(email: str) -> str:
+    return email.strip().lower()
 
-_OTP_ATTEMPTS: Dict[str, dict] = {}
 
 def increment_otp_attempt(email: str):
-    now = datetime.utcnow()
-    record = _OTP_ATTEMPTS.get(email, {"attempts": 0, "locked_until": None})
-
-    if record["locked_until"] and now > record["locked_until"]:
-        record = {"attempts": 0, "locked_until": None}
-
-    record["attempts"] += 1
-    if record["attempts"] >= 5:
-        record["locked_until"] = now + timedelta(minutes=15)
-        _OTP_ATTEMPTS[email] = record
-        return True, "Too many OTP attempts. Account locked for 15 minutes."
-    
-    _OTP_ATTEMPTS[email] = record
+    if not _attempt_script:
+        return False, None
+    email = _email_key(email)
+    try:
+        locked_for = _attempt_script(
+            keys=[ATTEMPTS_KEY.format(email), LOCK_KEY.format(email)],
+            args=[int(time.time() * 1000), WINDOW_SECONDS * 1000, uuid.uuid4().hex, MAX_ATTEMPTS, LOCK_SECONDS]
+        )
+    except redis.RedisError as e:
+        # Redis lỗi thì không chặn người dùng, rate limit theo IP vẫn còn
+        log.warning(f"[OTP_LIMITER] Redis error, skipping check: {e}")
+        return False, None
+
+    if locked_for:
+        minutes = (int(locked_for) + 59) // 60
+        return True, f"Too many OTP attempts. Account locked for {minutes} minutes."
     return False, None
 
+
 def reset_otp_attempts(email: str):
-    _OTP_ATTEMPTS.pop(email, None)
\ No newline at end of file
+    if not redis_client:
+        return
+    try:
+        redis_client.delete(ATTEMPTS_KEY.format(_email_key(email)))
+    except redis.RedisError as e:
+        log.warning(f"[OTP_LIMITER] Redis error on reset: {e}")
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+from typing import Tuple
+
+from fastapi import HTTPException
+from app.core.token_blacklist import redis_client
+from app.utils.security import generate_otp
+
+# OTP lưu trong Redis theo (purpose, email), TTL native → không ghi gì vào users,
+# không cần mã unique toàn hệ thống (mỗi email chỉ có 1 mã / purpose, mã mới ghi đè mã cũ).
+OTP_KEY = "otp:{}:{}"
+OTP_TTL_SECONDS = 5 * 60
+PURPOSE_VERIFY = "verify"
+PURPOSE_RESET = "reset"
+
+# Kết quả consume_otp
+OTP_OK = "ok"
+OTP_INVALID = "invalid"
+OTP_EXPIRED = "expired"
+
+# So khớp + xoá trong 1 lệnh atomic: 2 request cùng mã thì chỉ 1 request dùng được
+_CONSUME_LUA = """
+local value = redis.call('GET', KEYS[1])
+if not value then
+    return -1
+end
+if value ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+return 1
+"""
+_consume_script = redis_client.register_script(_CONSUME_LUA) if redis_client else None
+
+
+def _key(purpose: str, email: str) -> str:
+    return OTP_KEY.format(purpose, email.strip().lower())
+
+
+def _require_redis():
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="OTP service unavailable")
+
+
+def issue_otp(purpose: str, email: str, ttl: int = OTP_TTL_SECONDS) -> Tuple[str, datetime]:
+    """Sinh mã mới cho (purpose, email), thay mã cũ nếu có. Trả về (mã, thời điểm hết hạn)"""
+    _require_redis()
+    code = generate_otp()
+    redis_client.set(_key(purpose, email), code, ex=ttl)
+    return code, datetime.utcnow() + timedelta(seconds=ttl)
+
+
+def consume_otp(purpose: str, email: str, code: str) -> str:
+    """OTP_OK (mã đúng, đã xoá) | OTP_INVALID (sai mã, giữ nguyên) | OTP_EXPIRED (hết hạn / chưa cấp)"""
+    _require_redis()
+    result = _consume_script(keys=[_key(purpose, email)], args=[code.strip()])
+    if result == 1:
+        return OTP_OK
+    return OTP_INVALID if result == 0 else OTP_EXPIRED
@@ -2,11 +2,17 @@ from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes.auth_routes import router as auth_router
-from app.core.database import db, users_collection  # import db
+from app.core.database import db, users_collection, ensure_indexes, mongo_breaker  # import db
+from app.core.circuit_breaker import breaker_stats
+from app.middlewares.dependency_guard import MongoGuardMiddleware
+from app.core.health import prober
 from app.core.limiter import limiter
+from app.utils.security import hash_pool
+from app.services.email_outbox import email_outbox
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 import asyncio
+from app.core.token_blacklist import revocations, ping_redis
 
 app = FastAPI(title="Auth Service")
 
@@ -16,6 +22,9 @@ app.state.limiter = limiter
 # Add SlowAPI middleware first
 app.add_middleware(SlowAPIMiddleware)
 
+# Mongo breaker open → 503 ngay (trong CORS để response vẫn có header CORS)
+app.add_middleware(MongoGuardMiddleware, breaker=mongo_breaker)
+
 # CORS Configuration - must be added LAST (executed FIRST in request chain)
 app.add_middleware(
     CORSMiddleware,
@@ -45,6 +54,23 @@ async def rate_limit_handler(request, exc):
 
 app.include_router(auth_router)
 
+@app.on_event("startup")
+async def startup():
+    # /readyz đọc kết quả probe, không ping dependency trên request path
+    prober.register("mongo", lambda: db.command("ping"))
+    prober.register("redis", ping_redis, required=False)
+    prober.start()
+    await ensure_indexes()
+    revocations.start()
+    email_outbox.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await prober.stop()
+    await revocations.stop()
+    await email_outbox.stop()
+    hash_pool.shutdown()
+
 @app.get("/health")
 @limiter.limit("5/minute")
 async def health_check(request: Request):
@@ -59,7 +85,21 @@ async def health_check(request: Request):
             "status": "healthy",
             "message": "MongoDB connected!",
             "sample_doc_exists": sample_doc is not None,
-            "collections": collection_list
+            "collections": collection_list,
+            "passwordHashing": hash_pool.stats(),
+            "emailOutbox": email_outbox.stats(),
+            "circuitBreakers": breaker_stats()
         }
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Database connection failed: {str(e)}")
+
+@app.get("/livez")
+async def livez():
+    # Chỉ xác nhận process + event loop còn phục vụ request, không chạm dependency
+    return {"status": "ok", "service": "auth_service"}
+
+@app.get("/readyz")
+async def readyz():
+    ready, report = prober.readiness()
+    report["circuitBreakers"] = breaker_stats()
+    return JSONResponse(status_code=200 if ready else 503, content=report)
@@ -23,7 +23,7 @@ async def verify_otp(payload: OTPVerifyDTO, request: Request, response: Response
 @router.post("/login")
 @limiter.limit("10/5minutes")
 async def login(payload: LoginDTO, request: Request, response: Response):
-    return await auth_controller.login_controller(payload, response)
+    return await auth_controller.login_controller(payload, request, response)
 
 @router.post("/refresh")
 async def refresh(request: Request, response: Response):
@@ -41,5 +41,13 @@ async def reset_password(payload: ResetPasswordDTO):
     return await auth_controller.reset_password_controller(payload)
 
 @router.post("/logout")
-async def logout(response: Response, user=Depends(verify_token)):
-    return await auth_controller.logout_controller(user, response)
+async def logout(request: Request, response: Response, user=Depends(verify_token)):
+    return await auth_controller.logout_controller(user, request, response)
+
+@router.get("/sessions")
+async def list_sessions(user=Depends(verify_token)):
+    return await auth_controller.list_sessions_controller(user)
+
+@router.delete("/sessions/{session_id}")
+async def revoke_session(session_id: str, user=Depends(verify_token)):
+    return await auth_controller.revoke_session_controller(session_id, user)
@@ -21,6 +21,7 @@ class ForgotPasswordDTO(BaseModel):
     email: EmailStr
 
 class ResetPasswordDTO(BaseModel):
+    email: EmailStr
     token: str
     newPassword: str
 
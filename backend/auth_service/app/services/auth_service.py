@@ -1,14 +1,16 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from bson import ObjectId
 from app.core.database import users_collection
 from app.schemas.auth_dto import (
     RegisterDTO, OTPVerifyDTO, LoginDTO, RefreshTokenDTO,
     ForgotPasswordDTO, ResetPasswordDTO, TokenDTO
 )
-from app.utils.email_sender import send_email
+from app.services.email_outbox import enqueue_email
 from app.utils.security import (
-    hash_password, verify_password, validate_password,
-    generate_otp
+    hash_password_async, verify_password_async, validate_password
+)
+from app.core.otp_store import (
+    issue_otp, consume_otp, OTP_OK, OTP_EXPIRED, PURPOSE_VERIFY, PURPOSE_RESET
 )
 from app.middlewares.jwt_middleware import (
     create_access_token, create_refresh_token, create_reset_token
@@ -16,33 +18,32 @@ from app.middlewares.jwt_middleware import (
 from app.core.config import settings
 from fastapi import HTTPException, status
 from app.core.token_blacklist import add_to_blacklist
+from app.services import session_service
 from jose import jwt
+from pymongo.errors import DuplicateKeyError
 # ========== REGISTER ==========
 async def register_user(data: RegisterDTO):
-    # Check for duplicate email/username
-    if await users_collection.find_one({"email": data.email}):
-        raise ValueError("Email already taken")
-    if await users_collection.find_one({"username": data.username}):
-        raise ValueError("Username already taken")
+    # Email / username trùng do unique index emailKey / usernameKey chặn lúc insert
+    if "@" in data.username:
+        raise ValueError("Username cannot contain @")
     if not validate_password(data.password):
         raise ValueError("Weak password: must have uppercase, number, special char")
-    otp_code = await _generate_unique_otp()
-    otp_expires = datetime.utcnow() + timedelta(minutes=5)
     now = datetime.utcnow()
+    password_hash = await hash_password_async(data.password)
 
     # Create user document with defaults
     user_doc = {
         "email": data.email,
         "username": data.username,
-        "passwordHash": hash_password(data.password),
+        "emailKey": identity_key(data.email),
+        "usernameKey": identity_key(data.username),
+        "passwordHash": password_hash,
         "fullName": data.username,           # default fullName = username
         "displayName": data.displayName,
         "avatar": None,                       # default avatar None
         "role": "user",
         "language": "en",
         "isVerified": False,
-        "otpCode": otp_code,
-        "otpExpiresAt": otp_expires,
         "resetPasswordToken": None,
         "resetPasswordExpiresAt": None,
         "isPremium": False,
@@ -67,7 +68,19 @@ async def register_user(data: RegisterDTO):
         "updatedAt": now
     }
 
-    result = await users_collection.insert_one(user_doc)
+    try:
+        result = await users_collection.insert_one(user_doc)
+    except DuplicateKeyError as e:
+        if "emailKey" in ((e.details or {}).get("keyPattern") or {}):
+            raise ValueError("Email already taken")
+        raise ValueError("Username already taken")
+    # Redis lỗi / breaker open → không để lại account chưa verify mà không có OTP
+    # (đăng ký lại sẽ báo "Email already taken" và không có cách lấy OTP mới)
+    try:
+        otp_code, otp_expires = issue_otp(PURPOSE_VERIFY, data.email)
+    except Exception:
+        await users_collection.delete_one({"_id": result.inserted_id})
+        raise
 
     # Send OTP email
     html = f"""
@@ -77,7 +90,7 @@ async def register_user(data: RegisterDTO):
         <p>This code will expire in 5 minutes.</p>
         <p>If you didn't request this, please ignore this email.</p>
     """
-    await send_email(data.email, "Verify Your Account - GENZMOBO", html)
+    await enqueue_email(data.email, "Verify Your Account - GENZMOBO", html, expires_at=otp_expires)
 
     return {
         "userId": str(result.inserted_id),
@@ -87,42 +100,41 @@ async def register_user(data: RegisterDTO):
 
 # ========== VERIFY OTP ==========
 async def verify_otp(data: OTPVerifyDTO):
-    user = await users_collection.find_one({"email": data.email})
+    user = await users_collection.find_one({"emailKey": identity_key(data.email)}, {"isVerified": 1})
     if not user:
         raise ValueError("User not found")
     if user["isVerified"]:
         raise ValueError("Already verified")
-    if user["otpCode"] != data.otp:
-        raise ValueError("Invalid OTP")
-    if datetime.utcnow() > user["otpExpiresAt"]:
-        raise ValueError("OTP expired")
+    result = consume_otp(PURPOSE_VERIFY, data.email, data.otp)
+    if result != OTP_OK:
+        raise ValueError("OTP expired" if result == OTP_EXPIRED else "Invalid OTP")
 
     await users_collection.update_one(
         {"_id": user["_id"]},
-        {"$set": {"isVerified": True, "otpCode": None, "otpExpiresAt": None}}
+        {"$set": {"isVerified": True, "updatedAt": datetime.utcnow()}}
     )
 
     return {"message": "Email verified successfully"}
 
 
 # ========== LOGIN ==========
-async def login_user(data: LoginDTO):
-    user = await users_collection.find_one({
-        "$or": [{"email": data.identifier}, {"username": data.identifier}]
-    })
-    if not user or not verify_password(data.password, user["passwordHash"]):
+async def login_user(data: LoginDTO, device: dict = None):
+    # Username không chứa @ → 1 index seek trên emailKey hoặc usernameKey
+    key = identity_key(data.identifier)
+    user = await users_collection.find_one({"emailKey" if "@" in key else "usernameKey": key})
+    if not user or not await verify_password_async(data.password, user["passwordHash"]):
         raise ValueError("Invalid credentials")
     if not user["isVerified"]:
         raise ValueError("Please verify your email first")
 
-    access_token, jti = create_access_token({"sub": str(user["_id"])})
+    access_token, jti = create_access_token({"sub": str(user["_id"]), **entitlement_claims(user)})
     refresh_token, refresh_jti = create_refresh_token({"sub": str(user["_id"])})
 
+    # 1 session / thiết bị → đăng nhập máy khác không đá máy này ra
+    await session_service.create_session(user["_id"], refresh_token, jti, device or {})
     await users_collection.update_one(
         {"_id": user["_id"]},
         {"$set": {
-            "refreshToken": refresh_token,
-            "currentTokenJti": jti,  # Save current jti
             "lastActivityAt": datetime.utcnow(),
             "updatedAt": datetime.utcnow()
         }}
@@ -142,22 +154,26 @@ async def login_user(data: LoginDTO):
 
 # ========== REFRESH TOKEN ==========
 async def refresh_token(refresh_token: str):
-    user = await users_collection.find_one({"refreshToken": refresh_token})
+    # sub lấy từ token chỉ để ký token mới; session (tokenHash) mới là nguồn xác thực
+    try:
+        user_id = jwt.get_unverified_claims(refresh_token)["sub"]
+    except Exception:
+        raise ValueError("Invalid or revoked refresh token")
+
+    # Claim premium đọc lại mỗi lần refresh → nâng cấp / hết hạn có hiệu lực trong tối đa 1 access token
+    user = await users_collection.find_one(
+        {"_id": ObjectId(user_id)} if ObjectId.is_valid(user_id) else {"_id": None}, ENTITLEMENT_PROJECTION
+    )
     if not user:
         raise ValueError("Invalid or revoked refresh token")
 
     # Create new tokens
-    access_token, access_jti = create_access_token({"sub": str(user["_id"])})
-    new_refresh_token, new_refresh_jti = create_refresh_token({"sub": str(user["_id"])})
+    access_token, access_jti = create_access_token({"sub": user_id, **entitlement_claims(user)})
+    new_refresh_token, new_refresh_jti = create_refresh_token({"sub": user_id})
 
-    await users_collection.update_one(
-        {"_id": user["_id"]},
-        {"$set": {
-            "refreshToken": new_refresh_token,
-            "currentTokenJti": access_jti,
-            "updatedAt": datetime.utcnow()
-        }}
-    )
+    session = await session_service.rotate_session(refresh_token, new_refresh_token, access_jti)
+    if not session or str(session["userId"]) != user_id:
+        raise ValueError("Invalid or revoked refresh token")
 
     return TokenDTO(accessToken=access_token, refreshToken=new_refresh_token)
 
@@ -172,13 +188,12 @@ def create_reset_token(data: dict):
     return token  # CHỈ TRẢ VỀ 1 GIÁ TRỊ
 # ========== FORGOT PASSWORD ==========
 async def forgot_password(data: ForgotPasswordDTO):
-    user = await users_collection.find_one({"email": data.email})
+    user = await users_collection.find_one({"emailKey": identity_key(data.email)}, {"_id": 1})
     if not user:
         raise ValueError("Email not registered")
 
-    # Generate OTP code (6 digits) instead of link
-    otp_code = await _generate_unique_otp()
-    otp_expires = datetime.utcnow() + timedelta(minutes=5)  # OTP valid for 5 minutes
+    # Generate OTP code (6 digits) instead of link, valid for 5 minutes
+    otp_code, otp_expires = issue_otp(PURPOSE_RESET, data.email)
 
     html = f"""
         <h2>Reset Password OTP</h2>
@@ -187,44 +202,30 @@ async def forgot_password(data: ForgotPasswordDTO):
         <p>This code will expire in 5 minutes.</p>
         <p>If you didn't request this, please ignore this email.</p>
     """
-    await send_email(data.email, "Password Reset OTP - GENZMOBO", html)
-
-    # Store OTP in database (reuse otpCode field)
-    await users_collection.update_one(
-        {"_id": user["_id"]},
-        {"$set": {
-            "otpCode": otp_code,
-            "otpExpiresAt": otp_expires,
-            "updatedAt": datetime.utcnow()
-        }}
-    )
+    await enqueue_email(data.email, "Password Reset OTP - GENZMOBO", html, expires_at=otp_expires)
 
     return {"message": "Password reset OTP sent to your email"}
 
 # ========== RESET PASSWORD ==========
 async def reset_password(data: ResetPasswordDTO):
-    # Changed: Verify OTP instead of reset token
-    user = await users_collection.find_one({"otpCode": data.token})
-    if not user:
-        raise ValueError("Invalid or expired OTP")
-
-    # Check if OTP expired
-    if user.get("otpExpiresAt") and datetime.utcnow() > user["otpExpiresAt"]:
-        raise ValueError("OTP has expired. Please request a new one")
-
+    # Check password first so a weak password doesn't burn the OTP
     if not validate_password(data.newPassword):
         raise ValueError("Weak password: must have uppercase, number, special char")
 
-    new_hash = hash_password(data.newPassword)
-    await users_collection.update_one(
-        {"_id": user["_id"]},
-        {"$set": {
-            "passwordHash": new_hash,
-            "otpCode": None,  # Clear OTP after use
-            "otpExpiresAt": None,
-            "updatedAt": datetime.utcnow()
-        }}
+    # Changed: Verify OTP (by email) instead of reset token, OTP is deleted on success
+    result = consume_otp(PURPOSE_RESET, data.email, data.token)
+    if result == OTP_EXPIRED:
+        raise ValueError("OTP has expired. Please request a new one")
+    if result != OTP_OK:
+        raise ValueError("Invalid or expired OTP")
+
+    new_hash = await hash_password_async(data.newPassword)
+    updated = await users_collection.update_one(
+        {"emailKey": identity_key(data.email)},
+        {"$set": {"passwordHash": new_hash, "updatedAt": datetime.utcnow()}}
     )
+    if not updated.matched_count:
+        raise ValueError("Email not registered")
 
     return {"message": "Password reset successful"}
 
@@ -232,30 +233,48 @@ async def reset_password(data: ResetPasswordDTO):
 # ========== LOGOUT ==========
 from app.core.token_blacklist import add_to_blacklist
 
-async def logout_user(user_payload: dict):
+async def logout_user(user_payload: dict, refresh_token: str = None):
     user_id = user_payload.get("sub")
     jti = user_payload.get("jti")  # Get jti from token
     if not user_id or not jti:
         raise ValueError("Invalid token payload")
 
-    # Blacklist access token (15 minutes)
-    add_to_blacklist(jti, settings.JWT_ACCESS_EXPIRE_MINUTES * 60)
+    # Blacklist access token (add_to_blacklist nhận số phút)
+    add_to_blacklist(jti, settings.JWT_ACCESS_EXPIRE_MINUTES)
 
-    # Remove refresh token
-    await users_collection.update_one(
-        {"_id": ObjectId(user_id)},
-        {
-            "$unset": {"refreshToken": "", "currentTokenJti": ""},
-            "$set": {"updatedAt": datetime.utcnow()}
-        }
-    )
+    # Remove only this device's session
+    if not refresh_token or not await session_service.revoke_by_token(refresh_token):
+        await session_service.revoke_by_access_jti(ObjectId(user_id), jti)
     return {"message": "Logged out successfully"}
 
 
+# ========== SESSIONS ==========
+async def list_sessions(user_payload: dict):
+    return await session_service.list_sessions(ObjectId(user_payload["sub"]), user_payload.get("jti"))
+
+
+async def revoke_session(user_payload: dict, session_id: str):
+    if not ObjectId.is_valid(session_id):
+        raise ValueError("Session not found")
+    if not await session_service.revoke_session(ObjectId(user_payload["sub"]), ObjectId(session_id)):
+        raise ValueError("Session not found")
+    return {"message": "Session revoked"}
+
+
 # ========== UTILITIES ==========
-async def _generate_unique_otp() -> str:
-    while True:
-        otp = generate_otp()
-        exists = await users_collection.find_one({"otpCode": otp})
-        if not exists:
-            return otp
+def identity_key(value: str) -> str:
+    """emailKey / usernameKey: dạng chuẩn hoá để so trùng + login không phân biệt hoa thường"""
+    return value.strip().lower()
+
+
+ENTITLEMENT_PROJECTION = {"isPremium": 1, "premiumExpiresAt": 1}
+
+
+def entitlement_claims(user: dict) -> dict:
+    """Claim premium trong access token: service khác check quyền mà không cần đọc users"""
+    expires_at = user.get("premiumExpiresAt")
+    active = bool(user.get("isPremium")) and (expires_at is None or expires_at > datetime.utcnow())
+    return {
+        "isPremium": active,
+        "premiumExpiresAt": expires_at.replace(tzinfo=timezone.utc).timestamp() if active and expires_at else None
+    }
@@ -0,0 +1,280 @@
+# app/services/email_outbox.py
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+import aiosmtplib
+import redis
+import redis.asyncio
+from app.core.config import settings
+from app.core.token_blacklist import redis_client
+from app.utils.email_sender import build_message, send_email, smtp_options
+
+log = logging.getLogger(__name__)
+
+# Handler chỉ XADD email vào Redis stream (1 round trip) rồi trả response;
+# EmailOutbox (mỗi worker 1 consumer trong cùng group) đọc theo batch, gửi qua
+# các connection SMTP giữ mở, lỗi tạm thời thì retry với backoff.
+# Email có expiresAt (OTP) → quá hạn thì vào dead letter thay vì gửi / retry mã đã chết.
+STREAM = "email_outbox"
+RETRY_KEY = "email_outbox:retry"    # ZSET payload JSON, score = thời điểm retry
+DEAD_STREAM = "email_outbox:dead"   # hết lượt retry / lỗi vĩnh viễn (5xx)
+GROUP = "email_sender"
+STREAM_MAXLEN = 100000
+BLOCK_MS = 2000
+CLAIM_IDLE_MS = 60000               # entry của consumer đã chết, chưa ack sau 60s → nhận lại
+CLAIM_INTERVAL = 30
+MAX_ATTEMPTS = 6
+RETRY_BASE = 30                     # giây: 30, 60, 120, ... tối đa RETRY_MAX
+RETRY_MAX = 30 * 60
+MAX_RETRY_DELAY = 30
+MESSAGES_PER_CONNECTION = 100       # nhiều server giới hạn số mail / phiên
+CONNECTION_IDLE_TIMEOUT = 60        # server thường tự đóng phiên idle → mở lại cho chắc
+
+# Chuyển các retry đến hạn về stream, atomic → 2 worker không promote trùng
+_PROMOTE_LUA = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, payload in ipairs(due) do
+    redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[3], '*', 'payload', payload)
+    redis.call('ZREM', KEYS[2], payload)
+end
+return #due
+"""
+
+
+async def enqueue_email(to_email: str, subject: str, html_content: str, expires_at: Optional[datetime] = None):
+    """
+    Đưa email vào outbox; không có Redis thì gửi trực tiếp như trước.
+    expires_at (UTC): nội dung hết giá trị sau thời điểm này (OTP) → không gửi / retry nữa.
+    """
+    job = {"to": to_email, "subject": subject, "html": html_content, "attempts": 0}
+    if expires_at:
+        job["expiresAt"] = expires_at.replace(tzinfo=timezone.utc).timestamp()
+    payload = json.dumps(job)
+    if redis_client:
+        try:
+            redis_client.xadd(STREAM, {"payload": payload}, maxlen=STREAM_MAXLEN, approximate=True)
+            return
+        except redis.RedisError as e:
+            log.error(f"[EMAIL_OUTBOX] Enqueue failed, sending inline: {e}")
+    await send_email(to_email, subject, html_content)
+
+
+def _is_expired(job: Optional[dict], at: float) -> bool:
+    return bool(job) and job.get("expiresAt") is not None and at >= job["expiresAt"]
+
+
+def _is_permanent(error: Exception) -> bool:
+    """5xx (địa chỉ sai, bị từ chối...) thì retry cũng vô ích"""
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return all(500 <= e.code < 600 for e in error.recipients)
+    return isinstance(error, aiosmtplib.SMTPResponseException) and 500 <= error.code < 600
+
+
+class _Connection:
+    def __init__(self):
+        self.client: Optional[aiosmtplib.SMTP] = None
+        self.sent = 0
+        self.last_used = 0.0
+
+    async def close(self):
+        client, self.client = self.client, None
+        if client and client.is_connected:
+            try:
+                await client.quit()
+            except (aiosmtplib.SMTPException, OSError):
+                client.close()
+
+    async def send(self, message):
+        stale = time.monotonic() - self.last_used > CONNECTION_IDLE_TIMEOUT
+        if self.client and (not self.client.is_connected or stale or self.sent >= MESSAGES_PER_CONNECTION):
+            await self.close()
+        if not self.client:
+            self.client = aiosmtplib.SMTP(**smtp_options())
+            await self.client.connect()
+            self.sent = 0
+        try:
+            await self.client.send_message(message)
+        except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, OSError):
+            # Phiên hỏng → bỏ connection, lần sau mở lại
+            self.client = None
+            raise
+        self.sent += 1
+        self.last_used = time.monotonic()
+
+
+class SMTPPool:
+    """size connection SMTP giữ mở; mỗi connection gửi tuần tự, các connection gửi song song"""
+
+    def __init__(self, size: int):
+        self._all = [_Connection() for _ in range(size)]
+        self._connections: asyncio.Queue = asyncio.Queue()
+        for connection in self._all:
+            self._connections.put_nowait(connection)
+
+    async def send(self, message):
+        connection = await self._connections.get()
+        try:
+            await connection.send(message)
+        finally:
+            self._connections.put_nowait(connection)
+
+    async def close(self):
+        for connection in self._all:
+            await connection.close()
+
+
+class EmailOutbox:
+    def __init__(self):
+        self._redis = None
+        self._pool: Optional[SMTPPool] = None
+        self._promote = None
+        self._consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self._group_ready = False
+        self._last_claim = 0.0
+        self._task = None
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+        self.expired = 0
+
+    def start(self):
+        if not redis_client:
+            log.warning("[EMAIL_OUTBOX] Redis unavailable, emails are sent inline")
+            return
+        if self._task is None or self._task.done():
+            self._redis = redis.asyncio.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+            self._promote = self._redis.register_script(_PROMOTE_LUA)
+            self._pool = SMTPPool(settings.SMTP_POOL_SIZE)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pool:
+            await self._pool.close()
+        if self._redis:
+            await self._redis.aclose()
+
+    async def _ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            await self._redis.xgroup_create(STREAM, GROUP, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    async def _next_batch(self) -> List[Tuple[str, dict]]:
+        # Thỉnh thoảng nhận lại entry treo của consumer đã chết (worker restart giữa chừng)
+        if time.monotonic() - self._last_claim > CLAIM_INTERVAL:
+            self._last_claim = time.monotonic()
+            claimed = await self._redis.xautoclaim(
+                STREAM, GROUP, self._consumer, CLAIM_IDLE_MS, "0-0", count=settings.EMAIL_BATCH_SIZE
+            )
+            if claimed[1]:
+                return claimed[1]
+        response = await self._redis.xreadgroup(
+            GROUP, self._consumer, {STREAM: ">"}, count=settings.EMAIL_BATCH_SIZE, block=BLOCK_MS
+        )
+        return response[0][1] if response else []
+
+    async def _send_batch(self, entries: List[Tuple[str, dict]]):
+        jobs, orphans, expired = [], [], []
+        now = time.time()
+        for entry_id, fields in entries:
+            if not fields:
+                orphans.append(entry_id)  # entry đã bị xoá khỏi stream nhưng còn trong pending list
+                continue
+            try:
+                job = json.loads(fields["payload"])
+                message = build_message(job["to"], job["subject"], job["html"])
+            except (KeyError, TypeError, ValueError) as e:
+                log.error(f"[EMAIL_OUTBOX] Bad entry {entry_id}: {e}")
+                job, message = None, None
+            if _is_expired(job, now):
+                expired.append((entry_id, job))  # OTP đã hết hạn khi tới lượt gửi
+                continue
+            jobs.append((entry_id, job, message))
+
+        results = await asyncio.gather(
+            *[self._pool.send(message) for _, _, message in jobs if message is not None],
+            return_exceptions=True
+        )
+        results = iter(results)
+
+        # Ack + retry + dead letter của cả batch trong 1 round trip
+        pipe = self._redis.pipeline(transaction=False)
+        now = time.time()
+        if orphans:
+            pipe.xack(STREAM, GROUP, *orphans)
+        for entry_id, job in expired:
+            self.expired += 1
+            log.warning(f"[EMAIL_OUTBOX] Dropping expired email to {job.get('to')} after {job.get('attempts', 0)} attempts")
+            pipe.xack(STREAM, GROUP, entry_id)
+            pipe.xdel(STREAM, entry_id)
+            pipe.xadd(DEAD_STREAM, {"payload": json.dumps({**job, "error": "expired"})},
+                      maxlen=STREAM_MAXLEN, approximate=True)
+        for entry_id, job, message in jobs:
+            error = next(results) if message is not None else ValueError("bad payload")
+            pipe.xack(STREAM, GROUP, entry_id)
+            pipe.xdel(STREAM, entry_id)
+            if error is None:
+                self.sent += 1
+                continue
+            job = job or {}
+            job["attempts"] = job.get("attempts", 0) + 1
+            job["error"] = str(error)[:500]
+            delay = min(RETRY_BASE * 2 ** (job["attempts"] - 1), RETRY_MAX)
+            if _is_expired(job, now + delay):
+                # Lần retry kế tiếp đã quá hạn (OTP 5 phút) → mã trong mail vô dụng
+                self.expired += 1
+                log.error(f"[EMAIL_OUTBOX] Giving up on {job.get('to')}, expires before next retry: {error}")
+                pipe.xadd(DEAD_STREAM, {"payload": json.dumps(job)}, maxlen=STREAM_MAXLEN, approximate=True)
+            elif message is None or _is_permanent(error) or job["attempts"] >= MAX_ATTEMPTS:
+                self.dead += 1
+                log.error(f"[EMAIL_OUTBOX] Giving up on {job.get('to')} after {job['attempts']} attempts: {error}")
+                pipe.xadd(DEAD_STREAM, {"payload": json.dumps(job)}, maxlen=STREAM_MAXLEN, approximate=True)
+            else:
+                self.retried += 1
+                log.warning(f"[EMAIL_OUTBOX] Send to {job['to']} failed, retry in {delay}s: {error}")
+                pipe.zadd(RETRY_KEY, {json.dumps(job): now + delay})
+        await pipe.execute()
+
+    async def _run(self):
+        delay = 1
+        while True:
+            try:
+                await self._ensure_group()
+                await self._promote(
+                    keys=[STREAM, RETRY_KEY], args=[time.time(), settings.EMAIL_BATCH_SIZE, STREAM_MAXLEN]
+                )
+                entries = await self._next_batch()
+                if entries:
+                    await self._send_batch(entries)
+                delay = 1
+            except asyncio.CancelledError:
+                raise
+            except redis.RedisError as e:
+                if "NOGROUP" in str(e):
+                    self._group_ready = False  # stream bị xoá → tạo lại group
+                log.error(f"[EMAIL_OUTBOX] Redis error, retry in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "retried": self.retried, "dead": self.dead, "expired": self.expired}
+
+
+email_outbox = EmailOutbox()
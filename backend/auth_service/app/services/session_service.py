@@ -0,0 +1,107 @@
+# app/services/session_service.py
+import hashlib
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from app.core.config import settings
+from app.core.database import sessions_collection
+from app.core.token_blacklist import add_to_blacklist
+
+# 1 document / thiết bị đăng nhập:
+#   {_id, userId, tokenHash, accessJti, device {userAgent, ip}, createdAt, lastUsedAt, expiresAt}
+# Refresh token không bao giờ lưu nguyên văn, chỉ sha256 (unique index tokenHash).
+# _id cố định suốt đời session → client revoke theo id; tokenHash đổi mỗi lần refresh.
+SESSION_LIST_PROJECTION = {"tokenHash": 0}
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _expires_at(now: datetime) -> datetime:
+    return now + timedelta(days=settings.JWT_REFRESH_EXPIRE_DAYS)
+
+
+def device_info(request) -> dict:
+    forwarded = request.headers.get("x-forwarded-for")
+    ip = forwarded.split(",")[0].strip() if forwarded else (request.client.host if request.client else None)
+    return {"userAgent": (request.headers.get("user-agent") or "")[:256], "ip": ip}
+
+
+async def create_session(user_id: ObjectId, refresh_token: str, access_jti: str, device: dict) -> ObjectId:
+    now = datetime.utcnow()
+    result = await sessions_collection.insert_one({
+        "userId": user_id,
+        "tokenHash": hash_token(refresh_token),
+        "accessJti": access_jti,
+        "device": device,
+        "createdAt": now,
+        "lastUsedAt": now,
+        "expiresAt": _expires_at(now)
+    })
+    return result.inserted_id
+
+
+async def rotate_session(refresh_token: str, new_refresh_token: str, access_jti: str) -> Optional[dict]:
+    """Đổi refresh token của session trong 1 lệnh atomic; token cũ dùng lại sau đó sẽ không khớp"""
+    now = datetime.utcnow()
+    return await sessions_collection.find_one_and_update(
+        {"tokenHash": hash_token(refresh_token), "expiresAt": {"$gt": now}},
+        {"$set": {
+            "tokenHash": hash_token(new_refresh_token),
+            "accessJti": access_jti,
+            "lastUsedAt": now,
+            "expiresAt": _expires_at(now)
+        }},
+        projection={"userId": 1},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def _revoke_access(session: Optional[dict]):
+    # Access token hiện tại của session chết luôn, không đợi hết 15 phút
+    if session and session.get("accessJti"):
+        add_to_blacklist(session["accessJti"], settings.JWT_ACCESS_EXPIRE_MINUTES)
+
+
+async def revoke_by_token(refresh_token: str) -> bool:
+    session = await sessions_collection.find_one_and_delete(
+        {"tokenHash": hash_token(refresh_token)}, projection={"accessJti": 1}
+    )
+    _revoke_access(session)
+    return session is not None
+
+
+async def revoke_by_access_jti(user_id: ObjectId, access_jti: str) -> bool:
+    session = await sessions_collection.find_one_and_delete(
+        {"userId": user_id, "accessJti": access_jti}, projection={"accessJti": 1}
+    )
+    _revoke_access(session)
+    return session is not None
+
+
+async def revoke_session(user_id: ObjectId, session_id: ObjectId) -> bool:
+    session = await sessions_collection.find_one_and_delete(
+        {"_id": session_id, "userId": user_id}, projection={"accessJti": 1}
+    )
+    _revoke_access(session)
+    return session is not None
+
+
+async def list_sessions(user_id: ObjectId, current_jti: Optional[str] = None) -> List[dict]:
+    cursor = sessions_collection.find(
+        {"userId": user_id, "expiresAt": {"$gt": datetime.utcnow()}}, SESSION_LIST_PROJECTION
+    ).sort("lastUsedAt", -1)
+    sessions = []
+    async for session in cursor:
+        sessions.append({
+            "id": str(session["_id"]),
+            "device": session.get("device") or {},
+            "createdAt": session["createdAt"],
+            "lastUsedAt": session["lastUsedAt"],
+            "expiresAt": session["expiresAt"],
+            "current": bool(current_jti) and session.get("accessJti") == current_jti
+        })
+    return sessions
@@ -3,20 +3,26 @@ import aiosmtplib
 from email.message import EmailMessage
 from app.core.config import settings # Đảm bảo dòng này tồn tại và đúng
 
-async def send_email(to_email: str, subject: str, html_content: str):
+def build_message(to_email: str, subject: str, html_content: str) -> EmailMessage:
     # Tạo email message
     message = EmailMessage()
     message["From"] = f"{settings.EMAIL_FROM_NAME} <{settings.EMAIL_FROM}>"
     message["To"] = to_email
     message["Subject"] = subject
     message.set_content(html_content, subtype="html")  # HTML content
+    return message
+
+def smtp_options() -> dict:
+    # SMTP_USER rỗng → không login (vd. debug SMTP server local: SMTP_SERVER=localhost SMTP_PORT=1025 SMTP_START_TLS=false)
+    options = {
+        "hostname": settings.SMTP_SERVER,
+        "port": settings.SMTP_PORT,
+        "start_tls": settings.SMTP_START_TLS
+    }
+    if settings.SMTP_USER:
+        options.update(username=settings.SMTP_USER, password=settings.SMTP_PASSWORD)
+    return options
 
-    # Gửi email async bằng aiosmtplib
-    await aiosmtplib.send(
-        message,
-        hostname=settings.SMTP_SERVER,
-        port=settings.SMTP_PORT,
-        username=settings.SMTP_USER,
-        password=settings.SMTP_PASSWORD,
-        start_tls=True
-    )
\ No newline at end of file
+async def send_email(to_email: str, subject: str, html_content: str):
+    # Gửi email async bằng aiosmtplib (1 connection / email) - handler nên dùng email_outbox.enqueue_email
+    await aiosmtplib.send(build_message(to_email, subject, html_content), **smtp_options())
\ No newline at end of file
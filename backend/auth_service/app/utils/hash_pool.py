@@ -0,0 +1,78 @@
+# hash_pool.py
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from fastapi import HTTPException
+
+
+class HashPool:
+    """
+    Chạy hash/verify password (pbkdf2, tốn CPU hàng chục ms) trên thread pool riêng
+    thay vì trên event loop. hashlib.pbkdf2_hmac nhả GIL nên các thread chạy song song thật.
+
+    Giới hạn số job đang chờ + đang chạy: vượt quá max_pending thì trả 503 ngay,
+    không để request xếp hàng vô hạn rồi timeout ở phía client.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hash")
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_depth = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+
+    @property
+    def depth(self) -> int:
+        """Số job đang chờ hoặc đang chạy"""
+        return self._pending
+
+    @staticmethod
+    def _timed(submitted_at: float, fn: Callable, args: tuple):
+        started_at = time.perf_counter()
+        result = fn(*args)
+        return result, started_at - submitted_at, time.perf_counter() - started_at
+
+    async def run(self, fn: Callable, *args):
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+        self._pending += 1
+        self.max_depth = max(self.max_depth, self._pending)
+        try:
+            loop = asyncio.get_running_loop()
+            result, waited, ran = await loop.run_in_executor(
+                self._executor, self._timed, time.perf_counter(), fn, args
+            )
+        finally:
+            self._pending -= 1
+        # Cộng dồn trên event loop, không đụng counter từ thread worker
+        self.completed += 1
+        self._wait_total += waited
+        self._run_total += ran
+        return result
+
+    def stats(self) -> dict:
+        done = self.completed or 1
+        return {
+            "workers": self.workers,
+            "maxPending": self.max_pending,
+            "depth": self._pending,
+            "maxDepth": self.max_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avgWaitMs": round(self._wait_total / done * 1000, 2),
+            "avgRunMs": round(self._run_total / done * 1000, 2)
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
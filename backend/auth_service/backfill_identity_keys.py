@@ -0,0 +1,82 @@
+"""
+Script to set the normalized identity keys on every user.
+
+users.emailKey / users.usernameKey are the lowercased email and username.
+Login resolves the identifier with one seek on one of them, and their unique
+indexes reject duplicate registrations (case-insensitively). Users created
+before these fields existed have no keys and cannot log in until this runs.
+
+Users whose keys collide (same email/username differing only in case) are
+listed and left without that key so the unique index can still be built;
+resolve them by hand, then run the script again.
+
+Safe to run more than once. Run this from the auth_service directory:
+python backfill_identity_keys.py
+"""
+
+import os
+import sys
+from collections import defaultdict
+from pymongo import MongoClient, UpdateOne
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB connection
+MONGODB_URL = os.getenv('MONGODB_URL', 'mongodb://localhost:27017')
+DATABASE_NAME = os.getenv('DATABASE_NAME', 'ONLINE_ENTERTAINMENT_PLATFORM')
+
+def connect_to_db():
+    """Connect to MongoDB database"""
+    try:
+        client = MongoClient(MONGODB_URL)
+        db = client[DATABASE_NAME]
+        print(f"✅ Connected to MongoDB: {DATABASE_NAME}")
+        return db
+    except Exception as e:
+        print(f"❌ Failed to connect to MongoDB: {e}")
+        sys.exit(1)
+
+def identity_key(value):
+    return value.strip().lower() if isinstance(value, str) else None
+
+def backfill_identity_keys(db):
+    users = list(db['users'].find({}, {"email": 1, "username": 1, "emailKey": 1, "usernameKey": 1}))
+
+    owners = {"emailKey": defaultdict(list), "usernameKey": defaultdict(list)}
+    for user in users:
+        for field, source in (("emailKey", "email"), ("usernameKey", "username")):
+            key = identity_key(user.get(source))
+            if key:
+                owners[field][key].append(user["_id"])
+
+    updates, conflicts = [], 0
+    for user in users:
+        fields, unset = {}, {}
+        for field, source in (("emailKey", "email"), ("usernameKey", "username")):
+            key = identity_key(user.get(source))
+            if key and len(owners[field][key]) > 1:
+                conflicts += 1
+                print(f"❌ {field} '{key}' shared by {owners[field][key]}")
+                if field in user:
+                    unset[field] = ""
+            elif key != user.get(field):
+                fields[field] = key
+        update = {}
+        if fields:
+            update["$set"] = fields
+        if unset:
+            update["$unset"] = unset
+        if update:
+            updates.append(UpdateOne({"_id": user["_id"]}, update))
+
+    if updates:
+        db['users'].bulk_write(updates, ordered=False)
+    print(f"✅ Updated identity keys on {len(updates)} of {len(users)} users")
+    if conflicts:
+        print(f"❌ {conflicts} conflicting key(s) left unset, fix those users and run again")
+
+if __name__ == "__main__":
+    db = connect_to_db()
+    backfill_identity_keys(db)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Script to (re)build the content_stats collection.
+
+movie_service and book_service keep one content_stats document per movie/book
+up to date with $inc (comments, ratings, views). This script rebuilds those
+documents from the source collections, for the initial rollout or after a
+manual data fix:
+1. duplicate ratings (same user + content, left by concurrent first ratings)
+   are removed, keeping the latest; the services' unique rating indexes
+   cannot be built while duplicates exist
+2. commentCount from approved comments
+3. ratingSum / ratingCount / ratingHistogram from ratings
+   (movie ratings use contentType+contentId, book ratings use bookId)
+4. views from movies.totalViews
+"""
+
+import asyncio
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB connection
+MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+DATABASE_NAME = os.getenv("DATABASE_NAME", "ONLINE_ENTERTAINMENT_PLATFORM")
+
+
+def _empty_stats(content_type):
+    return {
+        "contentType": content_type,
+        "commentCount": 0,
+        "ratingSum": 0,
+        "ratingCount": 0,
+        "ratingHistogram": {str(i): 0 for i in range(1, 6)},
+        "views": 0
+    }
+
+
+# Movie ratings: contentType + contentId; book ratings: bookId
+RATING_CONTENT_PROJECTION = {
+    "contentType": {"$cond": [{"$ifNull": ["$bookId", False]}, "book", "$contentType"]},
+    "contentId": {"$ifNull": ["$bookId", "$contentId"]}
+}
+
+
+async def dedupe_ratings(db):
+    """Keep the most recently updated rating per (user, content), delete the rest"""
+    removed = 0
+    async for row in db.ratings.aggregate([
+        {"$project": {"userId": 1, "updatedAt": 1, **RATING_CONTENT_PROJECTION}},
+        {"$sort": {"updatedAt": -1}},
+        {"$group": {
+            "_id": {"user": "$userId", "type": "$contentType", "id": "$contentId"},
+            "ids": {"$push": "$_id"},
+            "count": {"$sum": 1}
+        }},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True):
+        result = await db.ratings.delete_many({"_id": {"$in": row["ids"][1:]}})
+        removed += result.deleted_count
+    return removed
+
+
+async def backfill_content_stats():
+    """Rebuild content_stats from comments, ratings and movies"""
+    print(f"Connecting to MongoDB at {MONGODB_URL}")
+    client = AsyncIOMotorClient(MONGODB_URL)
+    db = client[DATABASE_NAME]
+    stats = {}
+
+    print("\n1. Removing duplicate ratings...")
+    removed = await dedupe_ratings(db)
+    print(f"   Removed {removed} duplicate ratings")
+
+    print("2. Counting approved comments...")
+    async for row in db.comments.aggregate([
+        {"$match": {"status": "approved"}},
+        {"$group": {"_id": {"type": "$contentType", "id": "$contentId"}, "count": {"$sum": 1}}}
+    ]):
+        content_id = row["_id"]["id"]
+        if not ObjectId.is_valid(content_id):
+            continue
+        doc = stats.setdefault(ObjectId(content_id), _empty_stats(row["_id"]["type"]))
+        doc["commentCount"] = row["count"]
+
+    print("3. Aggregating ratings...")
+    async for row in db.ratings.aggregate([
+        {"$project": {"rating": 1, **RATING_CONTENT_PROJECTION}},
+        {"$group": {
+            "_id": {"type": "$contentType", "id": "$contentId", "rating": "$rating"},
+            "count": {"$sum": 1}
+        }}
+    ]):
+        key = row["_id"]
+        if not key.get("id") or key.get("rating") not in range(1, 6):
+            continue
+        doc = stats.setdefault(key["id"], _empty_stats(key["type"]))
+        doc["ratingSum"] += key["rating"] * row["count"]
+        doc["ratingCount"] += row["count"]
+        doc["ratingHistogram"][str(key["rating"])] += row["count"]
+
+    print("4. Copying movie views...")
+    async for movie in db.movies.find({}, {"totalViews": 1}):
+        doc = stats.setdefault(movie["_id"], _empty_stats("movie"))
+        doc["views"] = movie.get("totalViews", 0)
+
+    print(f"\n5. Writing {len(stats)} content_stats documents...")
+    now = datetime.utcnow()
+    for content_id, doc in stats.items():
+        doc["updatedAt"] = now
+        await db.content_stats.replace_one({"_id": content_id}, doc, upsert=True)
+
+    print("\n✓ content_stats backfill completed!")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(backfill_content_stats())
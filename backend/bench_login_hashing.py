@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Login hashing benchmark: password verify throughput per core and event-loop stall.
+
+This script will:
+1. Hash one password with the same passlib context as auth_service (pbkdf2_sha256)
+2. Fire a burst of concurrent verify calls, first inline on the event loop (old
+   behaviour), then through HashPool with 1..N worker threads
+3. While the burst runs, a ticker task sleeps 5ms in a loop and records how late
+   it wakes up, i.e. how long any other request on the worker would have stalled
+4. Print logins/s, logins/s per worker, ticker lag p50/p99/max and 503 rejections
+
+No database is needed. Run it from the backend directory:
+    python bench_login_hashing.py [burst_size]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "auth_service"))
+
+from app.utils.hash_pool import HashPool  # noqa: E402
+
+pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+PASSWORD = "Benchmark@123"
+TICK = 0.005
+
+
+async def _ticker(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        expected = time.perf_counter() + TICK
+        await asyncio.sleep(TICK)
+        lags.append(max(time.perf_counter() - expected, 0))
+
+
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+async def _run(label: str, burst: int, verify, workers: int):
+    lags, stop = [], asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    await asyncio.sleep(TICK * 2)
+
+    async def login():
+        try:
+            return await verify()
+        except HTTPException:
+            return None
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[login() for _ in range(burst)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+
+    ok = sum(1 for r in results if r)
+    rejected = sum(1 for r in results if r is None)
+    rate = ok / elapsed if elapsed else 0
+    print(f"{label:<18} {ok:>5} ok {rejected:>5} 503  {rate:>8.1f} logins/s  "
+          f"{rate / workers:>7.1f}/worker  lag p50 {_percentile(lags, 0.5) * 1000:>6.1f}ms  "
+          f"p99 {_percentile(lags, 0.99) * 1000:>7.1f}ms  max {max(lags or [0]) * 1000:>7.1f}ms")
+
+
+async def main(burst: int):
+    hashed = pwd_context.hash(PASSWORD)
+    cores = os.cpu_count() or 1
+    print(f"pbkdf2_sha256, burst of {burst} concurrent logins, {cores} cores\n")
+
+    async def inline():
+        return pwd_context.verify(PASSWORD, hashed)
+
+    await _run("inline (loop)", burst, inline, 1)
+
+    worker_counts = sorted({1, 2, max(cores // 2, 1), cores})
+    for workers in worker_counts:
+        pool = HashPool(workers, max_pending=burst)
+        await _run(f"pool x{workers}", burst, lambda: pool.run(pwd_context.verify, PASSWORD, hashed), workers)
+        pool.shutdown()
+
+    # Backpressure: pool nhỏ hơn burst → phần vượt max_pending bị từ chối ngay (503)
+    pool = HashPool(cores, max_pending=cores * 4)
+    await _run(f"pool x{cores} cap {cores * 4}", burst, lambda: pool.run(pwd_context.verify, PASSWORD, hashed), cores)
+    print(f"\n{pool.stats()}")
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 64))
@@ -1,5 +1,6 @@
 # app/controllers/book_controller.py
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from app.services.book_service import *
 from app.schemas.book_dto import *
 from app.middlewares.jwt_middleware import verify_token, verify_token_optional
@@ -22,12 +23,68 @@ async def book_detail_controller(
 async def read_chapter_controller(
     book_id: str,
     chapter_num: int,
+    response: Response,
     user_payload = Depends(verify_token)
 ):
     user_id = user_payload.get("sub") if isinstance(user_payload, dict) else user_payload
     if not user_id:
         raise HTTPException(401, "Unauthorized")
-    return success(await read_book_chapter(book_id, chapter_num, user_id))
+    result = await read_book_chapter(book_id, chapter_num, user_id)
+
+    # Gợi ý client tải trước chapter kế tiếp (server cũng đã prefetch vào cache)
+    next_chapter = result["navigation"]["nextChapter"]
+    if next_chapter:
+        base = f"/api/books/{book_id}/chapters/{next_chapter}"
+        response.headers["Link"] = f'<{base}>; rel="next", <{base}/content>; rel="preload"; as="fetch"'
+    return success(result)
+
+async def chapter_content_controller(
+    book_id: str,
+    chapter_num: int,
+    request: Request,
+    offset: Optional[int] = None,
+    length: Optional[int] = None,
+    user_payload = Depends(verify_token)
+):
+    user_id = user_payload.get("sub") if isinstance(user_payload, dict) else user_payload
+    if not user_id:
+        raise HTTPException(401, "Unauthorized")
+
+    body, start, end, size, partial = await open_chapter_stream(
+        book_id, chapter_num, request.headers.get("range"), offset, length
+    )
+    headers = {"Accept-Ranges": "bytes", "Content-Length": str(end - start)}
+    if partial:
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    return StreamingResponse(
+        body,
+        status_code=206 if partial else 200,
+        media_type="text/plain; charset=utf-8",
+        headers=headers
+    )
+
+async def chapter_bundle_controller(
+    book_id: str,
+    first: int,
+    last: int,
+    fmt: str,
+    user_payload = Depends(verify_token)
+):
+    user_id = user_payload.get("sub") if isinstance(user_payload, dict) else user_payload
+    if not user_id:
+        raise HTTPException(401, "Unauthorized")
+
+    body, media_type, headers = await open_chapter_bundle(book_id, first, last, fmt)
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+async def progress_batch_controller(
+    data: ProgressBatchUpdate,
+    user_payload = Depends(verify_token)
+):
+    user_id = user_payload.get("sub") if isinstance(user_payload, dict) else user_payload
+    if not user_id:
+        raise HTTPException(401, "Unauthorized")
+    return success(await reconcile_reading_progress(user_id, data))
 
 async def update_progress_controller(
     book_id: str,
@@ -49,37 +106,11 @@ async def rate_book_controller(
         raise HTTPException(401, "Unauthorized")
     return success(await rate_book(book_id, data, user_id))
 
-# app/controllers/book_controller.py
-# app/controllers/book_controller.py
 async def continue_reading_controller(
     limit: int = 10,
     user_payload=Depends(verify_token)
 ):
-    print("=== [DEBUG] VÀO continue_reading_controller ===")
-    print(f"user_payload type: {type(user_payload)}")
-    print(f"user_payload value: {user_payload}")
-
-    user_id = None
-    try:
-        if isinstance(user_payload, dict):
-            user_id = user_payload.get("sub")
-        elif user_payload and hasattr(user_payload, "sub"):
-            user_id = user_payload.sub
-        elif user_payload:
-            user_id = str(user_payload)
-    except Exception as e:
-        print(f"ERROR extracting user_id: {e}")
-
-    print(f"Final user_id: {user_id}")
-
+    user_id = user_payload.get("sub") if isinstance(user_payload, dict) else user_payload
     if not user_id:
-        print("No user_id → 401")
         raise HTTPException(401, "Unauthorized")
-
-    try:
-        result = await get_continue_reading(limit, user_id)
-        print(f"Service result: {result}")
-        return success(result)
-    except Exception as e:
-        print(f"Service error: {e}")
-        raise
\ No newline at end of file
+    return success(await get_continue_reading(limit, user_id))
@@ -1,7 +1,7 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
 from functools import lru_cache
-from typing import Optional
+from typing import Dict, Optional
 import os
 class Settings(BaseSettings):
     SERVICE_NAME: str = Field(default="book_service", env="SERVICE_NAME")
@@ -13,6 +13,11 @@ class Settings(BaseSettings):
     JWT_REFRESH_EXPIRE_DAYS: int = Field(default=7, env="JWT_REFRESH_EXPIRE_DAYS")
     REDIS_URL: str = Field(..., env="REDIS_URL")
     PORT: int = Field(default=8004, env="PORT")
+    CHAPTER_CACHE_MAX_MB: int = Field(default=64, env="CHAPTER_CACHE_MAX_MB")
+    # Admission control (mỗi worker): route đắt bị giới hạn / shed trước khi latency sụp
+    ADMISSION_MAX_IN_FLIGHT: int = Field(default=256, env="ADMISSION_MAX_IN_FLIGHT")
+    ADMISSION_LAG_SHED_MS: int = Field(default=100, env="ADMISSION_LAG_SHED_MS")
+    ADMISSION_BULKHEADS: Dict[str, int] = Field(default={"bundle": 4, "chapter_content": 32}, env="ADMISSION_BULKHEADS")
     model_config = {
         "env_file": ".env",
         "env_file_encoding": "utf-8",
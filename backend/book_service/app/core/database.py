@@ -1,8 +1,60 @@
 from app.core.config import get_settings
 from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.circuit_breaker import CircuitBreaker
+from pymongo import monitoring, IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+import logging
+
+log = logging.getLogger(__name__)
 
 settings = get_settings()
-client = AsyncIOMotorClient(settings.MONGO_URI)
+
+# Circuit breaker cho Mongo: lỗi kết nối / timeout (command event có errtype, heartbeat fail)
+# → failure; command thành công → success. MongoGuardMiddleware chặn request khi breaker open.
+# serverSelectionTimeoutMS mặc định 30s → hạ xuống để request không treo nửa phút khi Mongo rớt.
+MONGO_SERVER_SELECTION_TIMEOUT_MS = 5000
+_CONNECTION_ERRORS = {"AutoReconnect", "NetworkTimeout", "ConnectionFailure", "WaitQueueTimeoutError"}
+mongo_breaker = CircuitBreaker("mongo")
+
+# Change stream ($changeStream) chỉ chạy trên replica set / sharded cluster;
+# mongod standalone (docker-compose mặc định) trả lỗi 40573 → service phải tự fallback.
+CHANGE_STREAM_UNSUPPORTED = 40573
+
+
+def change_streams_unsupported(e: Exception) -> bool:
+    return isinstance(e, OperationFailure) and (
+        e.code == CHANGE_STREAM_UNSUPPORTED or "only supported on replica sets" in str(e)
+    )
+
+
+class _BreakerCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_breaker.record_success()
+
+    def failed(self, event):
+        if event.failure.get("errtype") in _CONNECTION_ERRORS:
+            mongo_breaker.record_failure()
+
+
+class _BreakerHeartbeatListener(monitoring.ServerHeartbeatListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        mongo_breaker.record_failure()
+
+
+client = AsyncIOMotorClient(
+    settings.MONGO_URI,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    event_listeners=[_BreakerCommandListener(), _BreakerHeartbeatListener()]
+)
 db = client[settings.DATABASE_NAME]
 
 users_collection = db.get_collection("users")
@@ -13,4 +65,71 @@ movies_collection = db.get_collection("movies")
 premium_subscriptions_collection = db.get_collection("premiumSubscriptions")
 ratings_collection = db.get_collection("ratings")
 books_collection = db.get_collection("books")
-reading_progress_collection = db.get_collection("reading_progress")
\ No newline at end of file
+reading_progress_collection = db.get_collection("reading_progress")
+content_stats_collection = db.get_collection("content_stats")
+book_chapters_collection = db.get_collection("book_chapters")
+book_chapter_chunks_collection = db.get_collection("book_chapter_chunks")
+
+# Index cho các query nóng của service (idempotent, chạy lúc startup)
+# get_book_list chỉ lấy sách có phim chuyển thể → partial index theo từng kiểu sort
+_HAS_ADAPTATION = {"adaptedMovies.0": {"$exists": True}}
+BOOK_INDEXES = [
+    IndexModel([("isActive", ASCENDING), ("isDeleted", ASCENDING), ("title", ASCENDING)],
+               name="adapted_title", partialFilterExpression=_HAS_ADAPTATION),
+    IndexModel([("isActive", ASCENDING), ("isDeleted", ASCENDING), ("publishYear", DESCENDING)],
+               name="adapted_publishYear", partialFilterExpression=_HAS_ADAPTATION),
+    IndexModel([("isActive", ASCENDING), ("isDeleted", ASCENDING), ("rating", DESCENDING)],
+               name="adapted_rating", partialFilterExpression=_HAS_ADAPTATION),
+    # Tìm sách cần build lại snapshot khi 1 phim thay đổi
+    IndexModel([("movieAdaptations", ASCENDING)]),
+]
+BOOK_CHAPTER_INDEXES = [
+    IndexModel([("bookId", ASCENDING), ("number", ASCENDING)], unique=True),
+]
+BOOK_CHAPTER_CHUNK_INDEXES = [
+    IndexModel([("contentId", ASCENDING), ("n", ASCENDING)], unique=True),
+]
+READING_PROGRESS_INDEXES = [
+    IndexModel([("userId", ASCENDING), ("updatedAt", DESCENDING)]),
+    IndexModel([("userId", ASCENDING), ("bookId", ASCENDING)]),
+]
+# Mỗi user chỉ 1 rating / sách: upsert song song (double-submit) không tạo 2 doc
+# → content_stats không bị $inc 2 lần. Partial vì collection ratings dùng chung với movie_service.
+RATING_INDEXES = [
+    IndexModel([("userId", ASCENDING), ("bookId", ASCENDING)], name="user_book_unique", unique=True,
+               partialFilterExpression={"bookId": {"$exists": True}}),
+]
+# Index cũ cùng key nhưng không unique → drop sau khi bản unique (khác partialFilterExpression) build xong
+LEGACY_RATING_INDEX = "userId_1_bookId_1"
+
+async def _drop_legacy_index(collection, name: str, replacement: str):
+    """Drop index cũ chỉ khi index thay thế đã build xong; build lỗi (còn dữ liệu trùng) → giữ index cũ"""
+    try:
+        info = await collection.index_information()
+        if name not in info:
+            return
+        if replacement not in info:
+            log.error(
+                f"[DB] {replacement} missing on {collection.name}, keeping {name}; "
+                "remove duplicates with backfill_content_stats.py and restart"
+            )
+            return
+        await collection.drop_index(name)
+        log.info(f"[DB] Dropped legacy index {name} on {collection.name}")
+    except Exception as e:
+        log.error(f"[DB] Failed to drop legacy index {name} on {collection.name}: {e}")
+
+async def ensure_indexes():
+    """Create the indexes the service queries rely on"""
+    for collection, indexes in (
+        (books_collection, BOOK_INDEXES),
+        (book_chapters_collection, BOOK_CHAPTER_INDEXES),
+        (book_chapter_chunks_collection, BOOK_CHAPTER_CHUNK_INDEXES),
+        (reading_progress_collection, READING_PROGRESS_INDEXES),
+        (ratings_collection, RATING_INDEXES),
+    ):
+        try:
+            await collection.create_indexes(indexes)
+        except Exception as e:
+            log.error(f"[DB] Failed to create indexes on {collection.name}: {e}")
+    await _drop_legacy_index(ratings_collection, LEGACY_RATING_INDEX, "user_book_unique")
@@ -1,86 +1,264 @@
 # app/core/rate_limiter.py
+import inspect
 import logging
-from fastapi import Request, HTTPException
+import math
+import time
+from collections import OrderedDict
+from fastapi import Request, Response, HTTPException
 from functools import wraps
-from typing import Callable, Optional
-from app.core.token_blacklist import redis_client
+from typing import Callable, Optional, Tuple
+
+import redis
+import redis.asyncio
+from app.core.config import settings
+from app.core.token_blacklist import redis_client, redis_breaker, REDIS_TIMEOUT
 
 log = logging.getLogger(__name__)
 
+# Token bucket: bucket đầy `capacity` token, hồi `max_requests / duration` token mỗi giây.
+# Cả bước hồi + trừ + TTL chạy trong 1 script (SCRIPT LOAD 1 lần, sau đó EVALSHA)
+# → 1 round trip async / request, trả về luôn số token còn lại và thời gian hồi đầy.
+# Giờ lấy từ TIME của Redis → các worker lệch đồng hồ vẫn tính chung 1 bucket.
+# ARGV: capacity, token / ms, debt (số request đã cho qua bằng credit local, chưa trừ)
+_TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local debt = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate) - debt
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+tokens = math.max(tokens, 0)
+local reset = math.ceil((capacity - tokens) / rate)
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], reset + 1000)
+local retry = 0
+if allowed == 0 then
+    retry = math.ceil((1 - tokens) / rate)
+end
+return {allowed, math.floor(tokens), retry, reset}
+"""
+
+# Pre-check local: khi Redis báo bucket còn >= LOCAL_THRESHOLD, worker được tự cho qua
+# tối đa LOCAL_SHARE số token còn lại trong LOCAL_TTL giây mà không hỏi Redis;
+# số đã dùng được trừ (debt) ở lần EVALSHA kế tiếp. Gần chạm limit thì luôn hỏi Redis.
+LOCAL_THRESHOLD = 0.5
+LOCAL_SHARE = 0.1
+LOCAL_TTL = 1.0
+LOCAL_MAX_KEYS = 10000
+
+
+class _Credit:
+    __slots__ = ("tokens", "remaining", "reset_at", "expires_at", "debt")
+
+    def __init__(self):
+        self.tokens = 0
+        self.remaining = 0
+        self.reset_at = 0.0
+        self.expires_at = 0.0
+        self.debt = 0
+
+
+class TokenBucketLimiter:
+    def __init__(self):
+        self._redis = None
+        self._sha = None
+        self._credits: "OrderedDict[str, _Credit]" = OrderedDict()
+        # Fallback khi Redis lỗi: bucket riêng từng worker thay vì bỏ qua limit
+        self._fallback: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self.local_hits = 0
+        self.redis_calls = 0
+        self.redis_errors = 0
+
+    async def start(self):
+        """Load script lúc startup → EVALSHA đầu tiên trong request không phải load lại"""
+        if not redis_client:
+            log.warning("[RATE_LIMIT] Redis not available, using per-worker buckets")
+            return
+        try:
+            await self._load()
+        except redis.RedisError as e:
+            log.error(f"[RATE_LIMIT] SCRIPT LOAD failed, retry on first request: {e}")
+
+    async def stop(self):
+        if self._redis:
+            await self._redis.aclose()
+            self._redis = None
+            self._sha = None
+
+    async def _load(self):
+        if self._redis is None:
+            self._redis = redis.asyncio.Redis.from_url(
+                settings.REDIS_URL, decode_responses=True,
+                socket_timeout=REDIS_TIMEOUT, socket_connect_timeout=REDIS_TIMEOUT
+            )
+        self._sha = await self._redis.script_load(_TOKEN_BUCKET_LUA)
+
+    async def _evalsha(self, key: str, capacity: int, rate: float, debt: int):
+        if self._sha is None:
+            await self._load()
+        try:
+            return await self._redis.evalsha(self._sha, 1, key, capacity, rate, debt)
+        except redis.exceptions.NoScriptError:
+            # Redis restart / SCRIPT FLUSH → load lại 1 lần
+            await self._load()
+            return await self._redis.evalsha(self._sha, 1, key, capacity, rate, debt)
+
+    def _take_credit(self, key: str):
+        credit = self._credits.get(key)
+        if not credit or credit.tokens <= 0 or credit.expires_at < time.monotonic():
+            return None
+        credit.tokens -= 1
+        credit.debt += 1
+        credit.remaining = max(credit.remaining - 1, 0)
+        self.local_hits += 1
+        return credit
+
+    def _grant_credit(self, key: str, capacity: int, remaining: int, reset_ms: int):
+        credit = self._credits.get(key)
+        if credit is None:
+            credit = self._credits[key] = _Credit()
+            while len(self._credits) > LOCAL_MAX_KEYS:
+                self._credits.popitem(last=False)
+        self._credits.move_to_end(key)
+        now = time.monotonic()
+        credit.remaining = remaining
+        credit.reset_at = now + reset_ms / 1000
+        credit.expires_at = now + LOCAL_TTL
+        credit.tokens = int(remaining * LOCAL_SHARE) if remaining >= capacity * LOCAL_THRESHOLD else 0
+
+    def _check_fallback(self, key: str, capacity: int, rate: float):
+        now = time.monotonic() * 1000
+        tokens, ts = self._fallback.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - ts) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._fallback[key] = (tokens, now)
+        self._fallback.move_to_end(key)
+        while len(self._fallback) > LOCAL_MAX_KEYS:
+            self._fallback.popitem(last=False)
+        retry = 0 if allowed else math.ceil((1 - tokens) / rate)
+        return allowed, int(tokens), retry, math.ceil((capacity - tokens) / rate)
+
+    async def check(self, key: str, capacity: int, rate: float, local: bool = True):
+        """(allowed, remaining, retry_after_ms, reset_ms); rate = token / ms"""
+        credit = self._take_credit(key) if local else None
+        if credit is not None:
+            return True, credit.remaining, 0, max(int((credit.reset_at - time.monotonic()) * 1000), 0)
+
+        # Breaker open → bucket local ngay, không chờ timeout
+        if redis_client and redis_breaker.allow():
+            # Lấy debt ra trước khi await → request song song không trừ 2 lần
+            credit = self._credits.get(key)
+            debt = 0
+            if credit:
+                debt, credit.debt = credit.debt, 0
+            try:
+                self.redis_calls += 1
+                allowed, remaining, retry, reset = await self._evalsha(key, capacity, rate, debt)
+                redis_breaker.record_success()
+                if local:
+                    self._grant_credit(key, capacity, remaining, reset)
+                return bool(allowed), remaining, retry, reset
+            except (redis.RedisError, OSError) as e:
+                if credit:
+                    credit.debt += debt
+                if isinstance(e, (redis.ConnectionError, redis.TimeoutError, OSError)):
+                    redis_breaker.record_failure()
+                self.redis_errors += 1
+                log.error(f"[RATE_LIMIT] Redis error, using per-worker bucket: {e}")
+        return self._check_fallback(key, capacity, rate)
+
+    def stats(self) -> dict:
+        return {
+            "localHits": self.local_hits,
+            "redisCalls": self.redis_calls,
+            "redisErrors": self.redis_errors
+        }
+
+
+rate_limiter = TokenBucketLimiter()
+
+
+def _find(values, kind):
+    return next((v for v in values if isinstance(v, kind)), None)
+
+
 def rate_limit(
     max_requests: int = 60,
     duration: int = 60,
     key_prefix: str = "rate_limit",
-    identifier_from: str = "user"  # "user" hoặc "ip"
+    identifier_from: str = "user",  # "user" hoặc "ip"
+    burst: Optional[int] = None,
+    local_precheck: bool = True
 ):
     """
-    Rate limiter sử dụng redis_client từ token_blacklist
-    - identifier_from: "user" → dùng payload["sub"] (ưu tiên)
+    Token bucket: trung bình max_requests / duration giây, dồn tối đa `burst` request (mặc định max_requests)
+    - identifier_from: "user" → dùng payload["sub"] của user / user_payload (ưu tiên)
                      : "ip" → dùng client IP
+    - local_precheck: cho phép worker tự cho qua khi bucket còn nhiều (False → mọi request hỏi Redis)
+    Trả X-RateLimit-Limit / Remaining / Reset; vượt limit → 429 kèm Retry-After.
     """
+    capacity = burst or max_requests
+    rate = max_requests / (duration * 1000)
+
     def decorator(func: Callable):
+        # Endpoint không khai báo Request / Response thì thêm vào signature để FastAPI inject
+        signature = inspect.signature(func)
+        params = list(signature.parameters.values())
+        inject_request = not any(p.annotation is Request for p in params)
+        inject_response = not any(p.annotation is Response for p in params)
+        if inject_request:
+            params.append(inspect.Parameter("_rate_limit_request", inspect.Parameter.KEYWORD_ONLY, annotation=Request))
+        if inject_response:
+            params.append(inspect.Parameter("_rate_limit_response", inspect.Parameter.KEYWORD_ONLY, annotation=Response))
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            if not redis_client:
-                log.warning("[RATE_LIMIT] Redis not available, skipping")
-                return await func(*args, **kwargs)
-
-            # Lấy request từ kwargs hoặc args
-            request: Optional[Request] = None
-            for arg in args:
-                if isinstance(arg, Request):
-                    request = arg
-                    break
-            if not request and "request" in kwargs:
-                request = kwargs["request"]
+            request: Optional[Request] = kwargs.pop("_rate_limit_request", None) if inject_request \
+                else _find(list(args) + list(kwargs.values()), Request)
+            response: Optional[Response] = kwargs.pop("_rate_limit_response", None) if inject_response \
+                else _find(list(args) + list(kwargs.values()), Response)
 
             # Lấy user_id từ Depends(verify_token)
             user_id = None
-            if "user" in kwargs and isinstance(kwargs["user"], dict):
-                user_id = kwargs["user"].get("sub")
+            for name in ("user", "user_payload"):
+                if isinstance(kwargs.get(name), dict):
+                    user_id = kwargs[name].get("sub")
+                    break
 
             # Fallback: IP nếu không có user hoặc identifier_from = "ip"
             if not user_id or identifier_from == "ip":
-                client_ip = request.client.host if request and request.client else "unknown"
-                identifier = client_ip
+                identifier = request.client.host if request and request.client else "unknown"
             else:
                 identifier = user_id
 
             key = f"{key_prefix}:{identifier}:{func.__name__}"
-
-            try:
-                current = redis_client.get(key)
-                if current and int(current) >= max_requests:
-                    ttl = redis_client.ttl(key)
-                    raise HTTPException(
-                        status_code=429,
-                        detail=f"Too many requests. Try again in {ttl} seconds.",
-                        headers={"Retry-After": str(ttl)}
-                    )
-
-                # Lua script tăng đếm atomic
-                lua_script = """
-                local key = KEYS[1]
-                local max_requests = tonumber(ARGV[1])
-                local duration = tonumber(ARGV[2])
-                local current = redis.call("INCR", key)
-                if current == 1 then
-                    redis.call("EXPIRE", key, duration)
-                elseif current > max_requests then
-                    redis.call("DECR", key)
-                    return -1
-                end
-                return current
-                """
-                result = redis_client.eval(lua_script, 1, key, max_requests, duration)
-                if result == -1:
-                    raise HTTPException(429, "Rate limit exceeded")
-
-            except Exception as e:
-                log.error(f"[RATE_LIMIT] Error: {e}")
-                # Fail-open
-                pass
-
+            allowed, remaining, retry_ms, reset_ms = await rate_limiter.check(key, capacity, rate, local_precheck)
+            headers = {
+                "X-RateLimit-Limit": str(capacity),
+                "X-RateLimit-Remaining": str(remaining),
+                "X-RateLimit-Reset": str(math.ceil(reset_ms / 1000))
+            }
+            if not allowed:
+                retry_after = max(math.ceil(retry_ms / 1000), 1)
+                raise HTTPException(
+                    status_code=429,
+                    detail=f"Too many requests. Try again in {retry_after} seconds.",
+                    headers={**headers, "Retry-After": str(retry_after)}
+                )
+            if response is not None:
+                response.headers.update(headers)
             return await func(*args, **kwargs)
+
+        wrapper.__signature__ = signature.replace(parameters=params)
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
@@ -1,34 +1,187 @@
+import asyncio
 import redis
+import redis.asyncio
 import logging
+import time
 from datetime import datetime, timedelta
+from typing import Dict
 from app.core.config import settings
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
 
 log = logging.getLogger(__name__)
 
+# Chỉ lỗi kết nối / timeout mới tính là Redis "chết"; lỗi của lệnh (WRONGTYPE, NOSCRIPT...) thì không
+REDIS_FAILURES = (redis.ConnectionError, redis.TimeoutError, OSError)
+# Không để request treo theo socket timeout mặc định (vô hạn) khi Redis chậm
+REDIS_TIMEOUT = 1.0
+redis_breaker = CircuitBreaker("redis")
+
+
+class RedisCircuitOpen(redis.ConnectionError):
+    """Breaker open → lệnh fail ngay như mất kết nối, caller đi đường fallback sẵn có"""
+
+
+def _guarded(fn, *args, **kwargs):
+    try:
+        return redis_breaker.call(fn, *args, failure_types=REDIS_FAILURES, **kwargs)
+    except CircuitOpenError as e:
+        raise RedisCircuitOpen(str(e)) from None
+
+
+class _GuardedPipeline(redis.client.Pipeline):
+    def execute(self, raise_on_error=True):
+        return _guarded(super().execute, raise_on_error)
+
+
+class GuardedRedis(redis.Redis):
+    """
+    Mọi lệnh (kể cả pipeline) đi qua redis_breaker. Khi breaker open, client là falsy
+    → các chỗ `if redis_client:` tự đi nhánh không-Redis (bỏ cache, limiter local...)
+    """
+
+    def execute_command(self, *args, **options):
+        return _guarded(super().execute_command, *args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return _GuardedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+    def __bool__(self):
+        return redis_breaker.available()
+
+
 # Kết nối Redis
 try:
-    redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    redis_client = GuardedRedis.from_url(
+        settings.REDIS_URL, decode_responses=True,
+        socket_timeout=REDIS_TIMEOUT, socket_connect_timeout=REDIS_TIMEOUT
+    )
     redis_client.ping()
     log.info("[BLACKLIST] Redis connected")
 except Exception as e:
     log.error(f"[BLACKLIST] Redis connection failed: {e}")
     redis_client = None
 
+# Key blacklist:{jti} (TTL = thời gian sống còn lại của token) vẫn là nguồn gốc;
+# mỗi worker giữ bản sao trong memory, đồng bộ qua pub/sub → check revoke không tốn round trip.
+BLACKLIST_KEY = "blacklist:{}"
+REVOCATION_CHANNEL = "token_revocations"
+MAX_RETRY_DELAY = 30
+PRUNE_INTERVAL = 60
+
+
+class RevocationSet:
+    def __init__(self):
+        self._revoked: Dict[str, float] = {}  # jti -> epoch hết hạn
+        self._task = None
+        self._pruned_at = time.monotonic()
+        # False khi chưa subscribe / mất kết nối → is_blacklisted hỏi thẳng Redis
+        self.ready = False
+
+    def add(self, jti: str, expires_at: float):
+        self._revoked[jti] = max(expires_at, self._revoked.get(jti, 0))
+
+    def contains(self, jti: str) -> bool:
+        expires_at = self._revoked.get(jti)
+        if expires_at is None:
+            return False
+        if expires_at < time.time():
+            del self._revoked[jti]
+            return False
+        return True
+
+    def _prune(self):
+        self._pruned_at = time.monotonic()
+        now = time.time()
+        for jti in [jti for jti, expires_at in self._revoked.items() if expires_at < now]:
+            del self._revoked[jti]
+
+    def start(self):
+        if redis_client and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._sync())
+
+    async def stop(self):
+        self.ready = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _load(self, client):
+        """Nạp toàn bộ blacklist hiện có (sau khi đã subscribe → không lọt revoke nào ở giữa)"""
+        now = time.time()
+        async for key in client.scan_iter(match=BLACKLIST_KEY.format("*"), count=1000):
+            ttl = await client.ttl(key)
+            if ttl > 0:
+                self.add(key.split(":", 1)[1], now + ttl)
+
+    async def _sync(self):
+        delay = 1
+        while True:
+            client = redis.asyncio.Redis.from_url(
+                settings.REDIS_URL, decode_responses=True, health_check_interval=30,
+                socket_connect_timeout=REDIS_TIMEOUT
+            )
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(REVOCATION_CHANNEL)
+                    await self._load(client)
+                    self.ready = True
+                    delay = 1
+                    log.info(f"[BLACKLIST] Revocation set synced ({len(self._revoked)} tokens)")
+                    async for message in pubsub.listen():
+                        if message.get("type") != "message":
+                            continue
+                        jti, _, expires_at = message["data"].partition(" ")
+                        self.add(jti, float(expires_at or 0))
+                        if time.monotonic() - self._pruned_at > PRUNE_INTERVAL:
+                            self._prune()
+            except asyncio.CancelledError:
+                raise
+            except (redis.RedisError, OSError, ValueError) as e:
+                log.error(f"[BLACKLIST] Revocation sync error, retry in {delay}s: {e}")
+            finally:
+                self.ready = False
+                await client.aclose()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+
+
+revocations = RevocationSet()
+
+
 def add_to_blacklist(jti: str, expire_minutes: int = 15):
+    expires_at = datetime.utcnow() + timedelta(minutes=expire_minutes)
+    revocations.add(jti, time.time() + expire_minutes * 60)
     if not redis_client:
         return
-    expires_at = datetime.utcnow() + timedelta(minutes=expire_minutes)
-    redis_client.setex(f"blacklist:{jti}", expire_minutes * 60, str(expires_at.timestamp()))
+    # SETEX + PUBLISH trong 1 round trip; worker khác (mọi service) nhận qua pub/sub
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.setex(BLACKLIST_KEY.format(jti), expire_minutes * 60, str(expires_at.timestamp()))
+    pipe.publish(REVOCATION_CHANNEL, f"{jti} {time.time() + expire_minutes * 60}")
+    try:
+        pipe.execute()
+    except redis.RedisError as e:
+        # Worker này vẫn chặn token (bản local); worker khác chỉ biết khi Redis về
+        log.error(f"[BLACKLIST] Failed to publish revocation of {jti}: {e}")
+        return
     log.info(f"[BLACKLIST] Token {jti} revoked for {expire_minutes} minutes")
 
+async def ping_redis():
+    """Probe cho /readyz; client sync → chạy trên thread để probe chậm không chặn event loop"""
+    if redis_client is None:
+        raise redis.ConnectionError("Redis not connected")
+    await asyncio.to_thread(redis_client.ping)
+
 def is_blacklisted(jti: str) -> bool:
-    if not redis_client:
-        return False
-    value = redis_client.get(f"blacklist:{jti}")
-    if value:
-        expires_at = float(value)
-        if datetime.utcnow().timestamp() > expires_at:
-            redis_client.delete(f"blacklist:{jti}")
-            return False
-        return True
-    return False
\ No newline at end of file
+    # redis_client falsy cả khi breaker đang open → dùng bản local, không chờ timeout
+    if revocations.ready or not redis_client:
+        return revocations.contains(jti)
+    # Chưa sync được (Redis vừa rớt / đang khởi động) → hỏi thẳng Redis, key tự hết hạn theo TTL
+    try:
+        return redis_client.exists(BLACKLIST_KEY.format(jti)) > 0
+    except redis.RedisError as e:
+        log.warning(f"[BLACKLIST] Redis check failed, using local revocations: {e}")
+        return revocations.contains(jti)
@@ -6,11 +6,37 @@ from app.core.limiter import limiter
 from slowapi.middleware import SlowAPIMiddleware
 from slowapi.errors import RateLimitExceeded
 from app.core.config import get_settings
-from app.core.database import db, movies_collection, watching_progress_collection, ratings_collection
+from app.middlewares.admission import AdmissionControl, AdmissionMiddleware, RouteRule, CRITICAL, LOW
+from app.core.database import db, movies_collection, watching_progress_collection, ratings_collection, ensure_indexes, mongo_breaker
+from app.middlewares.dependency_guard import MongoGuardMiddleware
+from app.core.circuit_breaker import breaker_stats
+from app.core.health import prober
+from app.services.adaptation_service import adaptation_sync
 import asyncio
+from app.core.token_blacklist import revocations, ping_redis
+from app.core.rate_limiter import rate_limiter
 
 app = FastAPI(title="Book Service")
 
+# Admission control: bulkhead cho route đắt + shed theo lag event loop.
+# Thêm trước CORS → CORS bọc ngoài, response 503 vẫn có header CORS.
+admission = AdmissionControl(
+    rules=[
+        RouteRule("health", r"^/(livez|readyz)$", CRITICAL),
+        RouteRule("detail", r"^/api/books/[0-9a-fA-F]{24}$", CRITICAL, ["GET"]),
+        RouteRule("progress", r"^/api/books/([0-9a-fA-F]{24}/progress|progress/batch)$", CRITICAL, ["PUT", "POST"]),
+        RouteRule("chapter_content", r"^/api/books/[0-9a-fA-F]{24}/chapters/\d+/content$"),
+        RouteRule("bundle", r"^/api/books/[0-9a-fA-F]{24}/bundle$", LOW),
+    ],
+    max_in_flight=get_settings().ADMISSION_MAX_IN_FLIGHT,
+    lag_shed_ms=get_settings().ADMISSION_LAG_SHED_MS,
+    bulkheads=get_settings().ADMISSION_BULKHEADS
+)
+app.add_middleware(AdmissionMiddleware, control=admission)
+
+# Mongo breaker open → 503 ngay (trong CORS để response vẫn có header CORS)
+app.add_middleware(MongoGuardMiddleware, breaker=mongo_breaker)
+
 # CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -30,13 +56,35 @@ app.add_middleware(SlowAPIMiddleware)
 
 # Đảm bảo port đúng
 app.include_router(book_routes.router, prefix="/api/books")
+
+@app.on_event("startup")
+async def startup():
+    # /readyz đọc kết quả probe, không ping dependency trên request path
+    prober.register("mongo", lambda: db.command("ping"))
+    prober.register("redis", ping_redis, required=False)
+    prober.start()
+    await ensure_indexes()
+    revocations.start()
+    admission.start()
+    await rate_limiter.start()
+    adaptation_sync.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await prober.stop()
+    await revocations.stop()
+    await admission.stop()
+    await rate_limiter.stop()
+    await adaptation_sync.stop()
+
 @app.exception_handler(RateLimitExceeded)
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     return JSONResponse(
         status_code=exc.status_code,
-        content={"success": False, "error": exc.detail}
+        content={"success": False, "error": exc.detail},
+        headers=getattr(exc, "headers", None)
     )
 
 @app.exception_handler(RateLimitExceeded)
@@ -44,4 +92,15 @@ async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
     return JSONResponse(
         status_code=429,
         content={"success": False, "error": "Too many requests"}
-    )
\ No newline at end of file
+    )
+
+@app.get("/livez")
+async def livez():
+    # Chỉ xác nhận process + event loop còn phục vụ request, không chạm dependency
+    return {"status": "ok", "service": "book_service"}
+
+@app.get("/readyz")
+async def readyz():
+    ready, report = prober.readiness()
+    report["circuitBreakers"] = breaker_stats()
+    return JSONResponse(status_code=200 if ready else 503, content=report)
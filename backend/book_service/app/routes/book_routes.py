@@ -1,5 +1,5 @@
 # app/routes/book_routes.py
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
 from app.controllers.book_controller import *
 from app.schemas.book_dto import *
 from app.core.rate_limiter import rate_limit
@@ -8,8 +8,12 @@ from app.middlewares.jwt_middleware import verify_token, verify_token_optional
 router = APIRouter(tags=["Books"])
 @router.get("/continue-reading")
 async def get_continue_reading(limit: int = 10, user=Depends(verify_token)):
-    print("Worked")
     return await continue_reading_controller(limit, user)
+@router.post("/progress/batch")
+async def reconcile_progress(data: ProgressBatchUpdate, user=Depends(verify_token)):
+    """Sync reading progress recorded offline (latest readAt wins per book)"""
+    return await progress_batch_controller(data, user)
+
 @router.get("")
 async def get_books(query: BookListQuery = Depends(), user=Depends(verify_token_optional)):
     return await book_list_controller(query, user)
@@ -20,8 +24,32 @@ async def get_book_detail(book_id: str, user=Depends(verify_token_optional)):
 
 @router.get("/{book_id}/chapters/{chapter_num}")
 @rate_limit(60, 60)
-async def read_chapter(book_id: str, chapter_num: int, user=Depends(verify_token)):
-    return await read_chapter_controller(book_id, chapter_num, user)
+async def read_chapter(book_id: str, chapter_num: int, response: Response, user=Depends(verify_token)):
+    return await read_chapter_controller(book_id, chapter_num, response, user)
+
+@router.get("/{book_id}/chapters/{chapter_num}/content")
+async def read_chapter_content(
+    book_id: str,
+    chapter_num: int,
+    request: Request,
+    offset: Optional[int] = Query(None, ge=0),
+    length: Optional[int] = Query(None, ge=1),
+    user=Depends(verify_token)
+):
+    """Stream raw chapter text; supports Range: bytes=a-b or ?offset=&length= (does not record progress)"""
+    return await chapter_content_controller(book_id, chapter_num, request, offset, length, user)
+
+@router.get("/{book_id}/bundle")
+@rate_limit(10, 60)
+async def download_bundle(
+    book_id: str,
+    first: int = Query(1, alias="from", ge=1),
+    last: int = Query(..., alias="to", ge=1),
+    format: Literal["ndjson", "zip"] = Query("ndjson"),
+    user=Depends(verify_token)
+):
+    """Stream chapters [from, to] as one bundle for offline reading (gzip NDJSON or ZIP)"""
+    return await chapter_bundle_controller(book_id, first, last, format, user)
 
 @router.put("/{book_id}/progress")
 async def update_progress(book_id: str, data: BookProgressUpdate, user=Depends(verify_token)):
@@ -29,4 +29,12 @@ class BookListQuery(BaseModel):
     sortBy: Optional[Literal["title", "publishYear", "rating"]] = "title"
 
 class ContinueReadingQuery(BaseModel):
-    limit: int = Field(10, ge=1, le=50)
\ No newline at end of file
+    limit: int = Field(10, ge=1, le=50)
+
+class ProgressBatchItem(BaseModel):
+    bookId: str
+    currentChapter: int = Field(..., ge=1)
+    readAt: Optional[datetime] = None  # Thời điểm đọc trên máy (offline), mặc định = lúc sync
+
+class ProgressBatchUpdate(BaseModel):
+    updates: List[ProgressBatchItem] = Field(..., min_length=1, max_length=100)
@@ -0,0 +1,169 @@
+# app/services/adaptation_service.py
+import asyncio
+import logging
+from typing import List
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure, PyMongoError
+from app.core.database import db, books_collection, movies_collection, change_streams_unsupported
+
+log = logging.getLogger(__name__)
+
+# books.adaptedMovies = [{id, title, releaseYear}] là bản snapshot của các phim trong
+# books.movieAdaptations (chỉ phim còn active), để list/detail sách không phải join sang movies.
+# Snapshot được build lại khi:
+#   - phim đổi title / releaseYear / isActive / isDeleted, hoặc bị xoá
+#   - sách đổi movieAdaptations
+SNAPSHOT_MOVIE_FIELDS = ("title", "releaseYear", "isActive", "isDeleted")
+MAX_RETRY_DELAY = 30
+# Mongo standalone không có change stream → reconcile toàn bộ snapshot theo chu kỳ
+RECONCILE_INTERVAL = 60
+
+WATCH_PIPELINE = [{"$match": {"$or": [
+    {"ns.coll": "movies", "operationType": {"$in": ["insert", "replace", "delete"]}},
+    {"ns.coll": "movies", "operationType": "update", "$or": [
+        {f"updateDescription.updatedFields.{field}": {"$exists": True}} for field in SNAPSHOT_MOVIE_FIELDS
+    ]},
+    {"ns.coll": "books", "operationType": {"$in": ["insert", "replace", "update"]}}
+]}}]
+
+
+async def build_adapted_movies(movie_ids: List[ObjectId]) -> List[dict]:
+    """Snapshot của các phim active, giữ thứ tự trong movieAdaptations"""
+    if not movie_ids:
+        return []
+    docs = await movies_collection.find(
+        {"_id": {"$in": movie_ids}, "isActive": True, "isDeleted": {"$ne": True}},
+        {"title": 1, "releaseYear": 1}
+    ).to_list(len(movie_ids))
+    by_id = {doc["_id"]: doc for doc in docs}
+    return [
+        {"id": str(mid), "title": by_id[mid]["title"], "releaseYear": by_id[mid].get("releaseYear")}
+        for mid in movie_ids if mid in by_id
+    ]
+
+
+async def refresh_book_adaptations(book_id: ObjectId):
+    book = await books_collection.find_one({"_id": book_id}, {"movieAdaptations": 1, "adaptedMovies": 1})
+    if not book:
+        return
+    snapshot = await build_adapted_movies(book.get("movieAdaptations") or [])
+    if snapshot != book.get("adaptedMovies"):
+        await books_collection.update_one({"_id": book_id}, {"$set": {"adaptedMovies": snapshot}})
+
+
+async def refresh_movie_adaptations(movie_id: ObjectId):
+    async for book in books_collection.find({"movieAdaptations": movie_id}, {"_id": 1}):
+        await refresh_book_adaptations(book["_id"])
+
+
+async def refresh_all_adaptations() -> int:
+    """Build lại snapshot của mọi sách có phim chuyển thể (1 query movies), trả số sách đã đổi"""
+    books = await books_collection.find(
+        {"$or": [{"movieAdaptations.0": {"$exists": True}}, {"adaptedMovies.0": {"$exists": True}}]},
+        {"movieAdaptations": 1, "adaptedMovies": 1}
+    ).to_list(None)
+    movie_ids = list({mid for book in books for mid in book.get("movieAdaptations") or []})
+    movies = {}
+    if movie_ids:
+        docs = await movies_collection.find(
+            {"_id": {"$in": movie_ids}, "isActive": True, "isDeleted": {"$ne": True}},
+            {"title": 1, "releaseYear": 1}
+        ).to_list(len(movie_ids))
+        movies = {doc["_id"]: doc for doc in docs}
+
+    updates = []
+    for book in books:
+        snapshot = [
+            {"id": str(mid), "title": movies[mid]["title"], "releaseYear": movies[mid].get("releaseYear")}
+            for mid in book.get("movieAdaptations") or [] if mid in movies
+        ]
+        if snapshot != book.get("adaptedMovies"):
+            updates.append(UpdateOne({"_id": book["_id"]}, {"$set": {"adaptedMovies": snapshot}}))
+    if updates:
+        await books_collection.bulk_write(updates, ordered=False)
+    return len(updates)
+
+
+def _touches_adaptations(change: dict) -> bool:
+    if change["operationType"] != "update":
+        return True
+    fields = change.get("updateDescription", {})
+    keys = list(fields.get("updatedFields", {})) + list(fields.get("removedFields", []))
+    # $push vào mảng sẽ ra key dạng "movieAdaptations.1"
+    return any(key.split(".")[0] == "movieAdaptations" for key in keys)
+
+
+class AdaptationSync:
+    """
+    1 change stream (movies + books) / worker giữ adaptedMovies luôn khớp.
+    Change stream cần replica set; trên mongod standalone chuyển sang refresh_all_adaptations
+    mỗi RECONCILE_INTERVAL giây (snapshot trễ tối đa 1 chu kỳ).
+    """
+
+    def __init__(self):
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _dispatch(self, change: dict):
+        doc_id = change["documentKey"]["_id"]
+        if change["ns"]["coll"] == "movies":
+            await refresh_movie_adaptations(doc_id)
+        elif _touches_adaptations(change):
+            await refresh_book_adaptations(doc_id)
+
+    async def _watch(self):
+        resume_token = None
+        delay = 1
+        while True:
+            try:
+                async with db.watch(WATCH_PIPELINE, resume_after=resume_token) as stream:
+                    delay = 1
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        try:
+                            await self._dispatch(change)
+                        except Exception as e:
+                            log.error(f"[ADAPTATIONS] Refresh failed: {e}")
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                if change_streams_unsupported(e):
+                    log.warning(
+                        "[ADAPTATIONS] Change streams need a replica set, "
+                        f"reconciling every {RECONCILE_INTERVAL}s instead"
+                    )
+                    return await self._reconcile()
+                log.error(f"[ADAPTATIONS] Change stream error, retry in {delay}s: {e}")
+                if isinstance(e, OperationFailure):
+                    resume_token = None
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+
+    async def _reconcile(self):
+        while True:
+            try:
+                updated = await refresh_all_adaptations()
+                if updated:
+                    log.info(f"[ADAPTATIONS] Reconciled adaptedMovies on {updated} books")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f"[ADAPTATIONS] Reconcile failed: {e}")
+            await asyncio.sleep(RECONCILE_INTERVAL)
+
+
+adaptation_sync = AdaptationSync()
@@ -4,10 +4,19 @@ from datetime import datetime
 from fastapi import HTTPException
 from app.core.response import success, fail
 from app.core.database import (
-    books_collection, movies_collection, reading_progress_collection,
+    books_collection, reading_progress_collection,
     ratings_collection, users_collection
 )
 from app.schemas.book_dto import *
+from app.services.chapter_store import (
+    get_chapter, iter_chapter_bytes, iter_chapter_metas, list_chapters, parse_range
+)
+from app.services.chapter_bundle_service import MAX_BUNDLE_CHAPTERS, ndjson_bundle, zip_bundle
+from app.services.chapter_cache import BOOK_HEADER_PROJECTION, chapter_cache
+from app.services.content_stats_service import get_content_stats, rating_average, record_rating, summarize
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from datetime import timezone
 import json
 
 # Redis
@@ -15,6 +24,9 @@ async def get_redis():
     from app.core.token_blacklist import redis_client
     return redis_client
 
+# List / detail nhúng content_stats (rating, comment) + adaptedMovies → TTL ngắn để không lệch lâu
+CACHE_TTL = 60
+
 def cache_key(prefix: str, **kwargs):
     safe_kwargs = {}
     for k, v in kwargs.items():
@@ -26,14 +38,62 @@ def cache_key(prefix: str, **kwargs):
             safe_kwargs[k] = str(v)
     return f"{prefix}:{json.dumps(safe_kwargs, sort_keys=True)}"
 
+def _total_chapters(book: dict) -> int:
+    # totalChapters được set khi import nội dung thật (import_book_chapters.py);
+    # sách chưa import vẫn dùng số chapter ước lượng từ totalPages
+    return book.get("totalChapters") or book.get("totalPages", 30) // 10 or 30
+
+def _placeholder_chapter(chapter_num: int):
+    return {
+        "number": chapter_num,
+        "title": f"Chapter {chapter_num}: Sample Content",
+        "content": f"This is the content of chapter {chapter_num}..." * 50,
+        "wordCount": 5000
+    }
+
+def _percentage(book: dict, chapter_num: int) -> float:
+    return round(chapter_num / _total_chapters(book) * 100, 2)
+
+def _progress_fields(book: dict, chapter_num: int):
+    """
+    Field của reading_progress ghi lúc đọc. Title / cover / tổng chapter / % không lưu vào progress:
+    continue-reading đằng nào cũng load header sách để bỏ sách đã ẩn, nên tính từ header mới nhất.
+    """
+    return {
+        "currentChapter": chapter_num,
+        "isCompleted": chapter_num >= _total_chapters(book)
+    }
+
+BOOK_CARD_PROJECTION = {
+    "title": 1, "author": 1, "description": 1, "coverImageUrl": 1,
+    "categories": 1, "publishYear": 1, "totalPages": 1, "totalChapters": 1, "adaptedMovies": 1
+}
+
+def _book_card(doc: dict):
+    adapted = doc.get("adaptedMovies") or []
+    return {
+        "_id": str(doc["_id"]),
+        "id": str(doc["_id"]),
+        "title": doc.get("title"),
+        "author": doc.get("author"),
+        "description": doc.get("description"),
+        "thumbnail": doc.get("coverImageUrl"),
+        "genres": doc.get("categories"),
+        "publishYear": doc.get("publishYear"),
+        "totalChapters": doc.get("totalChapters") or (30 if doc.get("totalPages") is None else doc["totalPages"]),
+        "adaptedMovie": {"id": adapted[0]["id"], "title": adapted[0]["title"]} if adapted else None,
+        "adaptedMovies": adapted
+    }
+
 # === GET BOOK LIST (ONLY ADAPTED) ===
 async def get_book_list(query: BookListQuery, user_id: Optional[str] = None):
     cache = await get_redis()
-    key = cache_key("book_list", **query.dict(), user_id=user_id or "guest")
+    # Kết quả không phụ thuộc user → 1 bản cache chung cho mọi người
+    key = cache_key("book_list", **query.dict())
 
     if cache:
         try:
-            cached = await cache.get(key)
+            cached = cache.get(key)
             if cached:
                 return json.loads(cached)
         except:
@@ -42,50 +102,30 @@ async def get_book_list(query: BookListQuery, user_id: Optional[str] = None):
     match_stage = {
         "isActive": True,
         "isDeleted": False,
-        "movieAdaptations.0": {"$exists": True}  # Chỉ sách có phim
+        "adaptedMovies.0": {"$exists": True}  # Chỉ sách có phim (snapshot, không cần $lookup)
     }
     if query.genre:
         match_stage["categories"] = query.genre
 
     sort_field = query.sortBy
     if sort_field == "title":
-        sort_key = {"title": 1}
+        sort_key = [("title", 1)]
     elif sort_field == "publishYear":
-        sort_key = {"publishYear": -1}
+        sort_key = [("publishYear", -1)]
     else:
-        sort_key = {"rating": -1}
-
-    pipeline = [
-        {"$match": match_stage},
-        {"$sort": sort_key},
-        {"$skip": (query.page - 1) * query.limit},
-        {"$limit": query.limit},
-        {"$lookup": {
-            "from": "movies",
-            "localField": "movieAdaptations",
-            "foreignField": "_id",
-            "as": "movies"
-        }},
-        {"$unwind": "$movies"},
-        {"$project": {
-            "id": {"$toString": "$_id"},
-            "title": 1,
-            "author": 1,
-            "description": 1,
-            "thumbnail": "$coverImageUrl",
-            "genres": "$categories",
-            "publishYear": 1,
-            "totalChapters": {"$ifNull": ["$totalPages", 30]},
-            "adaptedMovie": {
-                "id": {"$toString": "$movies._id"},
-                "title": "$movies.title"
-            }
-        }}
-    ]
+        sort_key = [("rating", -1)]
 
-    books = await books_collection.aggregate(pipeline).to_list(query.limit)
+    # 1 query trên partial index {isActive, isDeleted, <sort>} của sách có phim
+    cursor = books_collection.find(match_stage, BOOK_CARD_PROJECTION).sort(sort_key)
+    cursor = cursor.skip((query.page - 1) * query.limit).limit(query.limit)
+    books = [_book_card(doc) async for doc in cursor]
     total = await books_collection.count_documents(match_stage)
 
+    # Comment/rating counters cho cả trang: 1 query $in
+    stats = await get_content_stats(b["_id"] for b in books)
+    for book in books:
+        book["stats"] = stats.get(str(book["_id"])) or summarize(None)
+
     result = {
         "books": books,
         "pagination": {"total": total, "page": query.page, "limit": query.limit}
@@ -93,7 +133,7 @@ async def get_book_list(query: BookListQuery, user_id: Optional[str] = None):
 
     if cache:
         try:
-            await cache.setex(key, 300, json.dumps(result))
+            cache.setex(key, CACHE_TTL, json.dumps(result, default=str))
         except:
             pass
 
@@ -104,11 +144,12 @@ async def get_book_detail(book_id: str, user_id: Optional[str] = None):
     if not ObjectId.is_valid(book_id):
         raise HTTPException(404, "Book not found")
 
-    cache = await get_redis()
-    key = cache_key("book_detail", book_id=book_id, user_id=user_id or "guest")
+    # Chỉ cache bản guest: bản của user có userProgress đổi sau mỗi chapter
+    cache = await get_redis() if not user_id else None
+    key = cache_key("book_detail", book_id=book_id)
     if cache:
         try:
-            cached = await cache.get(key)
+            cached = cache.get(key)
             if cached:
                 return json.loads(cached)
         except:
@@ -123,19 +164,9 @@ async def get_book_detail(book_id: str, user_id: Optional[str] = None):
     if not book:
         raise HTTPException(404, "Book not found")
 
-    # Lấy phim chuyển thể
-    movie = None
-    if book.get("movieAdaptations"):
-        movie_doc = await movies_collection.find_one({
-            "_id": {"$in": book["movieAdaptations"]},
-            "isActive": True
-        })
-        if movie_doc:
-            movie = {
-                "id": str(movie_doc["_id"]),
-                "title": movie_doc["title"],
-                "releaseYear": movie_doc.get("releaseYear")
-            }
+    # Phim chuyển thể: đọc từ snapshot adaptedMovies
+    adapted = book.get("adaptedMovies") or []
+    movie = adapted[0] if adapted else None
 
     # Lấy progress nếu có user
     user_progress = None
@@ -150,12 +181,15 @@ async def get_book_detail(book_id: str, user_id: Optional[str] = None):
                 "lastReadAt": progress.get("updatedAt")
             }
 
-    # Giả lập chapters
-    total_chapters = book.get("totalPages", 30) // 10 or 30
-    chapters = [
-        {"number": i, "title": f"Chapter {i}", "wordCount": 5000}
-        for i in range(1, total_chapters + 1)
-    ]
+    # Danh sách chapter từ chapter store (chỉ metadata, không đọc nội dung)
+    total_chapters = _total_chapters(book)
+    if book.get("totalChapters"):
+        chapters = await list_chapters(book["_id"])
+    else:
+        chapters = [
+            {"number": i, "title": f"Chapter {i}", "wordCount": 5000}
+            for i in range(1, total_chapters + 1)
+        ]
 
     result = {
         "id": str(book["_id"]),
@@ -167,13 +201,14 @@ async def get_book_detail(book_id: str, user_id: Optional[str] = None):
         "publishYear": book.get("publishYear"),
         "totalChapters": total_chapters,
         "adaptedMovie": movie,
+        "adaptedMovies": adapted,
         "chapters": chapters,
         "userProgress": user_progress
     }
 
     if cache:
         try:
-            await cache.setex(key, 300, json.dumps(result))
+            cache.setex(key, CACHE_TTL, json.dumps(result, default=str))
         except:
             pass
 
@@ -184,25 +219,36 @@ async def read_book_chapter(book_id: str, chapter_num: int, user_id: str):
     if not ObjectId.is_valid(book_id):
         raise HTTPException(404, "Book not found")
 
-    book = await books_collection.find_one({
-        "_id": ObjectId(book_id),
-        "isActive": True,
-        "isDeleted": False
-    })
+    # Book header + nội dung chapter đều lấy qua cache trong memory
+    book = await chapter_cache.get_book(ObjectId(book_id))
     if not book:
         raise HTTPException(404, "Book not found")
 
-    total_chapters = book.get("totalPages", 30) // 10 or 30
+    total_chapters = _total_chapters(book)
     if chapter_num < 1 or chapter_num > total_chapters:
         raise HTTPException(404, "Chapter not found")
 
+    if book.get("totalChapters"):
+        entry = await chapter_cache.get(book["_id"], chapter_num)
+        if not entry:
+            raise HTTPException(404, "Chapter not found")
+        meta, data = entry
+        chapter = {
+            "number": chapter_num,
+            "title": meta.get("title") or f"Chapter {chapter_num}",
+            "content": data.decode("utf-8"),
+            "wordCount": meta.get("wordCount", 0)
+        }
+        # Người đọc thường lật sang chapter kế tiếp → load sẵn
+        if chapter_num < total_chapters:
+            chapter_cache.prefetch(book["_id"], chapter_num + 1)
+    else:
+        chapter = _placeholder_chapter(chapter_num)
+
     # Cập nhật progress
     await reading_progress_collection.update_one(
         {"userId": ObjectId(user_id), "bookId": ObjectId(book_id)},
-        {"$set": {
-            "currentChapter": chapter_num,
-            "updatedAt": datetime.utcnow()
-        }},
+        {"$set": {**_progress_fields(book, chapter_num), "updatedAt": datetime.utcnow()}},
         upsert=True
     )
 
@@ -216,46 +262,187 @@ async def read_book_chapter(book_id: str, chapter_num: int, user_id: str):
 
     return {
         "bookId": book_id,
-        "chapter": {
-            "number": chapter_num,
-            "title": f"Chapter {chapter_num}: Sample Content",
-            "content": f"This is the content of chapter {chapter_num}..." * 50,
-            "wordCount": 5000
-        },
+        "chapter": chapter,
         "navigation": nav
     }
 
+# === STREAM CHAPTER CONTENT ===
+async def open_chapter_stream(book_id: str, chapter_num: int, range_header: Optional[str] = None,
+                              offset: Optional[int] = None, length: Optional[int] = None):
+    """
+    Chuẩn bị stream nội dung 1 chapter: trả (body iterator, start, end, byteLength, partial).
+    Hỗ trợ header Range (bytes=a-b) hoặc ?offset=&length= cho chapter dài.
+    """
+    if not ObjectId.is_valid(book_id):
+        raise HTTPException(404, "Book not found")
+
+    book = await chapter_cache.get_book(ObjectId(book_id))
+    if not book:
+        raise HTTPException(404, "Book not found")
+
+    cached = chapter_cache.peek(book["_id"], chapter_num) if book.get("totalChapters") else None
+    meta = None
+    if cached:
+        meta, data = cached
+
+        async def body(start, end):
+            yield data[start:end]
+    elif book.get("totalChapters"):
+        meta = await get_chapter(book["_id"], chapter_num)
+
+        def body(start, end):
+            return iter_chapter_bytes(meta, start, end)
+
+    if meta and chapter_num < _total_chapters(book):
+        chapter_cache.prefetch(book["_id"], chapter_num + 1)
+
+    if not meta:
+        if book.get("totalChapters") or chapter_num < 1 or chapter_num > _total_chapters(book):
+            raise HTTPException(404, "Chapter not found")
+        # Sách chưa import nội dung: stream nội dung mẫu
+        raw = _placeholder_chapter(chapter_num)["content"].encode("utf-8")
+        meta = {"byteLength": len(raw)}
+
+        async def body(start, end):
+            yield raw[start:end]
+
+    size = meta["byteLength"]
+    byte_range = parse_range(range_header, size)
+    if byte_range is None and (offset is not None or length is not None):
+        start = offset or 0
+        byte_range = parse_range(f"bytes={start}-{start + length - 1 if length else ''}", size)
+
+    start, end = byte_range or (0, size)
+    return body(start, end), start, end, size, byte_range is not None
+
+# === OFFLINE BUNDLE ===
+async def open_chapter_bundle(book_id: str, first: int, last: int, fmt: str):
+    """
+    Stream chapter [first, last] trong 1 response (zip hoặc gzip ndjson).
+    Trả (body iterator, media_type, headers); không ghi progress (dùng progress/batch sau khi đọc).
+    """
+    if not ObjectId.is_valid(book_id):
+        raise HTTPException(404, "Book not found")
+
+    book = await chapter_cache.get_book(ObjectId(book_id))
+    if not book:
+        raise HTTPException(404, "Book not found")
+
+    total_chapters = _total_chapters(book)
+    last = min(last, total_chapters)
+    if first < 1 or first > last:
+        raise HTTPException(404, "Chapter not found")
+    if last - first + 1 > MAX_BUNDLE_CHAPTERS:
+        raise HTTPException(400, f"A bundle can hold at most {MAX_BUNDLE_CHAPTERS} chapters")
+
+    async def chapters():
+        if book.get("totalChapters"):
+            async for meta in iter_chapter_metas(book["_id"], first, last):
+                yield (
+                    meta["number"],
+                    meta.get("title") or f"Chapter {meta['number']}",
+                    meta.get("wordCount", 0),
+                    iter_chapter_bytes(meta)
+                )
+            return
+        for number in range(first, last + 1):
+            chapter = _placeholder_chapter(number)
+
+            async def parts(content=chapter["content"]):
+                yield content.encode("utf-8")
+
+            yield number, chapter["title"], chapter["wordCount"], parts()
+
+    filename = f"book-{book_id}-{first}-{last}"
+    if fmt == "zip":
+        return zip_bundle(book, chapters()), "application/zip", {
+            "Content-Disposition": f'attachment; filename="{filename}.zip"'
+        }
+    return ndjson_bundle(book, chapters()), "application/x-ndjson", {
+        "Content-Encoding": "gzip",
+        "Content-Disposition": f'attachment; filename="{filename}.ndjson"'
+    }
+
+# === RECONCILE PROGRESS (BATCH) ===
+async def reconcile_reading_progress(user_id: str, data: ProgressBatchUpdate):
+    """
+    Đồng bộ progress đọc offline: 1 query lấy sách + 1 bulk_write cho cả batch.
+    Bản ghi mới nhất thắng (so readAt với updatedAt đang lưu), nên gửi lại batch cũ là an toàn.
+    """
+    now = datetime.utcnow()
+    latest = {}
+    for item in data.updates:
+        if not ObjectId.is_valid(item.bookId):
+            continue
+        read_at = item.readAt or now
+        if read_at.tzinfo:
+            read_at = read_at.astimezone(timezone.utc).replace(tzinfo=None)
+        read_at = min(read_at, now)  # Không tin đồng hồ máy client chạy nhanh
+        current = latest.get(item.bookId)
+        if not current or read_at > current[1]:
+            latest[item.bookId] = (item.currentChapter, read_at)
+
+    books = await books_collection.find(
+        {"_id": {"$in": [ObjectId(b) for b in latest]}, "isActive": True, "isDeleted": False},
+        BOOK_HEADER_PROJECTION
+    ).to_list(len(latest))
+    books = {str(b["_id"]): b for b in books}
+    totals = {book_id: _total_chapters(b) for book_id, b in books.items()}
+
+    results = []
+    operations = []
+    user_oid = ObjectId(user_id)
+    for item in data.updates:
+        if item.bookId not in totals:
+            results.append({"bookId": item.bookId, "status": "not_found"})
+        elif item.currentChapter > totals[item.bookId]:
+            results.append({"bookId": item.bookId, "status": "invalid_chapter"})
+        else:
+            results.append({"bookId": item.bookId, "status": "ok"})
+
+    for book_id, (chapter, read_at) in latest.items():
+        if book_id not in totals or chapter > totals[book_id]:
+            continue
+        is_newer = {"$gt": [read_at, {"$ifNull": ["$updatedAt", datetime.min]}]}
+        fields = {**_progress_fields(books[book_id], chapter), "updatedAt": read_at}
+        operations.append(UpdateOne(
+            {"userId": user_oid, "bookId": ObjectId(book_id)},
+            [{"$set": {
+                key: {"$cond": [is_newer, {"$literal": value}, f"${key}"]}
+                for key, value in fields.items()
+            }}],
+            upsert=True
+        ))
+
+    if operations:
+        await reading_progress_collection.bulk_write(operations, ordered=False)
+
+    return {"applied": len(operations), "results": results}
+
 # === UPDATE PROGRESS ===
 async def update_reading_progress(book_id: str, data: BookProgressUpdate, user_id: str):
     if not ObjectId.is_valid(book_id):
         raise HTTPException(404, "Book not found")
 
-    book = await books_collection.find_one({
-        "_id": ObjectId(book_id),
-        "isActive": True,
-        "isDeleted": False
-    })
+    book = await chapter_cache.get_book(ObjectId(book_id))
     if not book:
         raise HTTPException(404, "Book not found")
 
-    total_chapters = book.get("totalPages", 30) // 10 or 30
+    total_chapters = _total_chapters(book)
     if data.currentChapter > total_chapters:
         raise HTTPException(400, "Invalid chapter number")
 
+    now = datetime.utcnow()
     await reading_progress_collection.update_one(
         {"userId": ObjectId(user_id), "bookId": ObjectId(book_id)},
-        {"$set": {
-            "currentChapter": data.currentChapter,
-            "updatedAt": datetime.utcnow()
-        }},
+        {"$set": {**_progress_fields(book, data.currentChapter), "updatedAt": now}},
         upsert=True
     )
 
-    percentage = round((data.currentChapter / total_chapters) * 100, 2)
     return {
         "currentChapter": data.currentChapter,
-        "percentage": percentage,
-        "lastReadAt": datetime.utcnow().isoformat() + "Z"
+        "percentage": _percentage(book, data.currentChapter),
+        "lastReadAt": now.isoformat() + "Z"
     }
 
 # === RATE BOOK ===
@@ -272,20 +459,23 @@ async def rate_book(book_id: str, data: BookRating, user_id: str):
         raise HTTPException(404, "Book not found")
 
     # Cập nhật rating
-    result = await ratings_collection.update_one(
-        {"userId": ObjectId(user_id), "bookId": ObjectId(book_id)},
-        {"$set": {"rating": data.rating, "updatedAt": datetime.utcnow()}},
-        upsert=True
-    )
-
-    # Tính avg
-    pipeline = [
-        {"$match": {"bookId": ObjectId(book_id)}},
-        {"$group": {"_id": None, "avg": {"$avg": "$rating"}, "count": {"$sum": 1}}}
-    ]
-    avg_result = await ratings_collection.aggregate(pipeline).to_list(1)
-    avg_rating = round(avg_result[0]["avg"], 1) if avg_result else 0
-    total = avg_result[0]["count"] if avg_result else 0
+    rating_filter = {"userId": ObjectId(user_id), "bookId": ObjectId(book_id)}
+    rating_update = {"$set": {"rating": data.rating, "updatedAt": datetime.utcnow()}}
+    try:
+        previous = await ratings_collection.find_one_and_update(
+            rating_filter, rating_update, upsert=True, return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        # Upsert song song (double-submit) đã insert trước → update lại để lấy đúng rating cũ,
+        # tránh cả 2 request cùng thấy previous=None và $inc ratingCount 2 lần
+        previous = await ratings_collection.find_one_and_update(
+            rating_filter, rating_update, return_document=ReturnDocument.BEFORE
+        )
+
+    # Tính avg từ counters ($inc) thay vì $group lại toàn bộ ratings
+    stats = await record_rating("book", book_id, data.rating, previous["rating"] if previous else None)
+    avg_rating = rating_average(stats)
+    total = stats.get("ratingCount", 0) if stats else 0
 
     # Cập nhật avg vào book
     await books_collection.update_one(
@@ -298,73 +488,48 @@ async def rate_book(book_id: str, data: BookRating, user_id: str):
         "bookAvgRating": avg_rating,
         "totalRatings": total
     }
-# app/services/book_service.py
-# app/services/book_service.py
-# ... (các hàm khác giữ nguyên)
+# Sách đã ẩn bị bỏ sau khi join → đọc progress theo lô lớn hơn limit, đọc tiếp nếu vẫn thiếu
+CONTINUE_READING_OVERFETCH = 2
 
 async def get_continue_reading(limit: int, user_id: str):
-    print(f"DEBUG: get_continue_reading | user_id = {user_id}")
-
-    pipeline = [
-        # 1. Lấy tất cả reading progress của user
-        {"$match": {"userId": ObjectId(user_id)}},
-
-        # 2. Join với books
-        {"$lookup": {
-            "from": "books",
-            "localField": "bookId",
-            "foreignField": "_id",
-            "as": "book"
-        }},
-        {"$unwind": "$book"},
-
-        # 3. Lọc: sách active + chưa hoàn thành
-        {"$match": {
-            "book.isActive": True,
-            "book.isDeleted": {"$ne": True},
-            "isCompleted": {"$ne": True}  # ← CHỈ SÁCH CHƯA HOÀN THÀNH
-        }},
-
-        # 4. Sắp xếp theo lastReadAt (mới nhất trước)
-        {"$sort": {"updatedAt": -1}},
-
-        # 5. Giới hạn
-        {"$limit": limit},
-
-        # 6. Project kết quả
-        {"$project": {
-            "id": {"$toString": "$book._id"},
-            "title": "$book.title",
-            "thumbnail": "$book.coverImageUrl",
-            "progress": {
-                "currentChapter": {"$ifNull": ["$currentChapter", 0]},  # ← Cho phép 0
-                "totalChapters": {
-                    "$ifNull": [
-                        {"$ceil": {"$divide": ["$book.totalPages", 10]}},
-                        30
-                    ]
-                },
-                "percentage": {
-                    "$round": [
-                        {"$multiply": [
-                            {"$divide": [
-                                {"$ifNull": ["$currentChapter", 0]},
-                                {"$ifNull": [
-                                    {"$ceil": {"$divide": ["$book.totalPages", 10]}},
-                                    30
-                                ]}
-                            ]},
-                            100
-                        ]},
-                        2
-                    ]
-                },
-                "lastReadAt": "$updatedAt"
-            }
-        }}
-    ]
-
-    books = await reading_progress_collection.aggregate(pipeline).to_list(limit)
-    print(f"DEBUG: Found {len(books)} in-progress books")
-
-    return {"books": books}
\ No newline at end of file
+    # 1. Progress chưa hoàn thành của user, sort trên index {userId, updatedAt}
+    batch = max(limit, 1) * CONTINUE_READING_OVERFETCH
+    cursor = reading_progress_collection.find(
+        {"userId": ObjectId(user_id), "isCompleted": {"$ne": True}},
+        {"bookId": 1, "currentChapter": 1, "updatedAt": 1}
+    ).sort("updatedAt", -1).batch_size(batch)
+
+    result = []
+    while len(result) < limit:
+        docs = await cursor.to_list(batch)
+        if not docs:
+            break
+
+        # 2. Chỉ join lô vừa đọc: bỏ sách đã ẩn; title / cover / số chapter lấy từ header mới nhất
+        books = await books_collection.find(
+            {"_id": {"$in": [d["bookId"] for d in docs]}, "isActive": True, "isDeleted": {"$ne": True}},
+            BOOK_HEADER_PROJECTION
+        ).to_list(len(docs))
+        books = {b["_id"]: b for b in books}
+
+        for doc in docs:
+            book = books.get(doc["bookId"])
+            if not book:
+                continue
+            current_chapter = doc.get("currentChapter") or 0
+            result.append({
+                "id": str(doc["bookId"]),
+                "title": book.get("title"),
+                "thumbnail": book.get("coverImageUrl"),
+                "progress": {
+                    "currentChapter": current_chapter,
+                    "totalChapters": _total_chapters(book),
+                    "percentage": _percentage(book, current_chapter),
+                    "lastReadAt": doc.get("updatedAt")
+                }
+            })
+            if len(result) >= limit:
+                break
+    await cursor.close()
+
+    return {"books": result}
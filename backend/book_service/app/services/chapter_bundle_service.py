@@ -0,0 +1,86 @@
+# app/services/chapter_bundle_service.py
+import json
+import zipfile
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Tuple
+
+# Bundle offline: nhiều chapter trong 1 response, sinh dần bằng generator → không
+# giữ cả bundle trong memory (tối đa 1 chapter với NDJSON, 1 chunk với ZIP).
+MAX_BUNDLE_CHAPTERS = 50
+
+# (number, title, wordCount, async iterator các đoạn bytes UTF-8)
+BundleChapter = Tuple[int, str, int, AsyncIterator[bytes]]
+
+
+class _ZipSink:
+    """File-like chỉ ghi (không seek) → zipfile dùng data descriptor, ghi tuần tự được"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def _manifest(book: dict, chapters: list) -> dict:
+    return {
+        "bookId": str(book["_id"]),
+        "totalChapters": book.get("totalChapters"),
+        "chapters": chapters,
+        "generatedAt": datetime.utcnow().isoformat() + "Z"
+    }
+
+
+async def zip_bundle(book: dict, chapters: AsyncIterator[BundleChapter]) -> AsyncIterator[bytes]:
+    """chapters/0001.txt, chapters/0002.txt ... + manifest.json"""
+    sink = _ZipSink()
+    manifest = []
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        async for number, title, word_count, parts in chapters:
+            name = f"chapters/{number:04d}.txt"
+            with archive.open(name, "w") as entry:
+                async for part in parts:
+                    entry.write(part)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            manifest.append({"number": number, "title": title, "wordCount": word_count, "file": name})
+            yield sink.drain()
+        archive.writestr("manifest.json", json.dumps(_manifest(book, manifest), ensure_ascii=False))
+    yield sink.drain()
+
+
+async def ndjson_bundle(book: dict, chapters: AsyncIterator[BundleChapter]) -> AsyncIterator[bytes]:
+    """
+    Gzip NDJSON: 1 dòng / chapter {"number", "title", "wordCount", "content"},
+    dòng cuối là manifest {"manifest": {...}}
+    """
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31)
+    manifest = []
+    async for number, title, word_count, parts in chapters:
+        content = b"".join([part async for part in parts]).decode("utf-8")
+        line = json.dumps(
+            {"number": number, "title": title, "wordCount": word_count, "content": content},
+            ensure_ascii=False
+        )
+        manifest.append({"number": number, "title": title, "wordCount": word_count})
+        data = gzip.compress(line.encode("utf-8") + b"\n")
+        if data:
+            yield data
+    yield gzip.compress(json.dumps({"manifest": _manifest(book, manifest)}).encode("utf-8") + b"\n")
+    yield gzip.flush()
@@ -0,0 +1,141 @@
+# app/services/chapter_cache.py
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from bson import ObjectId
+from app.core.config import settings
+from app.core.database import books_collection
+from app.services.chapter_store import get_chapter, iter_chapter_bytes
+
+log = logging.getLogger(__name__)
+
+# LRU nội dung chapter đã giải nén, giới hạn theo tổng số byte (mỗi worker 1 bản).
+# TTL để nhận chapter import lại (contentId mới) mà không cần invalidation.
+ENTRY_TTL = 300
+BOOK_TTL = 60
+# Đủ để phân trang chapter + ghi progress (card sách được lưu sẵn trên reading_progress)
+BOOK_HEADER_PROJECTION = {"title": 1, "coverImageUrl": 1, "totalChapters": 1, "totalPages": 1}
+MAX_BOOK_HEADERS = 5000
+
+ChapterEntry = Tuple[dict, bytes]
+
+
+class ChapterCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, int], tuple]" = OrderedDict()
+        self._size = 0
+        self._inflight: Dict[Tuple[str, int], asyncio.Future] = {}
+        self._books: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.prefetches = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    # ---------- book header (totalChapters) ----------
+    async def get_book(self, book_id: ObjectId) -> Optional[dict]:
+        """Book active (chỉ các field trong BOOK_HEADER_PROJECTION), cache BOOK_TTL giây"""
+        key = str(book_id)
+        entry = self._books.get(key)
+        if entry and entry[0] > time.monotonic():
+            self._books.move_to_end(key)
+            return entry[1]
+
+        book = await books_collection.find_one(
+            {"_id": book_id, "isActive": True, "isDeleted": False},
+            BOOK_HEADER_PROJECTION
+        )
+        if book:
+            self._books[key] = (time.monotonic() + BOOK_TTL, book)
+            self._books.move_to_end(key)
+            while len(self._books) > MAX_BOOK_HEADERS:
+                self._books.popitem(last=False)
+        else:
+            self._books.pop(key, None)
+        return book
+
+    # ---------- chapter content ----------
+    def _lookup(self, key) -> Optional[ChapterEntry]:
+        entry = self._entries.get(key)
+        if not entry:
+            return None
+        expires_at, meta, data = entry
+        if expires_at < time.monotonic():
+            self._evict(key)
+            return None
+        self._entries.move_to_end(key)
+        return meta, data
+
+    def _evict(self, key):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._size -= len(entry[2])
+
+    def _store(self, key, meta: dict, data: bytes):
+        # Chapter quá lớn so với budget thì không cache, tránh đẩy hết entry khác ra
+        if len(data) > self.max_bytes // 4:
+            return
+        self._evict(key)
+        self._entries[key] = (time.monotonic() + ENTRY_TTL, meta, data)
+        self._size += len(data)
+        while self._size > self.max_bytes and self._entries:
+            _, (_, _, old) = self._entries.popitem(last=False)
+            self._size -= len(old)
+
+    async def _load(self, book_id: ObjectId, number: int) -> Optional[ChapterEntry]:
+        meta = await get_chapter(book_id, number)
+        if not meta:
+            return None
+        data = b"".join([part async for part in iter_chapter_bytes(meta)])
+        self._store((str(book_id), number), meta, data)
+        return meta, data
+
+    def peek(self, book_id: ObjectId, number: int) -> Optional[ChapterEntry]:
+        """Chỉ đọc cache, không load"""
+        entry = self._lookup((str(book_id), number))
+        if entry:
+            self.hits += 1
+        return entry
+
+    async def get(self, book_id: ObjectId, number: int) -> Optional[ChapterEntry]:
+        """(meta, bytes UTF-8) của chapter; request trùng nhau chỉ load từ Mongo 1 lần"""
+        key = (str(book_id), number)
+        entry = self._lookup(key)
+        if entry:
+            self.hits += 1
+            return entry
+        self.misses += 1
+
+        future = self._inflight.get(key)
+        if future:
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(self._load(book_id, number))
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    def prefetch(self, book_id: ObjectId, number: int):
+        """Load trước chapter kế tiếp trong background (người đọc thường lật trang tuần tự)"""
+        key = (str(book_id), number)
+        if key in self._inflight or self._lookup(key):
+            return
+        self.prefetches += 1
+        future = asyncio.ensure_future(self._load(book_id, number))
+        self._inflight[key] = future
+
+        def _done(f):
+            self._inflight.pop(key, None)
+            if not f.cancelled() and f.exception():
+                log.warning(f"[CHAPTER_CACHE] Prefetch {key} failed: {f.exception()}")
+
+        future.add_done_callback(_done)
+
+
+chapter_cache = ChapterCache(settings.CHAPTER_CACHE_MAX_MB * 1024 * 1024)
@@ -0,0 +1,80 @@
+# app/services/chapter_store.py
+import re
+from typing import AsyncIterator, List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException
+from app.core.database import book_chapters_collection, book_chapter_chunks_collection
+from app.utils.chapter_codec import decode_chunk
+
+# book_chapters: metadata, 1 document / chapter
+#   {bookId, number, title, wordCount, byteLength, compressedLength,
+#    chunkSize, chunkCount, encoding, contentId, updatedAt}
+# book_chapter_chunks: nội dung nén, {contentId, n, data}
+# contentId đổi mỗi lần import lại chapter → chunk cũ/mới không lẫn vào nhau.
+CHAPTER_LIST_PROJECTION = {"_id": 0, "number": 1, "title": 1, "wordCount": 1, "byteLength": 1}
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+async def list_chapters(book_id: ObjectId) -> List[dict]:
+    cursor = book_chapters_collection.find({"bookId": book_id}, CHAPTER_LIST_PROJECTION).sort("number", 1)
+    return await cursor.to_list(None)
+
+
+async def get_chapter(book_id: ObjectId, number: int) -> Optional[dict]:
+    return await book_chapters_collection.find_one({"bookId": book_id, "number": number})
+
+
+async def iter_chapter_metas(book_id: ObjectId, first: int, last: int) -> AsyncIterator[dict]:
+    cursor = book_chapters_collection.find(
+        {"bookId": book_id, "number": {"$gte": first, "$lte": last}}
+    ).sort("number", 1)
+    async for meta in cursor:
+        yield meta
+
+
+async def iter_chapter_bytes(meta: dict, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Stream byte [start, end) của chapter, chỉ đọc + giải nén các chunk cần thiết"""
+    end = meta["byteLength"] if end is None else min(end, meta["byteLength"])
+    if start >= end:
+        return
+    chunk_size = meta["chunkSize"]
+    cursor = book_chapter_chunks_collection.find({
+        "contentId": meta["contentId"],
+        "n": {"$gte": start // chunk_size, "$lte": (end - 1) // chunk_size}
+    }).sort("n", 1)
+    async for chunk in cursor:
+        data = decode_chunk(chunk["data"])
+        base = chunk["n"] * chunk_size
+        yield data[max(start - base, 0):min(end - base, len(data))]
+
+
+async def read_chapter_text(meta: dict) -> str:
+    return b"".join([part async for part in iter_chapter_bytes(meta)]).decode("utf-8")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Header Range (1 range) → (start, end) end exclusive; None = trả cả chapter.
+    Multi-range hoặc cú pháp lạ thì bỏ qua (trả 200 toàn bộ), range ngoài size → 416.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # bytes=-N: N byte cuối
+        start, end = max(size - int(last), 0), size
+    else:
+        start = int(first)
+        end = min(int(last) + 1, size) if last else size
+    if start >= size or start >= end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
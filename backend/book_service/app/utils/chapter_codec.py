@@ -0,0 +1,32 @@
+# chapter_codec.py
+import zstandard
+
+# Nội dung chapter được cắt thành các chunk CHUNK_SIZE byte (UTF-8) và nén zstd từng chunk
+# độc lập → đọc theo range chỉ cần lấy + giải nén các chunk chứa range đó.
+CHUNK_SIZE = 64 * 1024
+ZSTD_LEVEL = 3
+ENCODING = "zstd"
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def encode_chapter(text: str, chunk_size: int = CHUNK_SIZE, level: int = ZSTD_LEVEL):
+    """text → (list chunk đã nén, metadata {wordCount, byteLength, compressedLength, chunkSize, chunkCount, encoding})"""
+    raw = text.encode("utf-8")
+    compressor = zstandard.ZstdCompressor(level=level)
+    chunks = [compressor.compress(raw[i:i + chunk_size]) for i in range(0, len(raw), chunk_size)]
+    meta = {
+        "wordCount": count_words(text),
+        "byteLength": len(raw),
+        "compressedLength": sum(len(c) for c in chunks),
+        "chunkSize": chunk_size,
+        "chunkCount": len(chunks),
+        "encoding": ENCODING
+    }
+    return chunks, meta
+
+
+def decode_chunk(data: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(data)
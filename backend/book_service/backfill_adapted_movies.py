@@ -0,0 +1,60 @@
+"""
+Script to build the adaptedMovies snapshot on every book.
+
+books.adaptedMovies = [{id, title, releaseYear}] mirrors the active movies in
+books.movieAdaptations so book listing/detail never join into movies. The
+book service keeps it in sync from a change stream (replica set) or, on a
+standalone mongod, by reconciling every minute; run this once after deploying,
+or to fix snapshots right away instead of waiting for the next reconcile.
+
+Safe to run more than once. Run this from the book_service directory:
+python backfill_adapted_movies.py
+"""
+
+import os
+import sys
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB connection
+MONGODB_URL = os.getenv('MONGODB_URL', 'mongodb://localhost:27017')
+DATABASE_NAME = os.getenv('DATABASE_NAME', 'ONLINE_ENTERTAINMENT_PLATFORM')
+
+def connect_to_db():
+    """Connect to MongoDB database"""
+    try:
+        client = MongoClient(MONGODB_URL)
+        db = client[DATABASE_NAME]
+        print(f"✅ Connected to MongoDB: {DATABASE_NAME}")
+        return db
+    except Exception as e:
+        print(f"❌ Failed to connect to MongoDB: {e}")
+        sys.exit(1)
+
+def backfill_adapted_movies(db):
+    movies = {
+        movie["_id"]: movie
+        for movie in db['movies'].find(
+            {"isActive": True, "isDeleted": {"$ne": True}},
+            {"title": 1, "releaseYear": 1}
+        )
+    }
+
+    updated = 0
+    for book in db['books'].find({}, {"movieAdaptations": 1, "adaptedMovies": 1}):
+        snapshot = [
+            {"id": str(mid), "title": movies[mid]["title"], "releaseYear": movies[mid].get("releaseYear")}
+            for mid in book.get("movieAdaptations") or [] if mid in movies
+        ]
+        if snapshot != book.get("adaptedMovies"):
+            db['books'].update_one({"_id": book["_id"]}, {"$set": {"adaptedMovies": snapshot}})
+            updated += 1
+
+    print(f"✅ Updated adaptedMovies on {updated} books")
+
+if __name__ == "__main__":
+    db = connect_to_db()
+    backfill_adapted_movies(db)
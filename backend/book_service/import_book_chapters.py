@@ -0,0 +1,107 @@
+"""
+Script to import the real chapter text of a book into the chapter store.
+
+Chapters are kept out of the books document:
+- book_chapters: one metadata document per chapter (title, wordCount, byteLength, ...)
+- book_chapter_chunks: the UTF-8 text cut into 64KB chunks, each zstd-compressed
+books.totalChapters is set to the number of imported chapters.
+
+Input is either a directory of .txt files (one per chapter, sorted by file
+name, first line = chapter title) or a JSON file [{"title": ..., "content": ...}].
+Re-importing a book replaces its chapters. Run this from the book_service directory:
+python import_book_chapters.py <book_id> <chapters_dir | chapters.json>
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+from bson import ObjectId, Binary
+from pymongo import MongoClient, ReturnDocument
+from dotenv import load_dotenv
+
+from app.utils.chapter_codec import encode_chapter
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB connection
+MONGODB_URL = os.getenv('MONGODB_URL', 'mongodb://localhost:27017')
+DATABASE_NAME = os.getenv('DATABASE_NAME', 'ONLINE_ENTERTAINMENT_PLATFORM')
+
+def connect_to_db():
+    """Connect to MongoDB database"""
+    try:
+        client = MongoClient(MONGODB_URL)
+        db = client[DATABASE_NAME]
+        print(f"✅ Connected to MongoDB: {DATABASE_NAME}")
+        return db
+    except Exception as e:
+        print(f"❌ Failed to connect to MongoDB: {e}")
+        sys.exit(1)
+
+def load_chapters(path):
+    """Return [(title, content)] from a directory of .txt files or a JSON file"""
+    if os.path.isdir(path):
+        chapters = []
+        for name in sorted(f for f in os.listdir(path) if f.endswith(".txt")):
+            with open(os.path.join(path, name), encoding="utf-8") as f:
+                title, _, content = f.read().partition("\n")
+            chapters.append((title.strip(), content.strip()))
+        return chapters
+
+    with open(path, encoding="utf-8") as f:
+        return [(c.get("title", ""), c["content"]) for c in json.load(f)]
+
+def save_chapter(db, book_id, number, title, content):
+    chunks, meta = encode_chapter(content)
+    content_id = ObjectId()
+
+    # Ghi chunk mới trước, rồi mới trỏ metadata sang → reader không bao giờ thấy chapter dở dang
+    if chunks:
+        db['book_chapter_chunks'].insert_many([
+            {"contentId": content_id, "n": n, "data": Binary(data)}
+            for n, data in enumerate(chunks)
+        ])
+    previous = db['book_chapters'].find_one_and_update(
+        {"bookId": book_id, "number": number},
+        {"$set": {**meta, "title": title or f"Chapter {number}", "contentId": content_id, "updatedAt": datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    if previous:
+        db['book_chapter_chunks'].delete_many({"contentId": previous["contentId"]})
+    return meta
+
+def import_book_chapters(db, book_id, path):
+    book = db['books'].find_one({"_id": book_id}, {"title": 1})
+    if not book:
+        print(f"❌ Book {book_id} not found")
+        sys.exit(1)
+
+    chapters = load_chapters(path)
+    if not chapters:
+        print(f"❌ No chapters found in {path}")
+        sys.exit(1)
+
+    raw_bytes = stored_bytes = 0
+    for number, (title, content) in enumerate(chapters, start=1):
+        meta = save_chapter(db, book_id, number, title, content)
+        raw_bytes += meta["byteLength"]
+        stored_bytes += meta["compressedLength"]
+
+    # Chapter thừa từ lần import trước
+    for extra in db['book_chapters'].find({"bookId": book_id, "number": {"$gt": len(chapters)}}):
+        db['book_chapter_chunks'].delete_many({"contentId": extra["contentId"]})
+        db['book_chapters'].delete_one({"_id": extra["_id"]})
+
+    db['books'].update_one({"_id": book_id}, {"$set": {"totalChapters": len(chapters)}})
+    print(f"✅ Imported {len(chapters)} chapters into '{book['title']}' "
+          f"({raw_bytes / 1024:.0f}KB → {stored_bytes / 1024:.0f}KB compressed)")
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or not ObjectId.is_valid(sys.argv[1]):
+        print(__doc__)
+        sys.exit(1)
+    db = connect_to_db()
+    import_book_chapters(db, ObjectId(sys.argv[1]), sys.argv[2])
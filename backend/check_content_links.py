@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Consistency check for the book <-> movie links.
+
+A movie points at its source book with movies.adaptedFromBookId and a book
+lists its adaptations in books.movieAdaptations (plus the adaptedMovies
+snapshot the book service maintains). The movie service resolves these
+links from an in-memory index, so broken data shows up as missing books
+rather than errors. This script reports:
+1. Dangling links: adaptedFromBookId / movieAdaptations pointing at a
+   document that does not exist
+2. Links to inactive or deleted content
+3. One-sided links: a movie points at a book that does not list it, or the
+   other way round
+4. Stale books.adaptedMovies snapshots
+
+It only reads. Run it from the backend directory:
+    MONGODB_URL=mongodb://localhost:27017 python check_content_links.py
+
+The exit code is non-zero when a dangling link or a stale snapshot is found.
+"""
+
+import os
+import sys
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+# Load environment variables
+load_dotenv()
+
+MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+DATABASE_NAME = os.getenv("DATABASE_NAME", "ONLINE_ENTERTAINMENT_PLATFORM")
+
+
+def _active(doc):
+    return doc.get("isActive", True) and not doc.get("isDeleted", False)
+
+
+def check_links(db):
+    """Return (errors, warnings) as lists of human-readable lines"""
+    movies = {
+        m["_id"]: m for m in db.movies.find(
+            {}, {"title": 1, "releaseYear": 1, "adaptedFromBookId": 1, "isActive": 1, "isDeleted": 1}
+        )
+    }
+    books = {
+        b["_id"]: b for b in db.books.find(
+            {}, {"title": 1, "movieAdaptations": 1, "adaptedMovies": 1, "isActive": 1, "isDeleted": 1}
+        )
+    }
+    errors = []
+    warnings = []
+
+    for movie_id, movie in movies.items():
+        book_id = movie.get("adaptedFromBookId")
+        if not book_id:
+            continue
+        book = books.get(book_id)
+        if not book:
+            errors.append(f"movie {movie_id} ({movie.get('title')}): adaptedFromBookId {book_id} does not exist")
+            continue
+        if not _active(book):
+            warnings.append(f"movie {movie_id} ({movie.get('title')}): source book {book_id} is inactive/deleted")
+        if movie_id not in (book.get("movieAdaptations") or []):
+            warnings.append(f"movie {movie_id}: book {book_id} does not list it in movieAdaptations")
+
+    for book_id, book in books.items():
+        expected = []
+        for movie_id in book.get("movieAdaptations") or []:
+            movie = movies.get(movie_id)
+            if not movie:
+                errors.append(f"book {book_id} ({book.get('title')}): movieAdaptations entry {movie_id} does not exist")
+                continue
+            if not _active(movie):
+                warnings.append(f"book {book_id} ({book.get('title')}): adaptation {movie_id} is inactive/deleted")
+            else:
+                expected.append({"id": str(movie_id), "title": movie["title"], "releaseYear": movie.get("releaseYear")})
+            if movie.get("adaptedFromBookId") not in (None, book_id):
+                warnings.append(f"book {book_id}: movie {movie_id} points at another book {movie['adaptedFromBookId']}")
+            elif movie.get("adaptedFromBookId") is None:
+                warnings.append(f"book {book_id}: movie {movie_id} has no adaptedFromBookId")
+
+        if (book.get("adaptedMovies") or []) != expected:
+            errors.append(f"book {book_id} ({book.get('title')}): adaptedMovies snapshot is stale "
+                          f"(run book_service/backfill_adapted_movies.py)")
+
+    return errors, warnings
+
+
+def main():
+    print(f"Connecting to MongoDB at {MONGODB_URL}")
+    client = MongoClient(MONGODB_URL)
+    try:
+        errors, warnings = check_links(client[DATABASE_NAME])
+    finally:
+        client.close()
+
+    for line in warnings:
+        print(f"  ! {line}")
+    for line in errors:
+        print(f"  ✗ {line}")
+
+    if errors:
+        print(f"\n✗ {len(errors)} broken link(s), {len(warnings)} warning(s)")
+        return 1
+    print(f"\n✓ Book/movie links are consistent ({len(warnings)} warning(s))")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Email outbox check for auth_service, against a local debugging SMTP server.
+
+This script will:
+1. Start a small in-process SMTP sink on 127.0.0.1 (no TLS, no login) that
+   records every message and can be told to answer 451 / 550
+2. Point auth_service at it (SMTP_SERVER / SMTP_PORT / SMTP_START_TLS=false)
+   and run the EmailOutbox worker on scratch stream keys (check:email_outbox*)
+3. Enqueue a burst of emails and verify they are all delivered over at most
+   SMTP_POOL_SIZE reused connections
+4. Verify a 451 is retried (retry ZSET, then delivered) and a 550 goes to the
+   dead-letter stream without retrying
+
+Run it from the backend directory with redis available:
+    REDIS_URL=redis://localhost:6379 python check_email_outbox.py
+
+The exit code is non-zero when any step fails.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+BURST = int(os.getenv("EMAIL_CHECK_BURST", "50"))
+POOL_SIZE = 2
+TIMEOUT = 30
+
+
+class SMTPSink:
+    """Enough of RFC 5321 for aiosmtplib: EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT"""
+
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+        self.fail_next = 0                       # số message tiếp theo trả 451 ở DATA
+        self.bounce = {"bounce@example.com"}     # RCPT trả 550
+        self._server = None
+        self.port = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+
+        async def reply(line: str):
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+
+        await reply("220 localhost SMTP sink")
+        recipients = []
+        try:
+            while True:
+                line = (await reader.readline()).decode(errors="replace").rstrip("\r\n")
+                if not line:
+                    break
+                verb = line.split(" ", 1)[0].upper()
+                if verb in ("EHLO", "HELO"):
+                    await reply("250-localhost\r\n250 8BITMIME")
+                elif verb == "MAIL":
+                    recipients = []
+                    await reply("250 OK")
+                elif verb == "RCPT":
+                    address = line.split(":", 1)[1].strip().strip("<>").split(">")[0]
+                    if address in self.bounce:
+                        await reply("550 No such user")
+                    else:
+                        recipients.append(address)
+                        await reply("250 OK")
+                elif verb == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = []
+                    while True:
+                        chunk = await reader.readline()
+                        if chunk in (b".\r\n", b".\n", b""):
+                            break
+                        data.append(chunk)
+                    if self.fail_next:
+                        self.fail_next -= 1
+                        await reply("451 Try again later")
+                    else:
+                        self.messages.append((recipients, b"".join(data)))
+                        await reply("250 OK queued")
+                elif verb in ("RSET", "NOOP"):
+                    await reply("250 OK")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        finally:
+            writer.close()
+
+
+async def wait_for(predicate, timeout=TIMEOUT) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        await asyncio.sleep(0.05)
+    return predicate()
+
+
+def report(ok: bool, label: str) -> int:
+    print(f"  {'✓' if ok else '✗'} {label}")
+    return 0 if ok else 1
+
+
+async def main():
+    sink = SMTPSink()
+    await sink.start()
+    print(f"SMTP sink listening on 127.0.0.1:{sink.port}")
+
+    os.environ["REDIS_URL"] = REDIS_URL
+    os.environ.update({
+        "SMTP_SERVER": "127.0.0.1", "SMTP_PORT": str(sink.port), "SMTP_START_TLS": "false",
+        "SMTP_USER": "", "SMTP_PASSWORD": "", "SMTP_POOL_SIZE": str(POOL_SIZE),
+    })
+    for key, value in {
+        "MONGO_URI": "mongodb://localhost:27017", "JWT_SECRET": "backend-checks",
+        "EMAIL_FROM": "checks@example.com", "FRONTEND_URL": "http://localhost:3000",
+    }.items():
+        os.environ.setdefault(key, value)
+
+    sys.path.insert(0, os.path.join(BACKEND_DIR, "auth_service"))
+    from app.core.token_blacklist import redis_client
+    if not redis_client:
+        print(f"❌ Redis not reachable at {REDIS_URL}")
+        return 1
+    from app.services import email_outbox as outbox_module
+
+    # Key riêng cho check, không đụng outbox thật trên cùng Redis
+    outbox_module.STREAM = "check:email_outbox"
+    outbox_module.RETRY_KEY = "check:email_outbox:retry"
+    outbox_module.DEAD_STREAM = "check:email_outbox:dead"
+    keys = [outbox_module.STREAM, outbox_module.RETRY_KEY, outbox_module.DEAD_STREAM]
+    redis_client.delete(*keys)
+
+    outbox = outbox_module.email_outbox
+    outbox.start()
+    failures = 0
+    try:
+        print(f"\n[burst of {BURST}]")
+        started = time.perf_counter()
+        for i in range(BURST):
+            await outbox_module.enqueue_email(f"user{i}@example.com", f"Check {i}", f"<p>{i}</p>")
+        enqueue_ms = (time.perf_counter() - started) * 1000 / BURST
+        delivered = await wait_for(lambda: len(sink.messages) >= BURST)
+        elapsed = time.perf_counter() - started
+        failures += report(delivered, f"{len(sink.messages)}/{BURST} delivered in {elapsed:.2f}s "
+                                      f"(enqueue {enqueue_ms:.2f}ms each)")
+        failures += report(sink.connections <= POOL_SIZE,
+                           f"{sink.connections} SMTP connections for {BURST} messages (pool {POOL_SIZE})")
+
+        print("\n[transient failure → retry]")
+        sink.fail_next = 1
+        before = len(sink.messages)
+        await outbox_module.enqueue_email("retry@example.com", "Retry", "<p>retry</p>")
+        scheduled = await wait_for(lambda: redis_client.zcard(outbox_module.RETRY_KEY) == 1)
+        failures += report(scheduled, "451 scheduled in the retry set")
+        # Không chờ backoff thật: đưa retry về hạn ngay
+        for payload in redis_client.zrange(outbox_module.RETRY_KEY, 0, -1):
+            redis_client.zadd(outbox_module.RETRY_KEY, {payload: 0})
+        retried = await wait_for(lambda: len(sink.messages) == before + 1)
+        failures += report(retried, "retried message delivered")
+
+        print("\n[permanent failure → dead letter]")
+        await outbox_module.enqueue_email("bounce@example.com", "Bounce", "<p>bounce</p>")
+        dead = await wait_for(lambda: redis_client.xlen(outbox_module.DEAD_STREAM) == 1)
+        failures += report(dead and redis_client.zcard(outbox_module.RETRY_KEY) == 0,
+                           "550 moved to the dead-letter stream without retry")
+        print(f"\n{outbox.stats()}")
+    finally:
+        await outbox.stop()
+        await sink.stop()
+        redis_client.delete(*keys)
+
+    print(f"\n{'✅ Email outbox OK' if not failures else f'❌ {failures} check(s) failed'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression check for the backend services.
+
+This script will:
+1. Seed a scratch database on a local mongod with synthetic users, movies,
+   books, progress documents and collections
+2. Create each service's indexes (app.core.database.ensure_indexes)
+3. Run the hot service functions (get_movies with every filter/sort
+   combination, get_continue_watching, get_view_history,
+   get_continue_reading, get_public_collections, login, refresh-token
+   session rotation) while a pymongo CommandListener records every
+   find/aggregate/findAndModify they issue
+4. Re-run each recorded command through explain("executionStats") and fail
+   when a plan does a COLLSCAN, sorts in memory, or examines far more
+   documents than it returns
+
+Run it from the backend directory against a throwaway mongod:
+    MONGODB_URL=mongodb://localhost:27017 python check_query_plans.py
+
+The exit code is non-zero when any query regresses.
+"""
+
+import asyncio
+import hashlib
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from passlib.hash import pbkdf2_sha256
+from pymongo import MongoClient, monitoring
+
+# Load environment variables
+load_dotenv()
+
+MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+DATABASE_NAME = os.getenv("CHECK_DATABASE_NAME", "backend_checks")
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# A query may examine at most this many documents per document it returns
+MAX_DOCS_EXAMINED_RATIO = 10
+
+# Fields the driver adds to a command that explain() does not accept
+DRIVER_FIELDS = {"lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "autocommit", "startTransaction"}
+
+GENRES = ["Action", "Drama", "Comedy", "Horror", "Romance", "Fantasy", "Sci-Fi", "Thriller", "Mystery", "Adventure"]
+TITLE_WORDS = ["Matrix", "Shadow", "Empire", "River", "Night", "Garden", "Storm", "Legend", "Dream", "Hunter"]
+SEED_PASSWORD = "Checks@2024"
+SEED_REFRESH_TOKEN = "check-refresh-token"
+
+
+class QueryRecorder(monitoring.CommandListener):
+    """Record the find/aggregate/findAndModify commands sent to the scratch database"""
+
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.database_name == DATABASE_NAME and event.command_name in ("find", "aggregate", "findAndModify"):
+            self.commands.append(event.command)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+# ========== SEED ==========
+def seed(db):
+    """Fill the scratch database with a realistic spread of documents"""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+
+    users = [{
+        "_id": ObjectId(),
+        "email": f"user{i}@example.com",
+        "username": f"user{i}",
+        "emailKey": f"user{i}@example.com",
+        "usernameKey": f"user{i}",
+        "displayName": f"User {i}",
+        "avatar": None,
+        "role": "user",
+        "isPremium": i % 5 == 0,
+        "isVerified": True,
+        "wallet": {"balance": 10_000_000, "currency": "VND", "totalDeposited": 10_000_000, "totalSpent": 0},
+        "createdAt": now - timedelta(days=i)
+    } for i in range(50)]
+    users[0]["passwordHash"] = pbkdf2_sha256.hash(SEED_PASSWORD)
+    db.users.insert_many(users)
+
+    movies = [{
+        "_id": ObjectId(),
+        "title": f"{rng.choice(TITLE_WORDS)} {rng.choice(TITLE_WORDS)} {i}",
+        "description": f"Synthetic movie {i}",
+        "thumbnailUrl": f"https://example.com/movies/{i}.jpg",
+        "bannerUrl": None,
+        "videoUrl": f"https://example.com/movies/{i}.mp4",
+        "duration": rng.randint(3600, 9000),
+        "releaseYear": rng.randint(1990, 2024),
+        "genres": rng.sample(GENRES, 2),
+        "type": "anime" if i % 5 == 0 else "movie",
+        "totalViews": rng.randint(0, 100000),
+        "rating": round(rng.uniform(1, 5), 1),
+        "totalRatings": rng.randint(0, 500),
+        "isPremium": i % 3 == 0,
+        "isFeatured": i % 4 == 0,
+        "featuredRank": i,
+        "isActive": i % 20 != 0,
+        "isDeleted": False,
+        "createdAt": now - timedelta(hours=i)
+    } for i in range(400)]
+    db.movies.insert_many(movies)
+
+    books = [{
+        "_id": ObjectId(),
+        "title": f"{rng.choice(TITLE_WORDS)} Book {i}",
+        "author": f"Author {i % 30}",
+        "description": f"Synthetic book {i}",
+        "coverImageUrl": f"https://example.com/books/{i}.jpg",
+        "categories": rng.sample(GENRES, 2),
+        "publishYear": rng.randint(1950, 2024),
+        "totalPages": rng.randint(100, 900),
+        "rating": round(rng.uniform(1, 5), 1),
+        "movieAdaptations": [movies[i]["_id"]] if i % 2 == 0 else [],
+        "adaptedMovies": [{
+            "id": str(movies[i]["_id"]),
+            "title": movies[i]["title"],
+            "releaseYear": movies[i]["releaseYear"]
+        }] if i % 2 == 0 and movies[i]["isActive"] else [],
+        "isActive": i % 15 != 0,
+        "isDeleted": False
+    } for i in range(150)]
+    db.books.insert_many(books)
+
+    watching = []
+    reading = []
+    for n, user in enumerate(users):
+        for movie in rng.sample(movies, 120 if n == 0 else 30):
+            watching.append({
+                "userId": user["_id"],
+                "movieId": movie["_id"],
+                "currentTime": rng.randint(0, movie["duration"]),
+                "duration": movie["duration"],
+                "percentage": round(rng.uniform(0, 100), 2),
+                "viewedAt": now - timedelta(minutes=rng.randint(0, 60 * 24 * 90)),
+                "updatedAt": now
+            })
+        for book in rng.sample(books, 60 if n == 0 else 10):
+            reading.append({
+                "userId": user["_id"],
+                "bookId": book["_id"],
+                "currentChapter": rng.randint(1, 30),
+                "isCompleted": rng.random() < 0.2,
+                "updatedAt": now - timedelta(minutes=rng.randint(0, 60 * 24 * 90))
+            })
+    db.watching_progress.insert_many(watching)
+    db.reading_progress.insert_many(reading)
+
+    db.collections.insert_many([{
+        "userId": rng.choice(users)["_id"],
+        "name": f"Collection {i}",
+        "description": None,
+        "privacy": "public" if i % 2 == 0 else "private",
+        "items": [],
+        "itemCount": 0,
+        "createdAt": now - timedelta(hours=i),
+        "updatedAt": now
+    } for i in range(300)])
+
+    # One busy comment thread (50 comments from different users)
+    movie = movies[1]
+    db.comments.insert_many([{
+        "userId": str(users[i]["_id"]),
+        "contentType": "movie",
+        "contentId": str(movie["_id"]),
+        "text": f"Comment {i}",
+        "status": "approved",
+        "createdAt": now - timedelta(minutes=i)
+    } for i in range(50)])
+
+    # A few device sessions per user; user0's first one has a known refresh token
+    db.sessions.insert_many([{
+        "userId": user["_id"],
+        "tokenHash": hashlib.sha256(
+            (SEED_REFRESH_TOKEN if n == 0 and user is users[0] else f"{user['_id']}-{n}").encode()
+        ).hexdigest(),
+        "accessJti": f"{user['_id']}-jti-{n}",
+        "device": {"userAgent": "checks", "ip": "127.0.0.1"},
+        "createdAt": now - timedelta(hours=n),
+        "lastUsedAt": now - timedelta(minutes=n),
+        "expiresAt": now + timedelta(days=7)
+    } for user in users for n in range(3)])
+
+    return {
+        "user_id": str(users[0]["_id"]),
+        "username": users[0]["username"],
+        "password": SEED_PASSWORD,
+        "refresh_token": SEED_REFRESH_TOKEN,
+        "movie_id": str(movie["_id"]),
+        "book_id": str(books[1]["_id"])
+    }
+
+
+# ========== CASES ==========
+# Each case: (name, coroutine factory, plan problems that are expected for it)
+def movie_cases(ctx):
+    from app.services import movie_service
+    from app.schemas.movie_dto import MovieFilterQuery
+
+    filters = {
+        "no filter": {},
+        "type": {"type": "anime"},
+        "genre": {"genre": "Action"},
+        "year": {"year": 2010},
+        "isPremium": {"isPremium": True},
+        "isFeatured": {"isFeatured": True},
+        "search": {"search": "Matrix"},
+    }
+    for filter_name, filter_kwargs in filters.items():
+        for sort_by in ("viewCount", "rating", "releaseYear"):
+            query = MovieFilterQuery(sortBy=sort_by, **filter_kwargs)
+            # $text matches come back unordered, the sort can only happen in memory
+            allowed = {"SORT"} if "search" in filter_kwargs else set()
+            yield (
+                f"get_movies [{filter_name}, sortBy={sort_by}]",
+                lambda query=query: movie_service.get_movies(None, query),
+                allowed
+            )
+    yield "get_continue_watching", lambda: movie_service.get_continue_watching(ctx["user_id"], 10), set()
+
+
+def auth_cases(ctx):
+    from app.services import auth_service, session_service
+    from app.schemas.auth_dto import LoginDTO
+
+    for identifier in (ctx["username"], f"{ctx['username']}@example.com".upper()):
+        login = LoginDTO(identifier=identifier, password=ctx["password"])
+        yield f"login_user [{identifier}]", lambda login=login: auth_service.login_user(login), set()
+
+    token = ctx["refresh_token"]
+    # Rotate to the same token so the seeded session stays usable for the explain re-run
+    yield "rotate_session", lambda: session_service.rotate_session(token, token, "check-jti"), set()
+    yield "list_sessions", lambda: session_service.list_sessions(ObjectId(ctx["user_id"])), set()
+
+
+def user_cases(ctx):
+    from app.services import user_service
+
+    yield "get_view_history", lambda: user_service.get_view_history(ctx["user_id"], 1, 20), set()
+
+
+def book_cases(ctx):
+    from app.services import book_service
+    from app.schemas.book_dto import BookListQuery
+
+    for sort_by in ("title", "publishYear", "rating"):
+        query = BookListQuery(sortBy=sort_by)
+        yield (
+            f"get_book_list [sortBy={sort_by}]",
+            lambda query=query: book_service.get_book_list(query),
+            set()
+        )
+    yield "get_continue_reading", lambda: book_service.get_continue_reading(10, ctx["user_id"]), set()
+
+
+def collection_cases(ctx):
+    from app.services import collection_service
+
+    yield "get_public_collections", lambda: collection_service.get_public_collections(1, 20), set()
+
+
+SERVICES = [
+    ("auth_service", auth_cases),
+    ("movie_service", movie_cases),
+    ("user_service", user_cases),
+    ("book_service", book_cases),
+    ("collection_service", collection_cases),
+]
+
+
+# ========== PLAN ANALYSIS ==========
+def _plan_stages(plan):
+    """Yield every stage of a winningPlan tree (classic and SBE layouts)"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan
+        for key, value in plan.items():
+            if key != "slotBasedPlan":
+                yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+def _query_layers(explain):
+    """Yield every query-layer section (the parts carrying a queryPlanner)"""
+    if isinstance(explain, dict):
+        if "queryPlanner" in explain:
+            yield explain
+        for value in explain.values():
+            yield from _query_layers(value)
+    elif isinstance(explain, list):
+        for item in explain:
+            yield from _query_layers(item)
+
+
+def analyze(command, explain):
+    """Return the set of plan problems found in one explain() output"""
+    problems = set()
+
+    for layer in _query_layers(explain):
+        for stage in _plan_stages(layer["queryPlanner"].get("winningPlan", {})):
+            if stage["stage"] == "COLLSCAN":
+                problems.add("COLLSCAN")
+            elif stage["stage"] == "SORT":
+                problems.add("SORT")
+            elif stage["stage"] == "EQ_LOOKUP" and stage.get("strategy") != "IndexedLoopJoin":
+                problems.add("COLLSCAN")
+
+        # Pipelines that $group (count_documents, facets) reduce documents by design
+        pipeline = command.get("pipeline", [])
+        if any("$group" in s for s in pipeline):
+            continue
+        stats = layer.get("executionStats", {})
+        examined = stats.get("totalDocsExamined", 0)
+        returned = stats.get("nReturned", 0)
+        if examined > max(returned, 1) * MAX_DOCS_EXAMINED_RATIO:
+            problems.add(f"EXAMINED {examined} docs for {returned} returned")
+
+    # Classic engine: pipeline stages that were not absorbed into the query layer
+    for stage in explain.get("stages", []):
+        if "$sort" in stage:
+            problems.add("SORT")
+        if "$lookup" in stage and stage.get("collectionScans", 0) > 0:
+            problems.add("COLLSCAN")
+
+    return problems
+
+
+def explain_command(db, command):
+    """Re-run a recorded command through explain("executionStats")"""
+    cmd = {k: v for k, v in command.items() if k not in DRIVER_FIELDS}
+    return db.command("explain", cmd, verbosity="executionStats")
+
+
+# ========== RUNNER ==========
+def _unload_app():
+    """Every service is an 'app' package; drop the previous one before importing the next"""
+    for name in [m for m in sys.modules if m == "app" or m.startswith("app.")]:
+        del sys.modules[name]
+
+
+async def check_service(service_name, cases, ctx, db, recorder):
+    service_dir = os.path.join(BACKEND_DIR, service_name)
+    _unload_app()
+    sys.path.insert(0, service_dir)
+    failures = 0
+    try:
+        from app.core.database import ensure_indexes
+        await ensure_indexes()
+
+        print(f"\n[{service_name}]")
+        for name, run, allowed in cases(ctx):
+            recorder.commands.clear()
+            await run()
+            problems = []
+            for command in list(recorder.commands):
+                found = analyze(command, explain_command(db, command)) - allowed
+                if found:
+                    command_name = next(iter(command))
+                    problems.append(f"{command_name} {command[command_name]}: {', '.join(sorted(found))}")
+            if problems:
+                failures += 1
+                print(f"  ✗ {name}")
+                for problem in problems:
+                    print(f"      {problem}")
+            else:
+                print(f"  ✓ {name} ({len(recorder.commands)} queries)")
+    finally:
+        sys.path.remove(service_dir)
+        _unload_app()
+    return failures
+
+
+async def main():
+    if DATABASE_NAME == "ONLINE_ENTERTAINMENT_PLATFORM":
+        print("✗ Refusing to seed the application database, set CHECK_DATABASE_NAME")
+        return 2
+
+    # The services read their settings from the environment
+    os.environ["MONGO_URI"] = MONGODB_URL
+    os.environ["DATABASE_NAME"] = DATABASE_NAME
+    os.environ.setdefault("JWT_SECRET", "query-plan-check")
+    os.environ.setdefault("REDIS_URL", "redis://localhost:6379")
+    for key, value in {
+        "SMTP_SERVER": "localhost", "EMAIL_FROM": "checks@example.com", "FRONTEND_URL": "http://localhost:3000",
+    }.items():
+        os.environ.setdefault(key, value)
+
+    # This client is created before the listener is registered, so seeding
+    # and explain() calls are not recorded
+    print(f"Connecting to MongoDB at {MONGODB_URL}")
+    client = MongoClient(MONGODB_URL)
+    client.drop_database(DATABASE_NAME)
+    db = client[DATABASE_NAME]
+    ctx = seed(db)
+    print(f"Seeded scratch database {DATABASE_NAME}")
+
+    recorder = QueryRecorder()
+    monitoring.register(recorder)
+
+    failures = 0
+    try:
+        for service_name, cases in SERVICES:
+            failures += await check_service(service_name, cases, ctx, db, recorder)
+    finally:
+        client.drop_database(DATABASE_NAME)
+        client.close()
+
+    if failures:
+        print(f"\n✗ {failures} case(s) with query-plan regressions")
+        return 1
+    print("\n✓ All query plans are index-backed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
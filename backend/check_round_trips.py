@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Round-trip budget check for the backend services.
+
+This script will:
+1. Seed a scratch database on a local mongod (same data as check_query_plans.py)
+2. Load each service's FastAPI app in-process, run its startup hooks (indexes,
+   in-memory caches) and send one request per endpoint listed in BUDGETS
+3. Count the Mongo commands (pymongo CommandListener) and Redis commands
+   (redis-py execute_command / pipeline execute) issued while handling it
+4. Fail when an endpoint goes over its declared budget, which is how N+1
+   patterns get caught before deploy
+
+Run it from the backend directory with mongod and redis available:
+    MONGODB_URL=mongodb://localhost:27017 REDIS_URL=redis://localhost:6379 python check_round_trips.py
+
+The exit code is non-zero when any endpoint is over budget.
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+from functools import wraps
+
+import redis
+import redis.asyncio
+from jose import jwt
+from pymongo import MongoClient, monitoring
+
+from check_query_plans import BACKEND_DIR, DATABASE_NAME, MONGODB_URL, _unload_app, seed
+
+JWT_SECRET = os.getenv("JWT_SECRET", "backend-checks")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+# Endpoint budgets: one request each, max Mongo commands / Redis commands.
+# The token revocation check is answered from the in-memory revocation set
+# (synced over pub/sub once startup has run), so it costs no Redis command.
+BUDGETS = {
+    "auth_service": [
+        {"name": "login", "method": "POST", "path": "/api/auth/login",
+         "json": {"identifier": "{username}", "password": "{password}"}, "mongo": 3, "redis": 0},
+        {"name": "list sessions", "method": "GET", "path": "/api/auth/sessions", "auth": True, "mongo": 1, "redis": 0},
+    ],
+    "user_service": [
+        {"name": "get profile", "method": "GET", "path": "/api/user/profile", "auth": True, "mongo": 1, "redis": 0},
+        {"name": "view history", "method": "GET", "path": "/api/user/view-history", "auth": True, "mongo": 2, "redis": 0},
+        {"name": "upgrade premium", "method": "POST", "path": "/api/user/premium/upgrade", "auth": True,
+         "json": {"duration": 1, "amount": 50000}, "mongo": 4, "redis": 1},
+    ],
+    "movie_service": [
+        {"name": "list movies", "method": "GET", "path": "/api/movies", "mongo": 3, "redis": 0},
+        {"name": "movie detail", "method": "GET", "path": "/api/movies/{movie_id}", "mongo": 2, "redis": 0},
+        {"name": "trending", "method": "GET", "path": "/api/movies/trending", "mongo": 2, "redis": 2},
+        {"name": "continue watching", "method": "GET", "path": "/api/movies/continue-watching", "auth": True, "mongo": 1, "redis": 0},
+        {"name": "update progress", "method": "PUT", "path": "/api/movies/{movie_id}/progress", "auth": True,
+         "json": {"watchedSeconds": 120}, "mongo": 3, "redis": 1},
+        {"name": "list comments", "method": "GET", "path": "/api/comments?contentType=movie&contentId={movie_id}", "mongo": 2, "redis": 2},
+        {"name": "create comment", "method": "POST", "path": "/api/comments", "auth": True,
+         "json": {"contentType": "movie", "contentId": "{movie_id}", "text": "Round trip check"}, "mongo": 3, "redis": 0},
+    ],
+    "book_service": [
+        {"name": "list books", "method": "GET", "path": "/api/books", "mongo": 3, "redis": 2},
+        {"name": "continue reading", "method": "GET", "path": "/api/books/continue-reading", "auth": True, "mongo": 2, "redis": 0},
+        {"name": "read chapter", "method": "GET", "path": "/api/books/{book_id}/chapters/1", "auth": True, "mongo": 2, "redis": 1},
+        {"name": "reconcile progress", "method": "POST", "path": "/api/books/progress/batch", "auth": True,
+         "json": {"updates": [{"bookId": "{book_id}", "currentChapter": 2}]}, "mongo": 2, "redis": 0},
+    ],
+    "collection_service": [
+        {"name": "browse public collections", "method": "GET", "path": "/api/collections/public/browse", "mongo": 3, "redis": 0},
+        {"name": "my collections", "method": "GET", "path": "/api/collections", "auth": True, "mongo": 1, "redis": 0},
+    ],
+}
+
+
+# Set while a request is being handled; Redis commands from background workers
+# (e.g. the auth email outbox blocking on XREADGROUP) run outside it and are not counted
+_IN_REQUEST = contextvars.ContextVar("in_request", default=False)
+
+
+class RoundTripCounter(monitoring.CommandListener):
+    """Count the Mongo and Redis commands issued while handling one request"""
+
+    def __init__(self):
+        self.mongo = []
+        self.redis = []
+
+    def reset(self):
+        self.mongo.clear()
+        self.redis.clear()
+
+    def started(self, event):
+        if event.database_name == DATABASE_NAME:
+            self.mongo.append(event.command_name)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def instrument_redis(self):
+        """Wrap the sync and asyncio redis clients so every round trip is recorded"""
+        counter = self
+
+        def count_sync(method, label=None):
+            @wraps(method)
+            def wrapper(self, *args, **kwargs):
+                if _IN_REQUEST.get():
+                    counter.redis.append(label or str(args[0]))
+                return method(self, *args, **kwargs)
+            return wrapper
+
+        def count_async(method, label=None):
+            @wraps(method)
+            async def wrapper(self, *args, **kwargs):
+                if _IN_REQUEST.get():
+                    counter.redis.append(label or str(args[0]))
+                return await method(self, *args, **kwargs)
+            return wrapper
+
+        redis.client.Redis.execute_command = count_sync(redis.client.Redis.execute_command)
+        redis.client.Pipeline.execute = count_sync(redis.client.Pipeline.execute, "PIPELINE")
+        redis.asyncio.client.Redis.execute_command = count_async(redis.asyncio.client.Redis.execute_command)
+        redis.asyncio.client.Pipeline.execute = count_async(redis.asyncio.client.Pipeline.execute, "PIPELINE")
+
+
+def make_token(user_id: str) -> str:
+    return jwt.encode({
+        "sub": user_id,
+        "jti": str(uuid.uuid4()),
+        "exp": datetime.utcnow() + timedelta(minutes=15)
+    }, JWT_SECRET, algorithm="HS256")
+
+
+async def call(app, method: str, path: str, headers: dict, body: bytes = b""):
+    """Send one HTTP request straight into an ASGI app, return (status, body)"""
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    received = False
+    response = {"status": 0, "body": b""}
+
+    async def receive():
+        nonlocal received
+        if received:
+            return {"type": "http.disconnect"}
+        received = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    token = _IN_REQUEST.set(True)
+    try:
+        await app(scope, receive, send)
+    finally:
+        _IN_REQUEST.reset(token)
+    return response["status"], response["body"]
+
+
+def _fill(value, ctx):
+    """Substitute {placeholders} from the seed context into paths and bodies"""
+    if isinstance(value, str):
+        return value.format(**ctx)
+    if isinstance(value, dict):
+        return {k: _fill(v, ctx) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill(v, ctx) for v in value]
+    return value
+
+
+async def check_service(service_name, budgets, ctx, counter):
+    service_dir = os.path.join(BACKEND_DIR, service_name)
+    _unload_app()
+    sys.path.insert(0, service_dir)
+    failures = 0
+    try:
+        from app.main import app
+
+        # Budgets are for a warmed-up worker, not the first request after boot
+        await app.router.startup()
+        revocations = getattr(sys.modules.get("app.core.token_blacklist"), "revocations", None)
+        for _ in range(50):
+            if not revocations or revocations.ready:
+                break
+            await asyncio.sleep(0.1)
+        print(f"\n[{service_name}]")
+        for budget in budgets:
+            headers = {"host": "testserver"}
+            body = b""
+            if budget.get("auth"):
+                headers["authorization"] = f"Bearer {make_token(ctx['user_id'])}"
+            if "json" in budget:
+                body = json.dumps(_fill(budget["json"], ctx)).encode()
+                headers["content-type"] = "application/json"
+
+            counter.reset()
+            status, _ = await call(app, budget["method"], _fill(budget["path"], ctx), headers, body)
+            mongo, redis_calls = len(counter.mongo), len(counter.redis)
+
+            problems = []
+            if status >= 400:
+                problems.append(f"HTTP {status}")
+            if mongo > budget["mongo"]:
+                problems.append(f"Mongo {mongo} > {budget['mongo']} ({', '.join(counter.mongo)})")
+            if redis_calls > budget["redis"]:
+                problems.append(f"Redis {redis_calls} > {budget['redis']} ({', '.join(counter.redis)})")
+
+            label = f"{budget['name']} [Mongo {mongo}/{budget['mongo']}, Redis {redis_calls}/{budget['redis']}]"
+            if problems:
+                failures += 1
+                print(f"  ✗ {label}")
+                for problem in problems:
+                    print(f"      {problem}")
+            else:
+                print(f"  ✓ {label}")
+        await app.router.shutdown()
+    finally:
+        sys.path.remove(service_dir)
+        _unload_app()
+    return failures
+
+
+async def main():
+    if DATABASE_NAME == "ONLINE_ENTERTAINMENT_PLATFORM":
+        print("✗ Refusing to seed the application database, set CHECK_DATABASE_NAME")
+        return 2
+
+    # The services read their settings from the environment
+    os.environ["MONGO_URI"] = MONGODB_URL
+    os.environ["DATABASE_NAME"] = DATABASE_NAME
+    os.environ["JWT_SECRET"] = JWT_SECRET
+    os.environ["REDIS_URL"] = REDIS_URL
+    for key, value in {
+        "SMTP_SERVER": "localhost", "SMTP_USER": "checks", "SMTP_PASSWORD": "checks",
+        "EMAIL_FROM": "checks@example.com", "FRONTEND_URL": "http://localhost:3000",
+    }.items():
+        os.environ.setdefault(key, value)
+
+    # This client is created before the listener is registered, so seeding is not counted
+    print(f"Connecting to MongoDB at {MONGODB_URL}")
+    client = MongoClient(MONGODB_URL)
+    client.drop_database(DATABASE_NAME)
+    ctx = seed(client[DATABASE_NAME])
+    print(f"Seeded scratch database {DATABASE_NAME}")
+
+    counter = RoundTripCounter()
+    monitoring.register(counter)
+    counter.instrument_redis()
+
+    failures = 0
+    try:
+        for service_name, budgets in BUDGETS.items():
+            failures += await check_service(service_name, budgets, ctx, counter)
+    finally:
+        client.drop_database(DATABASE_NAME)
+        client.close()
+
+    if failures:
+        print(f"\n✗ {failures} endpoint(s) over their round-trip budget")
+        return 1
+    print("\n✓ All endpoints within their round-trip budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
 from functools import lru_cache
+from typing import Dict
 
 class Settings(BaseSettings):
     SERVICE_NAME: str = Field(default="collection_service", env="SERVICE_NAME")
@@ -11,6 +12,10 @@ class Settings(BaseSettings):
     JWT_ACCESS_EXPIRE_MINUTES: int = Field(default=15, env="JWT_ACCESS_EXPIRE_MINUTES")
     JWT_REFRESH_EXPIRE_DAYS: int = Field(default=7, env="JWT_REFRESH_EXPIRE_DAYS")
     PORT: int = Field(default=8005, env="PORT")
+    # Admission control (mỗi worker): route đắt bị giới hạn / shed trước khi latency sụp
+    ADMISSION_MAX_IN_FLIGHT: int = Field(default=256, env="ADMISSION_MAX_IN_FLIGHT")
+    ADMISSION_LAG_SHED_MS: int = Field(default=100, env="ADMISSION_LAG_SHED_MS")
+    ADMISSION_BULKHEADS: Dict[str, int] = Field(default={"browse": 8, "search": 8}, env="ADMISSION_BULKHEADS")
 
     model_config = {
         "env_file": ".env",
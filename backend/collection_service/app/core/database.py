@@ -1,8 +1,49 @@
 from app.core.config import get_settings
 from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.circuit_breaker import CircuitBreaker
+from pymongo import monitoring, IndexModel, ASCENDING, DESCENDING
+import logging
+
+log = logging.getLogger(__name__)
 
 settings = get_settings()
-client = AsyncIOMotorClient(settings.MONGO_URI)
+
+# Circuit breaker cho Mongo: lỗi kết nối / timeout (command event có errtype, heartbeat fail)
+# → failure; command thành công → success. MongoGuardMiddleware chặn request khi breaker open.
+# serverSelectionTimeoutMS mặc định 30s → hạ xuống để request không treo nửa phút khi Mongo rớt.
+MONGO_SERVER_SELECTION_TIMEOUT_MS = 5000
+_CONNECTION_ERRORS = {"AutoReconnect", "NetworkTimeout", "ConnectionFailure", "WaitQueueTimeoutError"}
+mongo_breaker = CircuitBreaker("mongo")
+
+
+class _BreakerCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_breaker.record_success()
+
+    def failed(self, event):
+        if event.failure.get("errtype") in _CONNECTION_ERRORS:
+            mongo_breaker.record_failure()
+
+
+class _BreakerHeartbeatListener(monitoring.ServerHeartbeatListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        mongo_breaker.record_failure()
+
+
+client = AsyncIOMotorClient(
+    settings.MONGO_URI,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    event_listeners=[_BreakerCommandListener(), _BreakerHeartbeatListener()]
+)
 db = client[settings.DATABASE_NAME]
 
 # Collections
@@ -10,3 +51,19 @@ collections_collection = db.get_collection("collections")
 users_collection = db.get_collection("users")
 movies_collection = db.get_collection("movies")
 books_collection = db.get_collection("books")
+
+# Indexes backing the hot queries of this service (idempotent, run at startup)
+COLLECTION_INDEXES = [
+    IndexModel([("privacy", ASCENDING), ("createdAt", DESCENDING)]),
+    IndexModel([("userId", ASCENDING), ("createdAt", DESCENDING)]),
+]
+
+async def ensure_indexes():
+    """Create the indexes the service queries rely on"""
+    for collection, indexes in (
+        (collections_collection, COLLECTION_INDEXES),
+    ):
+        try:
+            await collection.create_indexes(indexes)
+        except Exception as e:
+            log.error(f"[DB] Failed to create indexes on {collection.name}: {e}")
@@ -3,10 +3,31 @@ from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import collection_routes
 from app.core.config import get_settings
-from app.core.database import db
+from app.middlewares.admission import AdmissionControl, AdmissionMiddleware, RouteRule, CRITICAL, LOW
+from app.core.database import db, ensure_indexes, mongo_breaker
+from app.core.circuit_breaker import breaker_stats
+from app.middlewares.dependency_guard import MongoGuardMiddleware
+from app.core.health import prober
 
 app = FastAPI(title="Collection Service")
 
+# Admission control: bulkhead cho route đắt + shed theo lag event loop.
+# Thêm trước CORS → CORS bọc ngoài, response 503 vẫn có header CORS.
+admission = AdmissionControl(
+    rules=[
+        RouteRule("health", r"^/(health|livez|readyz)$", CRITICAL),
+        RouteRule("browse", r"^/api/collections/public/browse$", LOW),
+        RouteRule("search", r"^/api/collections/search/query$", LOW),
+    ],
+    max_in_flight=get_settings().ADMISSION_MAX_IN_FLIGHT,
+    lag_shed_ms=get_settings().ADMISSION_LAG_SHED_MS,
+    bulkheads=get_settings().ADMISSION_BULKHEADS
+)
+app.add_middleware(AdmissionMiddleware, control=admission)
+
+# Mongo breaker open → 503 ngay (trong CORS để response vẫn có header CORS)
+app.add_middleware(MongoGuardMiddleware, breaker=mongo_breaker)
+
 # CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -25,6 +46,19 @@ app.add_middleware(
 # Include routers
 app.include_router(collection_routes.router, prefix="/api/collections")
 
+@app.on_event("startup")
+async def startup():
+    # /readyz đọc kết quả probe, không ping dependency trên request path
+    prober.register("mongo", lambda: db.command("ping"))
+    prober.start()
+    await ensure_indexes()
+    admission.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await prober.stop()
+    await admission.stop()
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     return JSONResponse(
@@ -43,10 +77,23 @@ async def health_check():
             "status": "healthy",
             "service": "collection_service",
             "mongo": "connected",
-            "collections": collections
+            "collections": collections,
+            "admission": admission.stats(),
+            "circuitBreakers": breaker_stats()
         }
     except Exception as e:
         raise HTTPException(
             status_code=503,
             detail=f"Service Unavailable: {str(e)}"
         )
+
+@app.get("/livez")
+async def livez():
+    # Chỉ xác nhận process + event loop còn phục vụ request, không chạm dependency
+    return {"status": "ok", "service": "collection_service"}
+
+@app.get("/readyz")
+async def readyz():
+    ready, report = prober.readiness()
+    report["circuitBreakers"] = breaker_stats()
+    return JSONResponse(status_code=200 if ready else 503, content=report)
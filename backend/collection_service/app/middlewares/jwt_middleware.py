@@ -1,3 +1,6 @@
+import hashlib
+import time
+from collections import OrderedDict
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
@@ -6,15 +9,29 @@ from datetime import datetime
 
 security = HTTPBearer(auto_error=False)
 
+# Payload đã verify chữ ký, key = sha256(token), giữ tới exp → request sau dùng lại
+# cùng token không phải decode + verify HMAC lần nữa (mỗi worker 1 bản, LRU)
+MAX_VERIFIED_TOKENS = 10000
+_verified_tokens: "OrderedDict[bytes, dict]" = OrderedDict()
+
+def _verify_signature(token: str) -> dict:
+    key = hashlib.sha256(token.encode()).digest()
+    payload = _verified_tokens.get(key)
+    if payload is not None and payload.get("exp", 0) > time.time():
+        _verified_tokens.move_to_end(key)
+        return dict(payload)
+    _verified_tokens.pop(key, None)
+    payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+    _verified_tokens[key] = payload
+    if len(_verified_tokens) > MAX_VERIFIED_TOKENS:
+        _verified_tokens.popitem(last=False)
+    return dict(payload)
+
 async def _decode_token(credentials: HTTPAuthorizationCredentials):
     if not credentials:
         return None
     try:
-        payload = jwt.decode(
-            credentials.credentials,
-            settings.JWT_SECRET,
-            algorithms=[settings.JWT_ALGORITHM]
-        )
+        payload = _verify_signature(credentials.credentials)
         if payload.get("exp", 0) < datetime.utcnow().timestamp():
             raise HTTPException(status_code=401, detail={"success": False, "error": "Token expired"})
         return payload
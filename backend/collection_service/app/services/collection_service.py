@@ -1,5 +1,6 @@
 from app.core.database import collections_collection, users_collection, movies_collection, books_collection
 from app.core.response import fail
+from app.services.user_summary_service import get_user_summaries
 from bson import ObjectId
 from datetime import datetime
 from typing import Optional
@@ -166,33 +167,36 @@ async def get_public_collections(page: int = 1, limit: int = 20):
         {"$sort": {"createdAt": -1}},
         {"$skip": skip},
         {"$limit": limit},
-        {
-            "$lookup": {
-                "from": "users",
-                "localField": "userId",
-                "foreignField": "_id",
-                "as": "owner"
-            }
-        },
-        {"$unwind": "$owner"},
         {
             "$project": {
                 "_id": 1,
+                "userId": 1,
                 "name": 1,
                 "description": 1,
                 "itemCount": 1,
                 "items": 1,
-                "createdAt": 1,
-                "owner": {
-                    "_id": "$owner._id",
-                    "username": "$owner.username",
-                    "avatar": "$owner.avatar"
-                }
+                "createdAt": 1
             }
         }
     ]
 
-    collections = await collections_collection.aggregate(pipeline).to_list(limit)
+    docs = await collections_collection.aggregate(pipeline).to_list(limit)
+
+    # Owners for the whole page in one batched lookup
+    owners = await get_user_summaries(c["userId"] for c in docs)
+    collections = []
+    for collection in docs:
+        owner_id = collection.pop("userId")
+        owner = owners.get(str(owner_id))
+        if not owner:
+            continue
+        collection["owner"] = {
+            "_id": owner_id,
+            "username": owner["username"],
+            "avatar": owner["avatar"]
+        }
+        collections.append(collection)
+
     total = await collections_collection.count_documents({"privacy": "public"})
 
     return {"collections": collections, "total": total}
@@ -0,0 +1,62 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable
+
+from bson import ObjectId
+from app.core.database import users_collection
+
+# Only the fields needed to render an owner, never the whole user document
+SUMMARY_PROJECTION = {"displayName": 1, "username": 1, "avatar": 1}
+
+# This service has no Redis, so summaries live in a short-lived in-process cache
+L1_TTL = 60
+L1_MAX_SIZE = 5000
+
+_l1: "OrderedDict[str, tuple]" = OrderedDict()
+
+
+def _l1_get(user_id: str):
+    entry = _l1.get(user_id)
+    if not entry:
+        return None
+    expires_at, summary = entry
+    if expires_at < time.monotonic():
+        _l1.pop(user_id, None)
+        return None
+    _l1.move_to_end(user_id)
+    return summary
+
+
+def _l1_set(user_id: str, summary: dict):
+    _l1[user_id] = (time.monotonic() + L1_TTL, summary)
+    _l1.move_to_end(user_id)
+    while len(_l1) > L1_MAX_SIZE:
+        _l1.popitem(last=False)
+
+
+async def get_user_summaries(user_ids: Iterable[str]) -> Dict[str, dict]:
+    """Batched {user_id: {displayName, username, avatar}} lookup, one $in query for cache misses"""
+    result = {}
+    missing = []
+    for user_id in dict.fromkeys(str(u) for u in user_ids):
+        summary = _l1_get(user_id)
+        if summary is not None:
+            result[user_id] = summary
+        elif ObjectId.is_valid(user_id):
+            missing.append(user_id)
+
+    if not missing:
+        return result
+
+    cursor = users_collection.find({"_id": {"$in": [ObjectId(u) for u in missing]}}, SUMMARY_PROJECTION)
+    async for user in cursor:
+        user_id = str(user["_id"])
+        summary = {
+            "displayName": user.get("displayName"),
+            "username": user.get("username"),
+            "avatar": user.get("avatar")
+        }
+        result[user_id] = summary
+        _l1_set(user_id, summary)
+
+    return result
@@ -1,8 +1,11 @@
-from fastapi import Depends, Query
+from fastapi import Depends, Query, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from app.services.comment_service import (
-    get_comments, create_comment, delete_comment, report_comment
+    get_comments, create_comment, delete_comment, report_comment, get_moderation_queue,
+    set_comment_status, reload_moderation_terms
 )
-from app.schemas.comment_dto import CreateCommentDTO, CommentListQuery
+from app.services.comment_feed_service import comment_feed
+from app.schemas.comment_dto import CreateCommentDTO, CommentListQuery, CommentStatusDTO
 from app.middlewares.jwt_middleware import verify_token
 from app.core.response import success
 
@@ -22,6 +25,19 @@ async def list_comments_controller(
     comments = await get_comments(query)
     return success(comments)
 
+async def stream_comments_controller(contentType: str, contentId: str, request: Request):
+    """Live feed of new/removed comments for one content (Server-Sent Events)"""
+    if comment_feed.unavailable:
+        raise HTTPException(status_code=503, detail="Live comments are not available, please refresh instead")
+    if not comment_feed.has_capacity():
+        raise HTTPException(status_code=503, detail="Too many live connections, please retry later")
+
+    return StreamingResponse(
+        comment_feed.events(contentType, contentId, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 async def create_comment_controller(
     data: CreateCommentDTO,
     user_payload=Depends(verify_token)
@@ -49,3 +65,30 @@ async def report_comment_controller(
     user_id = user_payload["sub"]
     result = await report_comment(comment_id, user_id, reason)
     return success(result, message="Comment reported successfully")
+
+async def moderation_queue_controller(
+    page: int,
+    limit: int,
+    queue: str,
+    user_payload=Depends(verify_token)
+):
+    """Most-reported or held comments (admin/moderator only)"""
+    user_id = user_payload["sub"]
+    result = await get_moderation_queue(user_id, page, limit, queue)
+    return success(result)
+
+async def comment_status_controller(
+    comment_id: str,
+    data: CommentStatusDTO,
+    user_payload=Depends(verify_token)
+):
+    """Approve or reject a comment (admin/moderator only)"""
+    user_id = user_payload["sub"]
+    result = await set_comment_status(comment_id, user_id, data.status)
+    return success(result, message="Comment status updated")
+
+async def reload_moderation_controller(user_payload=Depends(verify_token)):
+    """Reload the banned-term list (admin/moderator only)"""
+    user_id = user_payload["sub"]
+    result = await reload_moderation_terms(user_id)
+    return success(result, message="Moderation terms reloaded")
@@ -18,8 +18,7 @@ async def search_controller(
     return success(await search_content(query, user_id, page, limit))
 
 async def get_movie_controller(movie_id: str, user_payload=Depends(verify_token_optional)):
-    user_id = user_payload["sub"] if user_payload else None
-    return success(await get_movie_detail(movie_id, user_id))
+    return success(await get_movie_detail(movie_id, user_payload))
 
 # app/controllers/movie_controller.py
 # app/controllers/movie_controller.py
@@ -37,7 +36,7 @@ async def trending_controller(
 
 # 2. Authenticated APIs
 async def start_watching_controller(movie_id: str, user_payload=Depends(verify_token)):
-    return success(await start_watching(movie_id, user_payload["sub"]))
+    return success(await start_watching(movie_id, user_payload))
 
 async def update_progress_controller(movie_id: str, data: WatchProgressDTO, user_payload=Depends(verify_token)):
     return success(await update_progress(movie_id, user_payload["sub"], data))
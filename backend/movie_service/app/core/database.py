@@ -1,8 +1,60 @@
 from app.core.config import get_settings
 from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.circuit_breaker import CircuitBreaker
+from pymongo import monitoring, IndexModel, ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
+import logging
+
+log = logging.getLogger(__name__)
 
 settings = get_settings()
-client = AsyncIOMotorClient(settings.MONGO_URI)
+
+# Circuit breaker cho Mongo: lỗi kết nối / timeout (command event có errtype, heartbeat fail)
+# → failure; command thành công → success. MongoGuardMiddleware chặn request khi breaker open.
+# serverSelectionTimeoutMS mặc định 30s → hạ xuống để request không treo nửa phút khi Mongo rớt.
+MONGO_SERVER_SELECTION_TIMEOUT_MS = 5000
+_CONNECTION_ERRORS = {"AutoReconnect", "NetworkTimeout", "ConnectionFailure", "WaitQueueTimeoutError"}
+mongo_breaker = CircuitBreaker("mongo")
+
+# Change stream ($changeStream) chỉ chạy trên replica set / sharded cluster;
+# mongod standalone (docker-compose mặc định) trả lỗi 40573 → service phải tự fallback.
+CHANGE_STREAM_UNSUPPORTED = 40573
+
+
+def change_streams_unsupported(e: Exception) -> bool:
+    return isinstance(e, OperationFailure) and (
+        e.code == CHANGE_STREAM_UNSUPPORTED or "only supported on replica sets" in str(e)
+    )
+
+
+class _BreakerCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_breaker.record_success()
+
+    def failed(self, event):
+        if event.failure.get("errtype") in _CONNECTION_ERRORS:
+            mongo_breaker.record_failure()
+
+
+class _BreakerHeartbeatListener(monitoring.ServerHeartbeatListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        mongo_breaker.record_failure()
+
+
+client = AsyncIOMotorClient(
+    settings.MONGO_URI,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    event_listeners=[_BreakerCommandListener(), _BreakerHeartbeatListener()]
+)
 db = client[settings.DATABASE_NAME]
 
 users_collection = db.get_collection("users")
@@ -13,4 +65,86 @@ movies_collection = db.get_collection("movies")
 premium_subscriptions_collection = db.get_collection("premiumSubscriptions")
 ratings_collection = db.get_collection("ratings")
 books_collection = db.get_collection("books")
-comments_collection = db.get_collection("comments")
\ No newline at end of file
+comments_collection = db.get_collection("comments")
+comment_reports_collection = db.get_collection("comment_reports")
+content_stats_collection = db.get_collection("content_stats")
+moderation_terms_collection = db.get_collection("moderation_terms")
+
+# Index cho các query nóng của service (idempotent, chạy lúc startup)
+MOVIE_INDEXES = [
+    IndexModel([("isActive", ASCENDING), ("isDeleted", ASCENDING), ("totalViews", DESCENDING)]),
+    IndexModel([("isActive", ASCENDING), ("isDeleted", ASCENDING), ("rating", DESCENDING)]),
+    IndexModel([("isActive", ASCENDING), ("isDeleted", ASCENDING), ("releaseYear", DESCENDING), ("totalViews", DESCENDING)]),
+    IndexModel([("isActive", ASCENDING), ("isDeleted", ASCENDING), ("releaseYear", DESCENDING), ("rating", DESCENDING)]),
+]
+# Mỗi user chỉ 1 rating / nội dung: upsert song song (double-submit) không tạo 2 doc
+# → content_stats không bị $inc 2 lần. Partial vì collection ratings dùng chung với book_service.
+RATING_INDEXES = [
+    IndexModel(
+        [("userId", ASCENDING), ("contentType", ASCENDING), ("contentId", ASCENDING)],
+        name="user_content_unique", unique=True,
+        partialFilterExpression={"contentId": {"$exists": True}}
+    ),
+]
+# Index cũ cùng key nhưng không unique → drop sau khi bản unique (khác partialFilterExpression) build xong
+LEGACY_RATING_INDEX = "userId_1_contentType_1_contentId_1"
+COMMENT_INDEXES = [
+    IndexModel([("contentType", ASCENDING), ("contentId", ASCENDING), ("status", ASCENDING), ("createdAt", DESCENDING)]),
+    # Hàng đợi moderation: chỉ index các comment đã bị report
+    IndexModel(
+        [("reportCount", DESCENDING), ("createdAt", DESCENDING)],
+        partialFilterExpression={"reportCount": {"$gt": 0}}
+    ),
+    # Comment bị bộ lọc giữ lại chờ duyệt
+    IndexModel([("createdAt", DESCENDING)], name="pending_createdAt", partialFilterExpression={"status": "pending"}),
+]
+COMMENT_REPORT_INDEXES = [
+    # Mỗi user chỉ report 1 comment 1 lần
+    IndexModel([("commentId", ASCENDING), ("userId", ASCENDING)], unique=True),
+]
+MODERATION_TERM_INDEXES = [
+    IndexModel([("term", ASCENDING)], unique=True),
+]
+WATCHING_PROGRESS_INDEXES = [
+    IndexModel([("userId", ASCENDING), ("viewedAt", DESCENDING)]),
+    IndexModel([("userId", ASCENDING), ("movieId", ASCENDING)]),
+]
+
+async def _drop_legacy_index(collection, name: str, replacement: str):
+    """Drop index cũ chỉ khi index thay thế đã build xong; build lỗi (còn dữ liệu trùng) → giữ index cũ"""
+    try:
+        info = await collection.index_information()
+        if name not in info:
+            return
+        if replacement not in info:
+            log.error(
+                f"[DB] {replacement} missing on {collection.name}, keeping {name}; "
+                "remove duplicates with backfill_content_stats.py and restart"
+            )
+            return
+        await collection.drop_index(name)
+        log.info(f"[DB] Dropped legacy index {name} on {collection.name}")
+    except Exception as e:
+        log.error(f"[DB] Failed to drop legacy index {name} on {collection.name}: {e}")
+
+async def ensure_indexes():
+    """Create the indexes the service queries rely on"""
+    for collection, indexes in (
+        (movies_collection, MOVIE_INDEXES),
+        (watching_progress_collection, WATCHING_PROGRESS_INDEXES),
+        (ratings_collection, RATING_INDEXES),
+        (comments_collection, COMMENT_INDEXES),
+        (comment_reports_collection, COMMENT_REPORT_INDEXES),
+        (moderation_terms_collection, MODERATION_TERM_INDEXES),
+    ):
+        try:
+            await collection.create_indexes(indexes)
+        except Exception as e:
+            log.error(f"[DB] Failed to create indexes on {collection.name}: {e}")
+    await _drop_legacy_index(ratings_collection, LEGACY_RATING_INDEX, "user_content_unique")
+
+    # get_movies dùng $text; collection chỉ được có 1 text index
+    try:
+        await movies_collection.create_index([("title", TEXT), ("description", TEXT)], name="movies_text")
+    except Exception as e:
+        log.warning(f"[DB] Text index on movies not created: {e}")
@@ -6,11 +6,42 @@ from app.core.limiter import limiter
 from slowapi.middleware import SlowAPIMiddleware
 from slowapi.errors import RateLimitExceeded
 from app.core.config import get_settings
-from app.core.database import db, movies_collection, watching_progress_collection, ratings_collection
+from app.middlewares.admission import AdmissionControl, AdmissionMiddleware, RouteRule, CRITICAL, LOW, BYPASS
+from app.core.database import db, movies_collection, watching_progress_collection, ratings_collection, ensure_indexes, mongo_breaker
+from app.core.circuit_breaker import breaker_stats
+from app.middlewares.dependency_guard import MongoGuardMiddleware
+from app.core.health import prober
+from app.services.comment_feed_service import comment_feed
+from app.services.moderation_service import moderation_filter
+from app.services.content_link_service import content_links
 import asyncio
+from app.core.token_blacklist import revocations, ping_redis
+from app.core.rate_limiter import rate_limiter
 
 app = FastAPI(title="Movie Service")
 
+# Admission control: bulkhead cho route đắt + shed theo lag event loop.
+# Thêm trước CORS → CORS bọc ngoài, response 503 vẫn có header CORS.
+admission = AdmissionControl(
+    rules=[
+        RouteRule("health", r"^/(health|livez|readyz)$", CRITICAL),
+        RouteRule("detail", r"^/api/movies/[0-9a-fA-F]{24}$", CRITICAL, ["GET"]),
+        RouteRule("watch", r"^/api/movies/[0-9a-fA-F]{24}/watch$", CRITICAL, ["POST"]),
+        RouteRule("progress", r"^/api/movies/[0-9a-fA-F]{24}/progress$", CRITICAL, ["PUT"]),
+        RouteRule("comment_stream", r"^/api/comments/stream$", BYPASS),
+        RouteRule("search", r"^/api/movies/search$", LOW),
+        RouteRule("recommended", r"^/api/movies/recommended$", LOW),
+        RouteRule("random", r"^/api/movies/random$", LOW),
+    ],
+    max_in_flight=get_settings().ADMISSION_MAX_IN_FLIGHT,
+    lag_shed_ms=get_settings().ADMISSION_LAG_SHED_MS,
+    bulkheads=get_settings().ADMISSION_BULKHEADS
+)
+app.add_middleware(AdmissionMiddleware, control=admission)
+
+# Mongo breaker open → 503 ngay (trong CORS để response vẫn có header CORS)
+app.add_middleware(MongoGuardMiddleware, breaker=mongo_breaker)
+
 # CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -33,11 +64,37 @@ app.add_middleware(SlowAPIMiddleware)
 app.include_router(movie_routes.router, prefix="/api/movies")
 app.include_router(comment_routes.router, prefix="/api")
 
+@app.on_event("startup")
+async def startup():
+    # /readyz đọc kết quả probe, không ping dependency trên request path
+    prober.register("mongo", lambda: db.command("ping"))
+    prober.register("redis", ping_redis, required=False)
+    prober.start()
+    await ensure_indexes()
+    revocations.start()
+    admission.start()
+    await rate_limiter.start()
+    await moderation_filter.start()
+    await content_links.start()
+    # Mở change stream ngay lúc startup → biết sớm Mongo có hỗ trợ không (standalone → /comments/stream trả 503)
+    comment_feed.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await prober.stop()
+    await revocations.stop()
+    await admission.stop()
+    await rate_limiter.stop()
+    await comment_feed.stop()
+    await moderation_filter.stop()
+    await content_links.stop()
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     return JSONResponse(
         status_code=exc.status_code,
-        content={"success": False, "error": exc.detail}
+        content={"success": False, "error": exc.detail},
+        headers=getattr(exc, "headers", None)
     )
 
 @app.exception_handler(RateLimitExceeded)
@@ -69,10 +126,24 @@ async def health_check(request: Request):
             "sample_movie": bool(sample_movie),
             "sample_progress": bool(sample_progress),
             "sample_rating": bool(sample_rating),
+            "rateLimit": rate_limiter.stats(),
+            "admission": admission.stats(),
+            "circuitBreakers": breaker_stats(),
             "timestamp": asyncio.get_event_loop().time()
         }
     except Exception as e:
         raise HTTPException(
             status_code=503,
             detail=f"Service Unavailable: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@app.get("/livez")
+async def livez():
+    # Chỉ xác nhận process + event loop còn phục vụ request, không chạm dependency
+    return {"status": "ok", "service": "movie_service"}
+
+@app.get("/readyz")
+async def readyz():
+    ready, report = prober.readiness()
+    report["circuitBreakers"] = breaker_stats()
+    return JSONResponse(status_code=200 if ready else 503, content=report)
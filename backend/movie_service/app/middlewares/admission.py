@@ -0,0 +1,162 @@
+# app/middlewares/admission.py
+import asyncio
+import logging
+import re
+import time
+from typing import Dict, List, Optional
+
+from fastapi.responses import JSONResponse
+
+log = logging.getLogger(__name__)
+
+# Mức ưu tiên của 1 route:
+#   CRITICAL: health, progress, detail... không bao giờ bị shed
+#   NORMAL:   shed khi event loop đã rất chậm / số request đang chạy chạm trần
+#   LOW:      request đắt (regex search, recommend, browse) → shed sớm nhất
+#   BYPASS:   stream sống lâu (SSE) → không đếm, không shed
+CRITICAL, NORMAL, LOW, BYPASS = "critical", "normal", "low", "bypass"
+
+LAG_INTERVAL = 0.05      # giây giữa 2 lần đo lag
+LAG_DECAY = 0.8          # lag tăng ngay theo mẫu mới, giảm dần khi loop rảnh lại
+NORMAL_LAG_FACTOR = 4    # NORMAL chỉ bị shed khi lag >= 4 x ngưỡng của LOW
+LOW_IN_FLIGHT_SHARE = 0.5
+
+
+class RouteRule:
+    def __init__(self, name: str, pattern: str, priority: str = NORMAL, methods: Optional[List[str]] = None):
+        self.name = name
+        self.pattern = re.compile(pattern)
+        self.priority = priority
+        self.methods = set(methods) if methods else None
+
+    def matches(self, method: str, path: str) -> bool:
+        return (self.methods is None or method in self.methods) and self.pattern.match(path) is not None
+
+
+_DEFAULT_RULE = RouteRule("default", r"", NORMAL)
+
+
+class LoopLagMonitor:
+    """Đo độ trễ event loop: task ngủ LAG_INTERVAL, thức dậy muộn bao nhiêu thì loop bận bấy nhiêu"""
+
+    def __init__(self):
+        self.lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(LAG_INTERVAL)
+            sample = max((time.monotonic() - started - LAG_INTERVAL) * 1000, 0.0)
+            self.lag_ms = sample if sample > self.lag_ms else self.lag_ms * LAG_DECAY + sample * (1 - LAG_DECAY)
+            self.max_lag_ms = max(self.max_lag_ms, sample)
+
+
+class AdmissionControl:
+    """
+    Admission control theo route cho 1 worker:
+    - bulkhead: route có giới hạn trong ADMISSION_BULKHEADS chỉ chạy tối đa N request cùng lúc
+    - shed theo tải: lag event loop + số request đang chạy vượt ngưỡng → LOW (rồi NORMAL) bị từ chối
+    Request bị từ chối nhận 503 + Retry-After ngay, không xếp hàng → request rẻ vẫn nhanh.
+    """
+
+    def __init__(self, rules: List[RouteRule], max_in_flight: int, lag_shed_ms: float,
+                 bulkheads: Dict[str, int], retry_after: int = 1):
+        self.rules = rules
+        self.max_in_flight = max_in_flight
+        self.lag_shed_ms = lag_shed_ms
+        self.bulkheads = bulkheads
+        self.retry_after = retry_after
+        self.monitor = LoopLagMonitor()
+        self.in_flight = 0
+        self._running: Dict[str, int] = {}
+        self.admitted = 0
+        self.shed: Dict[str, int] = {}
+
+    def start(self):
+        self.monitor.start()
+
+    async def stop(self):
+        await self.monitor.stop()
+
+    def classify(self, method: str, path: str) -> RouteRule:
+        return next((rule for rule in self.rules if rule.matches(method, path)), _DEFAULT_RULE)
+
+    def _reject_reason(self, rule: RouteRule) -> Optional[str]:
+        limit = self.bulkheads.get(rule.name)
+        if limit is not None and self._running.get(rule.name, 0) >= limit:
+            return "bulkhead"
+        if rule.priority == LOW and (
+            self.monitor.lag_ms >= self.lag_shed_ms
+            or self.in_flight >= self.max_in_flight * LOW_IN_FLIGHT_SHARE
+        ):
+            return "overload"
+        if rule.priority == NORMAL and (
+            self.monitor.lag_ms >= self.lag_shed_ms * NORMAL_LAG_FACTOR
+            or self.in_flight >= self.max_in_flight
+        ):
+            return "overload"
+        return None
+
+    def _reject(self, rule: RouteRule, reason: str) -> JSONResponse:
+        self.shed[rule.name] = self.shed.get(rule.name, 0) + 1
+        return JSONResponse(
+            status_code=503,
+            content={"success": False, "error": "Server is busy, please retry shortly"},
+            headers={"Retry-After": str(self.retry_after), "X-Shed-Reason": reason}
+        )
+
+    async def __call__(self, scope, receive, send, app):
+        rule = self.classify(scope["method"], scope["path"])
+        if rule.priority == BYPASS:
+            return await app(scope, receive, send)
+        if rule.priority != CRITICAL:
+            reason = self._reject_reason(rule)
+            if reason:
+                return await self._reject(rule, reason)(scope, receive, send)
+
+        self.admitted += 1
+        self.in_flight += 1
+        self._running[rule.name] = self._running.get(rule.name, 0) + 1
+        try:
+            await app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            self._running[rule.name] -= 1
+
+    def stats(self) -> dict:
+        return {
+            "loopLagMs": round(self.monitor.lag_ms, 1),
+            "maxLoopLagMs": round(self.monitor.max_lag_ms, 1),
+            "inFlight": self.in_flight,
+            "running": {name: count for name, count in self._running.items() if count},
+            "admitted": self.admitted,
+            "shed": dict(self.shed)
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware: app.add_middleware(AdmissionMiddleware, control=admission)"""
+
+    def __init__(self, app, control: AdmissionControl):
+        self.app = app
+        self.control = control
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        await self.control(scope, receive, send, self.app)
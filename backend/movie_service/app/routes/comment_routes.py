@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Depends, Query, Body
+from typing import Literal
+from fastapi import APIRouter, Depends, Query, Body, Request
 from app.controllers.comment_controller import (
     list_comments_controller,
+    stream_comments_controller,
     create_comment_controller,
     delete_comment_controller,
-    report_comment_controller
+    report_comment_controller,
+    moderation_queue_controller,
+    comment_status_controller,
+    reload_moderation_controller
 )
-from app.schemas.comment_dto import CreateCommentDTO
+from app.schemas.comment_dto import CreateCommentDTO, CommentStatusDTO
 from app.middlewares.jwt_middleware import verify_token
 
 router = APIRouter(prefix="/comments", tags=["Comments"])
@@ -21,6 +26,34 @@ async def get_comments(
     """Get all comments for a specific content (public)"""
     return await list_comments_controller(contentType, contentId, page, limit)
 
+# GET /api/comments/stream?contentType=movie&contentId=123
+@router.get("/stream")
+async def stream_comments(
+    request: Request,
+    contentType: Literal["movie", "book"] = Query(...),
+    contentId: str = Query(..., min_length=1)
+):
+    """Live comment feed over Server-Sent Events (public).
+    Load the first page with GET /api/comments, then listen here instead of polling."""
+    return await stream_comments_controller(contentType, contentId, request)
+
+# GET /api/comments/moderation/queue?page=1&limit=20&queue=reported|pending
+@router.get("/moderation/queue")
+async def get_moderation_queue(
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    queue: Literal["reported", "pending"] = Query("reported"),
+    user_payload = Depends(verify_token)
+):
+    """Page through the most-reported or held comments (admin/moderator only)"""
+    return await moderation_queue_controller(page, limit, queue, user_payload)
+
+# POST /api/comments/moderation/reload
+@router.post("/moderation/reload")
+async def reload_moderation(user_payload = Depends(verify_token)):
+    """Rebuild the banned-term filter from moderation_terms (admin/moderator only)"""
+    return await reload_moderation_controller(user_payload)
+
 # POST /api/comments
 @router.post("")
 async def create_comment(
@@ -48,3 +81,13 @@ async def report_comment(
 ):
     """Report a comment for moderation (authenticated)"""
     return await report_comment_controller(comment_id, reason, user_payload)
+
+# PATCH /api/comments/{comment_id}/status
+@router.patch("/{comment_id}/status")
+async def update_comment_status(
+    comment_id: str,
+    data: CommentStatusDTO,
+    user_payload = Depends(verify_token)
+):
+    """Approve or reject a comment (admin/moderator only)"""
+    return await comment_status_controller(comment_id, data, user_payload)
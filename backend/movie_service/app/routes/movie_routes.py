@@ -24,7 +24,7 @@ async def start_watching(movie_id: str, user_payload=Depends(verify_token)):
     return await start_watching_controller(movie_id, user_payload)
 
 @router.put("/{movie_id}/progress")
-@rate_limit(max_requests=60, duration=60, identifier_from="user")
+@rate_limit(max_requests=60, duration=60, identifier_from="user", burst=5)
 async def update_progress(movie_id: str, data: WatchProgressDTO, user_payload=Depends(verify_token)):
     return await update_progress_controller(movie_id, data, user_payload)
 
@@ -76,7 +76,7 @@ async def start_watching(
 
 # PROGRESS
 @router.put("/{movie_id}/progress")
-@rate_limit(max_requests=60, duration=60, identifier_from="user")
+@rate_limit(max_requests=60, duration=60, identifier_from="user", burst=5)
 async def update_progress(
     movie_id: str,
     data: WatchProgressDTO,
@@ -22,3 +22,6 @@ class CommentListQuery(BaseModel):
     contentId: str
     page: int = Field(1, ge=1)
     limit: int = Field(50, ge=1, le=100)
+
+class CommentStatusDTO(BaseModel):
+    status: Literal["approved", "rejected"]
@@ -0,0 +1,182 @@
+# app/services/comment_feed_service.py
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from typing import Dict, Set, Tuple
+
+from pymongo.errors import OperationFailure, PyMongoError
+from app.core.database import comments_collection, change_streams_unsupported
+from app.services.comment_service import serialize_comment
+from app.services.user_summary_service import get_user_summaries
+
+log = logging.getLogger(__name__)
+
+# Mỗi worker chỉ mở 1 change stream trên `comments`, rồi fan-out trong memory
+# tới các client SSE đang xem cùng (contentType, contentId).
+QUEUE_SIZE = 100            # event tối đa đang chờ / client
+HEARTBEAT_INTERVAL = 15     # giây, giữ kết nối qua proxy + phát hiện client đã đóng
+MAX_SUBSCRIBERS = 5000      # / worker
+MAX_RETRY_DELAY = 30
+RECENT_COMMENTS = 10000     # comment_id -> key, để route được event delete
+
+# insert + update có đổi status (ẩn/duyệt comment) + delete
+WATCH_PIPELINE = [{"$match": {"$or": [
+    {"operationType": {"$in": ["insert", "delete"]}},
+    {"operationType": "update", "updateDescription.updatedFields.status": {"$exists": True}}
+]}}]
+
+# Client đọc chậm bị đầy queue: gửi resync (client tự GET lại danh sách) rồi đóng
+RESYNC_FRAME = "event: resync\ndata: {}\n\n"
+# Mongo không hỗ trợ change stream (standalone): báo client rồi đóng, endpoint trả 503 từ đó
+UNAVAILABLE_FRAME = "event: unavailable\ndata: {}\n\n"
+
+
+def _frame(event: str, data: dict, event_id: str = None) -> str:
+    lines = f"id: {event_id}\n" if event_id else ""
+    return f"{lines}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class CommentFeed:
+    def __init__(self):
+        self._subscribers: Dict[Tuple[str, str], Set[asyncio.Queue]] = {}
+        self._recent: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+        self._count = 0
+        self._task = None
+        # True khi Mongo không có change stream (cần replica set) → feed không bao giờ có event
+        self.unavailable = False
+
+    def has_capacity(self) -> bool:
+        return self._count < MAX_SUBSCRIBERS
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _subscribe(self, key: Tuple[str, str]) -> asyncio.Queue:
+        self.start()
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._subscribers.setdefault(key, set()).add(queue)
+        self._count += 1
+        return queue
+
+    def _unsubscribe(self, key: Tuple[str, str], queue: asyncio.Queue):
+        queues = self._subscribers.get(key)
+        if not queues or queue not in queues:
+            return
+        queues.discard(queue)
+        self._count -= 1
+        if not queues:
+            del self._subscribers[key]
+
+    def _publish(self, key: Tuple[str, str], frame: str):
+        # Frame đã render sẵn 1 lần, chỉ put vào queue của từng client
+        for queue in list(self._subscribers.get(key, ())):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC_FRAME)
+                self._unsubscribe(key, queue)
+
+    def _close_all(self, frame: str):
+        for key, queues in list(self._subscribers.items()):
+            for queue in list(queues):
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(frame)
+                self._unsubscribe(key, queue)
+
+    def _remember(self, comment_id: str, key: Tuple[str, str]):
+        self._recent[comment_id] = key
+        self._recent.move_to_end(comment_id)
+        while len(self._recent) > RECENT_COMMENTS:
+            self._recent.popitem(last=False)
+
+    async def _dispatch(self, change: dict):
+        comment_id = str(change["documentKey"]["_id"])
+
+        if change["operationType"] == "delete":
+            # Delete không có fullDocument: chỉ route được comment đã stream gần đây
+            key = self._recent.pop(comment_id, None)
+            if key and key in self._subscribers:
+                self._publish(key, _frame("comment_removed", {"id": comment_id}, comment_id))
+            return
+
+        comment = change.get("fullDocument")
+        if not comment:
+            return
+        key = (comment["contentType"], comment["contentId"])
+        self._remember(comment_id, key)
+        if key not in self._subscribers:
+            return
+
+        if comment.get("status") != "approved":
+            self._publish(key, _frame("comment_removed", {"id": comment_id}, comment_id))
+            return
+
+        users = await get_user_summaries([comment["userId"]])
+        payload = serialize_comment(comment, users.get(comment["userId"]))
+        self._publish(key, _frame("comment", payload, comment_id))
+
+    async def _watch(self):
+        resume_token = None
+        delay = 1
+        while True:
+            try:
+                async with comments_collection.watch(
+                    WATCH_PIPELINE, full_document="updateLookup", resume_after=resume_token
+                ) as stream:
+                    delay = 1
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        try:
+                            await self._dispatch(change)
+                        except Exception as e:
+                            log.error(f"[COMMENT_FEED] Dispatch failed: {e}")
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                if change_streams_unsupported(e):
+                    log.warning("[COMMENT_FEED] Change streams need a replica set, live comment feed disabled")
+                    self.unavailable = True
+                    self._close_all(UNAVAILABLE_FRAME)
+                    return
+                log.error(f"[COMMENT_FEED] Change stream error, retry in {delay}s: {e}")
+                if isinstance(e, OperationFailure):
+                    resume_token = None  # token hết hạn / không hợp lệ → bắt đầu lại từ hiện tại
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+
+    async def events(self, content_type: str, content_id: str, request):
+        """SSE stream cho 1 content, dừng khi client đóng kết nối hoặc bị resync"""
+        key = (content_type, content_id)
+        queue = self._subscribe(key)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                yield frame
+                if frame is RESYNC_FRAME or frame is UNAVAILABLE_FRAME:
+                    break
+        finally:
+            self._unsubscribe(key, queue)
+
+
+comment_feed = CommentFeed()
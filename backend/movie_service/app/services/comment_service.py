@@ -2,8 +2,30 @@ from bson import ObjectId
 from datetime import datetime
 from fastapi import HTTPException
 from app.core.response import success, fail
-from app.core.database import comments_collection, users_collection
+from pymongo.errors import DuplicateKeyError
+from app.core.database import comments_collection, comment_reports_collection, users_collection
 from app.schemas.comment_dto import CreateCommentDTO, CommentListQuery
+from app.services.user_summary_service import get_user_summaries
+from app.services.content_stats_service import incr_comment_count
+from app.services.moderation_service import moderation_filter, HOLD, REJECT
+
+def serialize_comment(comment: dict, user: dict = None):
+    """Comment document -> API shape (shared by the list endpoint and the live feed)"""
+    user_details = {
+        "displayName": (user.get("displayName") or "Anonymous") if user else "Anonymous",
+        "avatar": (user.get("avatar") or "") if user else ""
+    }
+
+    return {
+        "id": str(comment["_id"]),
+        "userId": comment["userId"],
+        "userDetails": user_details,
+        "contentType": comment["contentType"],
+        "contentId": comment["contentId"],
+        "text": comment["text"],
+        "status": comment["status"],
+        "createdAt": comment["createdAt"].isoformat() + 'Z' if isinstance(comment["createdAt"], datetime) else comment["createdAt"]
+    }
 
 async def get_comments(query: CommentListQuery):
     """Get comments for a specific content"""
@@ -16,37 +38,25 @@ async def get_comments(query: CommentListQuery):
         }
 
         # Get comments with pagination
-        cursor = comments_collection.find(filter_query).sort("createdAt", -1)
+        cursor = comments_collection.find(filter_query, {"reports": 0}).sort("createdAt", -1)
         cursor = cursor.skip((query.page - 1) * query.limit).limit(query.limit)
+        docs = await cursor.to_list(query.limit)
 
-        comments = []
-        async for comment in cursor:
-            # Get user details
-            user = await users_collection.find_one({"_id": ObjectId(comment["userId"])})
+        # Get user details for the whole page in one batched lookup
+        users = await get_user_summaries(comment["userId"] for comment in docs)
 
-            user_details = {
-                "displayName": user.get("displayName", "Anonymous") if user else "Anonymous",
-                "avatar": user.get("avatar", "") if user else ""
-            }
-
-            comments.append({
-                "id": str(comment["_id"]),
-                "userId": comment["userId"],
-                "userDetails": user_details,
-                "contentType": comment["contentType"],
-                "contentId": comment["contentId"],
-                "text": comment["text"],
-                "status": comment["status"],
-                "createdAt": comment["createdAt"].isoformat() + 'Z' if isinstance(comment["createdAt"], datetime) else comment["createdAt"]
-            })
-
-        return comments
+        return [serialize_comment(comment, users.get(comment["userId"])) for comment in docs]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 async def create_comment(user_id: str, data: CreateCommentDTO):
     """Create a new comment"""
     try:
+        # Moderation: 1 lần quét text qua automaton đã build sẵn
+        decision, terms = moderation_filter.check(data.text)
+        if decision == REJECT:
+            raise HTTPException(status_code=400, detail="Comment contains prohibited content")
+
         # Get user details
         user = await users_collection.find_one({"_id": ObjectId(user_id)})
         if not user:
@@ -58,12 +68,16 @@ async def create_comment(user_id: str, data: CreateCommentDTO):
             "contentType": data.contentType,
             "contentId": data.contentId,
             "text": data.text,
-            "status": "approved",  # Auto-approve for now, can add moderation later
+            "status": "pending" if decision == HOLD else "approved",
             "createdAt": datetime.utcnow()
         }
+        if terms:
+            comment_doc["moderationTerms"] = terms
 
         # Insert into database
         result = await comments_collection.insert_one(comment_doc)
+        if comment_doc["status"] == "approved":
+            await incr_comment_count(data.contentType, data.contentId, 1)
 
         # Return created comment
         user_details = {
@@ -78,7 +92,7 @@ async def create_comment(user_id: str, data: CreateCommentDTO):
             "contentType": data.contentType,
             "contentId": data.contentId,
             "text": data.text,
-            "status": "approved",
+            "status": comment_doc["status"],
             "createdAt": comment_doc["createdAt"].isoformat() + 'Z'
         }
     except HTTPException:
@@ -101,8 +115,11 @@ async def delete_comment(comment_id: str, user_id: str):
             if not user or user.get("role") not in ["admin", "moderator"]:
                 raise HTTPException(status_code=403, detail="Not authorized to delete this comment")
 
-        # Delete comment
+        # Delete comment and its reports
         await comments_collection.delete_one({"_id": ObjectId(comment_id)})
+        await comment_reports_collection.delete_many({"commentId": ObjectId(comment_id)})
+        if comment.get("status") == "approved":
+            await incr_comment_count(comment["contentType"], comment["contentId"], -1)
 
         return {"message": "Comment deleted successfully"}
     except HTTPException:
@@ -114,22 +131,25 @@ async def report_comment(comment_id: str, user_id: str, reason: str):
     """Report a comment for moderation"""
     try:
         # Find comment
-        comment = await comments_collection.find_one({"_id": ObjectId(comment_id)})
+        comment = await comments_collection.find_one({"_id": ObjectId(comment_id)}, {"_id": 1})
         if not comment:
             raise HTTPException(status_code=404, detail="Comment not found")
 
-        # Add report to comment
+        # Reports live in their own collection, the comment only keeps a counter
+        now = datetime.utcnow()
+        try:
+            await comment_reports_collection.insert_one({
+                "commentId": ObjectId(comment_id),
+                "userId": user_id,
+                "reason": reason,
+                "createdAt": now
+            })
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail="You have already reported this comment")
+
         await comments_collection.update_one(
             {"_id": ObjectId(comment_id)},
-            {
-                "$push": {
-                    "reports": {
-                        "userId": user_id,
-                        "reason": reason,
-                        "createdAt": datetime.utcnow()
-                    }
-                }
-            }
+            {"$inc": {"reportCount": 1}, "$set": {"lastReportedAt": now}}
         )
 
         return {"message": "Comment reported successfully"}
@@ -137,3 +157,85 @@ async def report_comment(comment_id: str, user_id: str, reason: str):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+async def _require_moderator(user_id: str):
+    user = await users_collection.find_one({"_id": ObjectId(user_id)}, {"role": 1})
+    if not user or user.get("role") not in ["admin", "moderator"]:
+        raise HTTPException(status_code=403, detail="Not authorized to moderate comments")
+
+async def get_moderation_queue(user_id: str, page: int, limit: int, queue: str = "reported"):
+    """Most-reported comments first, or comments held by the filter (admin/moderator only)"""
+    try:
+        await _require_moderator(user_id)
+
+        # Served by the partial {reportCount, createdAt} / pending indexes
+        if queue == "pending":
+            filter_query = {"status": "pending"}
+            sort = [("createdAt", -1)]
+        else:
+            filter_query = {"reportCount": {"$gt": 0}}
+            sort = [("reportCount", -1), ("createdAt", -1)]
+        cursor = comments_collection.find(filter_query, {"reports": 0})
+        cursor = cursor.sort(sort)
+        cursor = cursor.skip((page - 1) * limit).limit(limit)
+
+        comments = []
+        async for comment in cursor:
+            comments.append({
+                "id": str(comment["_id"]),
+                "userId": comment["userId"],
+                "contentType": comment["contentType"],
+                "contentId": comment["contentId"],
+                "text": comment["text"],
+                "status": comment["status"],
+                "reportCount": comment.get("reportCount", 0),
+                "moderationTerms": comment.get("moderationTerms", []),
+                "lastReportedAt": comment["lastReportedAt"].isoformat() + 'Z' if isinstance(comment.get("lastReportedAt"), datetime) else None,
+                "createdAt": comment["createdAt"].isoformat() + 'Z' if isinstance(comment["createdAt"], datetime) else comment["createdAt"]
+            })
+
+        total = await comments_collection.count_documents(filter_query)
+
+        return {
+            "comments": comments,
+            "pagination": {"total": total, "page": page, "limit": limit}
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def set_comment_status(comment_id: str, user_id: str, status: str):
+    """Approve or reject a comment (admin/moderator only)"""
+    try:
+        await _require_moderator(user_id)
+
+        comment = await comments_collection.find_one_and_update(
+            {"_id": ObjectId(comment_id)},
+            {"$set": {"status": status, "moderatedBy": user_id, "moderatedAt": datetime.utcnow()}},
+            projection={"status": 1, "contentType": 1, "contentId": 1}
+        )
+        if not comment:
+            raise HTTPException(status_code=404, detail="Comment not found")
+
+        # Giữ commentCount đúng khi comment được hiện / ẩn
+        was_approved = comment.get("status") == "approved"
+        if was_approved != (status == "approved"):
+            await incr_comment_count(comment["contentType"], comment["contentId"], 1 if status == "approved" else -1)
+
+        return {"id": comment_id, "status": status}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def reload_moderation_terms(user_id: str):
+    """Rebuild the moderation filter now instead of waiting for the periodic refresh"""
+    try:
+        await _require_moderator(user_id)
+        terms = await moderation_filter.reload(force=True)
+        return {"terms": terms}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,197 @@
+# app/services/content_link_service.py
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+from app.core.database import db, books_collection, movies_collection, change_streams_unsupported
+
+log = logging.getLogger(__name__)
+
+# Liên kết phim -> sách gốc giữ trong memory (mỗi worker 1 bản):
+#   movie -> book  (movies.adaptedFromBookId, hoặc books.movieAdaptations)
+# Chỉ gồm sách active, nên resolve không cần query Mongo.
+# Nạp lúc startup, nạp lại (debounce) khi change stream báo liên kết / thông tin sách đổi;
+# Mongo standalone (không có change stream) → nạp lại mỗi RECONCILE_INTERVAL giây.
+BOOK_CARD_PROJECTION = {
+    "title": 1, "author": 1, "description": 1, "coverImageUrl": 1,
+    "categories": 1, "publishYear": 1, "movieAdaptations": 1
+}
+LINK_MOVIE_FIELDS = ("adaptedFromBookId",)
+LINK_BOOK_FIELDS = ("movieAdaptations", "title", "author", "description", "coverImageUrl",
+                    "categories", "publishYear", "isActive", "isDeleted")
+RELOAD_DEBOUNCE = 1.0
+MAX_RETRY_DELAY = 30
+RECONCILE_INTERVAL = 60
+# Nạp lỗi (Mongo rớt) → request trong khoảng này trả book=None luôn, không thử nạp lại
+LOAD_RETRY_INTERVAL = 5.0
+
+WATCH_PIPELINE = [{"$match": {"$or": [
+    {"ns.coll": {"$in": ["movies", "books"]}, "operationType": {"$in": ["insert", "replace", "delete"]}},
+    {"ns.coll": "movies", "operationType": "update", "$or": [
+        {f"updateDescription.updatedFields.{field}": {"$exists": True}} for field in LINK_MOVIE_FIELDS
+    ]},
+    {"ns.coll": "books", "operationType": "update"}
+]}}]
+
+
+def _touches_links(change: dict) -> bool:
+    if change["operationType"] != "update" or change["ns"]["coll"] == "movies":
+        return True
+    fields = change.get("updateDescription", {})
+    keys = list(fields.get("updatedFields", {})) + list(fields.get("removedFields", []))
+    return any(key.split(".")[0] in LINK_BOOK_FIELDS for key in keys)
+
+
+class ContentLinkIndex:
+    def __init__(self):
+        self._book_by_movie: Dict[str, str] = {}
+        self._books: Dict[str, dict] = {}
+        self._loaded = False
+        self._loading: Optional[asyncio.Task] = None
+        self._load_failed_at = 0.0
+        self._dirty = False
+        self._task = None
+        self._reload_handle = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    async def ensure_loaded(self) -> bool:
+        """
+        Startup nạp lỗi / worker chưa chạy startup (script, test harness) → nạp lần đầu dùng.
+        Request đồng thời chờ chung 1 lần nạp; nạp lỗi → False, caller trả book=None thay vì lỗi.
+        """
+        if self._loaded:
+            return True
+        if self._loading is None or self._loading.done():
+            if time.monotonic() - self._load_failed_at < LOAD_RETRY_INTERVAL:
+                return False
+            self._loading = asyncio.create_task(self._load_once())
+        # shield: request bị huỷ không huỷ lần nạp các request khác đang chờ
+        return await asyncio.shield(self._loading)
+
+    async def _load_once(self) -> bool:
+        try:
+            await self.load()
+            return True
+        except Exception as e:
+            self._load_failed_at = time.monotonic()
+            log.error(f"[LINKS] Load failed, serving without book links: {e}")
+            return False
+
+    def book_for_movie(self, movie_id) -> Optional[dict]:
+        book_id = self._book_by_movie.get(str(movie_id))
+        return self._books.get(book_id) if book_id else None
+
+    async def load(self):
+        """Build lại toàn bộ đồ thị rồi swap 1 lần (dữ liệu liên kết nhỏ)"""
+        books = {}
+        book_by_movie = {}
+        cursor = books_collection.find(
+            {"isActive": True, "isDeleted": {"$ne": True}, "movieAdaptations.0": {"$exists": True}},
+            BOOK_CARD_PROJECTION
+        )
+        async for book in cursor:
+            book_id = str(book["_id"])
+            for movie_id in book.pop("movieAdaptations", None) or []:
+                book_by_movie.setdefault(str(movie_id), book_id)
+            book.pop("_id")
+            books[book_id] = {"id": book_id, **book}
+
+        # Phía phim: adaptedFromBookId ưu tiên hơn movieAdaptations
+        missing = set()
+        async for movie in movies_collection.find({"adaptedFromBookId": {"$ne": None}}, {"adaptedFromBookId": 1}):
+            book_id = str(movie["adaptedFromBookId"])
+            book_by_movie[str(movie["_id"])] = book_id
+            if book_id not in books:
+                missing.add(movie["adaptedFromBookId"])
+
+        if missing:
+            cursor = books_collection.find(
+                {"_id": {"$in": list(missing)}, "isActive": True, "isDeleted": {"$ne": True}},
+                BOOK_CARD_PROJECTION
+            )
+            async for book in cursor:
+                book_id = str(book.pop("_id"))
+                book.pop("movieAdaptations", None)
+                books[book_id] = {"id": book_id, **book}
+
+        # Bỏ liên kết tới sách không tồn tại / inactive
+        book_by_movie = {m: b for m, b in book_by_movie.items() if b in books}
+
+        self._books = books
+        self._book_by_movie = book_by_movie
+        self._loaded = True
+        log.info(f"[LINKS] Loaded {len(book_by_movie)} movie-book links")
+
+    def _schedule_reload(self):
+        # Nhiều event liền nhau (script import hàng loạt) → chỉ nạp lại 1 lần;
+        # event đến trong lúc đang nạp sẽ kích hoạt thêm 1 lần nữa
+        self._dirty = True
+        if self._reload_handle and not self._reload_handle.done():
+            return
+        self._reload_handle = asyncio.create_task(self._reload_loop())
+
+    async def _reload_loop(self):
+        while self._dirty:
+            await asyncio.sleep(RELOAD_DEBOUNCE)
+            self._dirty = False
+            try:
+                await self.load()
+            except Exception as e:
+                log.error(f"[LINKS] Reload failed: {e}")
+
+    async def _watch(self):
+        resume_token = None
+        delay = 1
+        while True:
+            try:
+                async with db.watch(WATCH_PIPELINE, resume_after=resume_token) as stream:
+                    delay = 1
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        if _touches_links(change):
+                            self._schedule_reload()
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                if change_streams_unsupported(e):
+                    log.warning(f"[LINKS] Change streams need a replica set, reloading every {RECONCILE_INTERVAL}s instead")
+                    return await self._reconcile()
+                log.error(f"[LINKS] Change stream error, retry in {delay}s: {e}")
+                if isinstance(e, OperationFailure):
+                    resume_token = None
+                # Có thể đã lỡ event trong lúc mất kết nối
+                self._schedule_reload()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+
+    async def _reconcile(self):
+        while True:
+            await asyncio.sleep(RECONCILE_INTERVAL)
+            self._schedule_reload()
+
+    async def start(self):
+        try:
+            await self.load()
+        except Exception as e:
+            log.error(f"[LINKS] Initial load failed: {e}")
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        for task in (self._task, self._reload_handle):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._reload_handle = None
+
+
+content_links = ContentLinkIndex()
@@ -0,0 +1,84 @@
+# app/services/content_stats_service.py
+from bson import ObjectId
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+from pymongo import ReturnDocument
+from app.core.database import content_stats_collection
+
+# 1 document / movie hoặc book, _id = id của content:
+# {_id, contentType, commentCount, ratingSum, ratingCount,
+#  ratingHistogram: {"1".."5"}, views, updatedAt}
+# Chỉ cập nhật bằng $inc → không cần count_documents / $group khi đọc.
+
+
+def _content_oid(content_id):
+    if isinstance(content_id, ObjectId):
+        return content_id
+    return ObjectId(content_id) if ObjectId.is_valid(content_id) else None
+
+
+async def _inc(content_type: str, content_id, inc: dict, return_doc: bool = False):
+    oid = _content_oid(content_id)
+    if not oid:
+        return None
+    update = {
+        "$inc": inc,
+        "$set": {"updatedAt": datetime.utcnow()},
+        "$setOnInsert": {"contentType": content_type}
+    }
+    if return_doc:
+        return await content_stats_collection.find_one_and_update(
+            {"_id": oid}, update, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    await content_stats_collection.update_one({"_id": oid}, update, upsert=True)
+    return None
+
+
+async def incr_comment_count(content_type: str, content_id, delta: int = 1):
+    await _inc(content_type, content_id, {"commentCount": delta})
+
+
+async def incr_views(content_type: str, content_id, delta: int = 1):
+    await _inc(content_type, content_id, {"views": delta})
+
+
+async def record_rating(content_type: str, content_id, rating: int, previous: Optional[int] = None):
+    """Áp dụng 1 rating mới (hoặc sửa rating cũ), trả về stats sau khi cập nhật"""
+    inc = {f"ratingHistogram.{rating}": 1, "ratingSum": rating}
+    if previous is None:
+        inc["ratingCount"] = 1
+    else:
+        inc["ratingSum"] = rating - previous
+        if previous != rating:
+            inc[f"ratingHistogram.{previous}"] = -1
+        else:
+            del inc[f"ratingHistogram.{rating}"]
+    return await _inc(content_type, content_id, inc, return_doc=True)
+
+
+def rating_average(stats: Optional[dict]) -> float:
+    if not stats or not stats.get("ratingCount"):
+        return 0
+    return round(stats["ratingSum"] / stats["ratingCount"], 1)
+
+
+def summarize(stats: Optional[dict]) -> dict:
+    """Dạng gọn để hiển thị trên listing card"""
+    stats = stats or {}
+    histogram = stats.get("ratingHistogram") or {}
+    return {
+        "commentCount": stats.get("commentCount", 0),
+        "ratingCount": stats.get("ratingCount", 0),
+        "ratingAvg": rating_average(stats),
+        "ratingHistogram": {str(i): histogram.get(str(i), 0) for i in range(1, 6)},
+        "views": stats.get("views", 0)
+    }
+
+
+async def get_content_stats(content_ids: Iterable) -> Dict[str, dict]:
+    """Batch read: 1 query $in cho cả trang → {content_id: summary}"""
+    oids = [oid for oid in (_content_oid(c) for c in content_ids) if oid]
+    if not oids:
+        return {}
+    docs = await content_stats_collection.find({"_id": {"$in": oids}}).to_list(len(oids))
+    return {str(doc["_id"]): summarize(doc) for doc in docs}
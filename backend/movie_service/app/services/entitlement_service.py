@@ -0,0 +1,99 @@
+# app/services/entitlement_service.py
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+
+from bson import ObjectId
+from app.core.database import users_collection
+from app.core.token_blacklist import redis_client
+
+log = logging.getLogger(__name__)
+
+# Access token mang sẵn claim isPremium / premiumExpiresAt (epoch) từ lúc login / refresh
+# → user premium qua gate không tốn round trip nào. Chỉ khi claim nói "không premium"
+# (có thể user vừa nâng cấp, token cũ còn sống tới 15 phút) mới tra cache bên dưới.
+ENTITLEMENT_PROJECTION = {"isPremium": 1, "premiumExpiresAt": 1}
+
+# Key dùng chung với user_service.upgrade_premium (ghi giá trị mới khi nâng cấp)
+REDIS_KEY = "entitlement:{}"
+REDIS_TTL = 300
+
+# L1 trong process: TTL rất ngắn vì không nhận được invalidation từ user_service.
+# Chỉ cache kết quả premium: kết quả "không premium" cache ở đây sẽ chặn user vừa nâng cấp
+# (upgrade_premium chỉ ghi được Redis) → luôn tra Redis, 1 round trip.
+L1_TTL = 10
+L1_MAX_SIZE = 5000
+
+_l1: "OrderedDict[str, tuple]" = OrderedDict()
+
+
+def _is_active(is_premium, expires_at: Optional[float]) -> bool:
+    return bool(is_premium) and (expires_at is None or expires_at > time.time())
+
+
+def _l1_get(user_id: str):
+    entry = _l1.get(user_id)
+    if not entry:
+        return None
+    expires_at, entitlement = entry
+    if expires_at < time.monotonic():
+        _l1.pop(user_id, None)
+        return None
+    _l1.move_to_end(user_id)
+    return entitlement
+
+
+def _l1_set(user_id: str, entitlement: dict):
+    _l1[user_id] = (time.monotonic() + L1_TTL, entitlement)
+    _l1.move_to_end(user_id)
+    while len(_l1) > L1_MAX_SIZE:
+        _l1.popitem(last=False)
+
+
+async def _load_entitlement(user_id: str) -> dict:
+    """{isPremium, premiumExpiresAt (epoch | None)}: L1 → Redis → users"""
+    entitlement = _l1_get(user_id)
+    if entitlement is not None:
+        return entitlement
+
+    if redis_client:
+        try:
+            raw = redis_client.get(REDIS_KEY.format(user_id))
+            if raw:
+                entitlement = json.loads(raw)
+        except Exception as e:
+            log.warning(f"[ENTITLEMENT] Redis read failed: {e}")
+
+    if entitlement is None:
+        user = await users_collection.find_one({"_id": ObjectId(user_id)}, ENTITLEMENT_PROJECTION) or {}
+        expires_at = user.get("premiumExpiresAt")
+        entitlement = {
+            "isPremium": bool(user.get("isPremium")),
+            "premiumExpiresAt": (
+                expires_at.replace(tzinfo=timezone.utc).timestamp() if isinstance(expires_at, datetime) else None
+            )
+        }
+        if redis_client:
+            try:
+                redis_client.setex(REDIS_KEY.format(user_id), REDIS_TTL, json.dumps(entitlement))
+            except Exception as e:
+                log.warning(f"[ENTITLEMENT] Redis write failed: {e}")
+
+    if _is_active(entitlement.get("isPremium"), entitlement.get("premiumExpiresAt")):
+        _l1_set(user_id, entitlement)
+    return entitlement
+
+
+async def has_premium(user_payload: Optional[dict]) -> bool:
+    if not user_payload:
+        return False
+    if _is_active(user_payload.get("isPremium"), user_payload.get("premiumExpiresAt")):
+        return True
+    user_id = user_payload.get("sub")
+    if not user_id or not ObjectId.is_valid(user_id):
+        return False
+    entitlement = await _load_entitlement(user_id)
+    return _is_active(entitlement["isPremium"], entitlement["premiumExpiresAt"])
@@ -0,0 +1,112 @@
+# app/services/moderation_service.py
+import asyncio
+import logging
+import unicodedata
+from typing import Dict, List, Tuple
+
+from app.core.database import moderation_terms_collection
+from app.utils.aho_corasick import AhoCorasick
+
+log = logging.getLogger(__name__)
+
+# Danh sách từ cấm nằm trong collection moderation_terms:
+#   {term: "...", action: "reject" | "hold", wholeWord: true (mặc định)}
+# Mỗi worker tự kiểm tra lại danh sách định kỳ và chỉ build lại automaton khi có thay đổi.
+RELOAD_INTERVAL = 60
+
+APPROVE = "approve"
+HOLD = "hold"
+REJECT = "reject"
+_SEVERITY = {HOLD: 1, REJECT: 2}
+
+
+def fold_text(text: str) -> str:
+    """Lowercase + bỏ dấu tiếng Việt ("Đồ Ngốc" -> "do ngoc")"""
+    text = unicodedata.normalize("NFD", text.lower().replace("đ", "d"))
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+class ModerationFilter:
+    def __init__(self):
+        self._matcher = None
+        self._rules: Dict[str, Tuple[str, bool]] = {}
+        self._signature = None
+        self._task = None
+
+    @property
+    def term_count(self) -> int:
+        return len(self._rules)
+
+    async def reload(self, force: bool = False) -> int:
+        """Đọc lại moderation_terms, build automaton mới rồi swap 1 lần"""
+        docs = await moderation_terms_collection.find(
+            {}, {"_id": 0, "term": 1, "action": 1, "wholeWord": 1}
+        ).to_list(None)
+
+        rules = {}
+        for doc in docs:
+            action = doc.get("action", HOLD)
+            term = fold_text(doc.get("term") or "").strip()
+            if not term or action not in _SEVERITY:
+                continue
+            current = rules.get(term)
+            # Trùng term sau khi bỏ dấu: giữ action nặng hơn
+            if not current or _SEVERITY[action] > _SEVERITY[current[0]]:
+                rules[term] = (action, doc.get("wholeWord", True))
+
+        signature = tuple(sorted(rules.items()))
+        if force or signature != self._signature:
+            self._matcher = AhoCorasick(rules) if rules else None
+            self._rules = rules
+            self._signature = signature
+            log.info(f"[MODERATION] Loaded {len(rules)} terms")
+        return len(rules)
+
+    def check(self, text: str) -> Tuple[str, List[str]]:
+        """1 lần duyệt text → (approve | hold | reject, các term bị match)"""
+        matcher, rules = self._matcher, self._rules
+        if not matcher:
+            return APPROVE, []
+
+        folded = fold_text(text)
+        decision = APPROVE
+        matched = set()
+        for start, term in matcher.finditer(folded):
+            action, whole_word = rules[term]
+            if whole_word:
+                end = start + len(term)
+                if (start > 0 and folded[start - 1].isalnum()) or (end < len(folded) and folded[end].isalnum()):
+                    continue
+            matched.add(term)
+            if decision == APPROVE or _SEVERITY[action] > _SEVERITY[decision]:
+                decision = action
+
+        return decision, sorted(matched)
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(RELOAD_INTERVAL)
+            try:
+                await self.reload()
+            except Exception as e:
+                log.error(f"[MODERATION] Reload failed: {e}")
+
+    async def start(self):
+        try:
+            await self.reload(force=True)
+        except Exception as e:
+            log.error(f"[MODERATION] Initial load failed: {e}")
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+moderation_filter = ModerationFilter()
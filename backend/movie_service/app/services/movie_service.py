@@ -3,10 +3,17 @@ from datetime import datetime, timedelta
 from fastapi import HTTPException
 from app.core.response import success, fail
 from app.core.database import (
-    movies_collection, books_collection, watching_progress_collection,
+    movies_collection, watching_progress_collection,
     ratings_collection, users_collection
 )
 from app.schemas.movie_dto import *
+from app.services.content_link_service import content_links
+from app.services.entitlement_service import has_premium
+from app.services.content_stats_service import (
+    get_content_stats, incr_views, rating_average, record_rating, summarize
+)
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import json
 import hashlib
 
@@ -50,6 +57,22 @@ async def get_movies(user_id: str | None, query: MovieFilterQuery):
 
     pipeline.append({"$match": match_stage})
 
+    # Sort + phân trang TRƯỚC $project để dùng được index (sau $project không còn totalViews/createdAt)
+    direction = 1 if query.order == "asc" else -1
+    sort_map = {
+        "latest": {"createdAt": direction},
+        "rating": {"rating": direction},
+        "releaseYear": {"releaseYear": direction},
+        "viewCount": {"totalViews": direction}
+    }
+    pipeline.append({"$sort": sort_map.get(query.sortBy, {"featuredRank": 1, "totalViews": -1})})
+
+    # Pagination
+    pipeline.extend([
+        {"$skip": (query.page - 1) * query.limit},
+        {"$limit": query.limit}
+    ])
+
     # Project đúng format
     project_stage = {
         "id": {"$toString": "$_id"},
@@ -68,23 +91,14 @@ async def get_movies(user_id: str | None, query: MovieFilterQuery):
     }
     pipeline.append({"$project": project_stage})
 
-    # Sort
-    sort_map = {
-        "latest": {"createdAt": -1},
-        "rating": {"rating": -1},
-        "viewCount": {"totalViews": -1}
-    }
-    pipeline.append({"$sort": sort_map.get(query.sortBy, {"featuredRank": 1, "totalViews": -1})})
-
-    # Pagination
-    pipeline.extend([
-        {"$skip": (query.page - 1) * query.limit},
-        {"$limit": query.limit}
-    ])
-
     movies = await movies_collection.aggregate(pipeline).to_list(query.limit)
     total = await movies_collection.count_documents(match_stage)
 
+    # Comment/rating counters cho cả trang: 1 query $in
+    stats = await get_content_stats(m["_id"] for m in movies)
+    for movie in movies:
+        movie["stats"] = stats.get(str(movie["_id"])) or summarize(None)
+
     return {
         "movies": movies,
         "pagination": {
@@ -134,27 +148,17 @@ async def search_content(
 
     movies = await movies_collection.aggregate(movie_pipeline).to_list(limit)
 
-    # Lấy danh sách book_id từ phim
-    book_ids = [m["adaptedFromBookId"] for m in movies if m.get("adaptedFromBookId")]
-
+    # Sách gốc của từng phim: resolve từ link index trong memory, không query books
+    await content_links.ensure_loaded()
     books = []
-    if book_ids:
-        books = await books_collection.find({
-            "_id": {"$in": book_ids},
-            "isActive": True,
-            "isDeleted": False
-        }).to_list(len(book_ids))
-        # Chuyển _id thành str
-        for b in books:
-            b["id"] = str(b["_id"])
-            del b["_id"]
-
-    # Gắn sách vào phim tương ứng
-    book_map = {str(b["id"]): b for b in books}
+    seen = set()
     for movie in movies:
-        book_id = movie.get("adaptedFromBookId")
-        if book_id and str(book_id) in book_map:
-            movie["book"] = book_map[str(book_id)]
+        book = content_links.book_for_movie(movie["_id"])
+        if book:
+            movie["book"] = book
+            if book["id"] not in seen:
+                seen.add(book["id"])
+                books.append(book)
         # Xóa field phụ
         movie.pop("adaptedFromBookId", None)
 
@@ -174,7 +178,8 @@ async def search_content(
     }
 
 # 3. GET MOVIE DETAIL
-async def get_movie_detail(movie_id: str, user_id: Optional[str]):
+async def get_movie_detail(movie_id: str, user_payload: Optional[dict]):
+    user_id = user_payload["sub"] if user_payload else None
     movie = await movies_collection.find_one({
         "_id": ObjectId(movie_id),
         "isActive": True,
@@ -183,20 +188,12 @@ async def get_movie_detail(movie_id: str, user_id: Optional[str]):
     if not movie:
         raise HTTPException(404, "Movie not found")
 
-    # Allow all users (guest and authenticated) to VIEW movie details
-    # Only block when they try to WATCH (handled in start_watching endpoint)
-    # So we remove this premium check from get_movie_detail
-    # if movie.get("isPremium") and user_id:
-    #     user = await users_collection.find_one({"_id": ObjectId(user_id)})
-    #     if not user or not user.get("isPremium"):
-    #         raise HTTPException(403, "Premium content")
-
-    book = None
-    if movie.get("adaptedFromBookId"):
-        book = await books_collection.find_one(
-            {"_id": movie["adaptedFromBookId"]},
-            {"title": 1, "author": 1}
-        )
+    # Ai cũng xem được thông tin phim; phim premium chỉ trả videoUrl cho user có quyền.
+    # Quyền lấy từ claim trong token (không tốn round trip), chỉ tra cache khi claim nói "không"
+    can_watch = not movie.get("isPremium") or await has_premium(user_payload)
+
+    await content_links.ensure_loaded()
+    book = content_links.book_for_movie(movie["_id"])
 
     progress = None
     if user_id:
@@ -218,7 +215,8 @@ async def get_movie_detail(movie_id: str, user_id: Optional[str]):
         "description": movie["description"],
         "thumbnailUrl": movie["thumbnailUrl"],
         "bannerUrl": movie.get("bannerUrl"),
-        "videoUrl": movie["videoUrl"],
+        "videoUrl": movie["videoUrl"] if can_watch else None,
+        "canWatch": can_watch,
         "duration": movie["duration"],
         "releaseYear": movie["releaseYear"],
         "director": movie.get("director"),
@@ -230,25 +228,16 @@ async def get_movie_detail(movie_id: str, user_id: Optional[str]):
         "totalRatings": movie["totalRatings"],
         "isPremium": movie["isPremium"],
         "book": {
-            "id": str(book["_id"]),
+            "id": book["id"],
             "title": book["title"],
-            "author": book["author"]
+            "author": book.get("author")
         } if book else None,
         "userProgress": progress
     }
 
 # 4. UPDATE PROGRESS – FIX REDIS + totalSeconds tự động
 async def update_progress(movie_id: str, user_id: str, data: WatchProgressDTO):
-    cache = await get_redis()
-    if cache:
-        rate_key = f"progress_rate:{user_id}:{movie_id}"
-        try:
-            if await cache.get(rate_key):
-                raise HTTPException(429, "Too many requests")
-            await cache.setex(rate_key, 1, "1")
-        except Exception as e:
-            print(f"Redis rate limit error: {e}")  # Không crash
-
+    # Giới hạn tần suất do @rate_limit ở route đảm nhiệm (token bucket, burst nhỏ)
     movie = await movies_collection.find_one({"_id": ObjectId(movie_id)})
     if not movie:
         raise HTTPException(404, "Movie not found")
@@ -274,6 +263,7 @@ async def update_progress(movie_id: str, user_id: str, data: WatchProgressDTO):
             {"_id": ObjectId(movie_id)},
             {"$inc": {"totalViews": 1}}
         )
+        await incr_views("movie", movie_id)
         view_counted = True
 
     return {
@@ -287,19 +277,23 @@ async def rate_movie(movie_id: str, user_id: str, data: RateMovieDTO):
     movie_oid = ObjectId(movie_id)
     user_oid = ObjectId(user_id)
 
-    await ratings_collection.update_one(
-        {"userId": user_oid, "contentType": "movie", "contentId": movie_oid},
-        {"$set": {"rating": data.rating, "updatedAt": datetime.utcnow()}},
-        upsert=True
-    )
-
-    stats = await ratings_collection.aggregate([
-        {"$match": {"contentType": "movie", "contentId": movie_oid}},
-        {"$group": {"_id": None, "avg": {"$avg": "$rating"}, "count": {"$sum": 1}}}
-    ]).to_list(1)
+    rating_filter = {"userId": user_oid, "contentType": "movie", "contentId": movie_oid}
+    rating_update = {"$set": {"rating": data.rating, "updatedAt": datetime.utcnow()}}
+    try:
+        previous = await ratings_collection.find_one_and_update(
+            rating_filter, rating_update, upsert=True, return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        # Upsert song song (double-submit) đã insert trước → update lại để lấy đúng rating cũ,
+        # tránh cả 2 request cùng thấy previous=None và $inc ratingCount 2 lần
+        previous = await ratings_collection.find_one_and_update(
+            rating_filter, rating_update, return_document=ReturnDocument.BEFORE
+        )
 
-    avg_rating = round(stats[0]["avg"], 1) if stats else 0
-    total = stats[0]["count"] if stats else 0
+    # Cập nhật counters bằng $inc thay vì $group lại toàn bộ ratings
+    stats = await record_rating("movie", movie_oid, data.rating, previous["rating"] if previous else None)
+    avg_rating = rating_average(stats)
+    total = stats.get("ratingCount", 0) if stats else 0
 
     await movies_collection.update_one(
         {"_id": movie_oid},
@@ -312,16 +306,13 @@ async def rate_movie(movie_id: str, user_id: str, data: RateMovieDTO):
         "totalRatings": total
     }
 # 4. Start watching
-async def start_watching(movie_id: str, user_id: str):
+async def start_watching(movie_id: str, user_payload: dict):
+    user_id = user_payload["sub"]
     movie = await movies_collection.find_one({"_id": ObjectId(movie_id)})
     if not movie:
         raise HTTPException(404, "Movie not found")
-    # Allow all authenticated users to watch premium content
-    # Premium check disabled - authentication is sufficient
-    # if movie.get("isPremium"):
-    #     user = await users_collection.find_one({"_id": ObjectId(user_id)})
-    #     if not user or not user.get("isPremium"):
-    #         raise HTTPException(403, "Premium required")
+    if movie.get("isPremium") and not await has_premium(user_payload):
+        raise HTTPException(403, "Premium required")
 
     prog = await watching_progress_collection.find_one(
         {"userId": ObjectId(user_id), "movieId": ObjectId(movie_id)},
@@ -338,11 +329,12 @@ async def start_watching(movie_id: str, user_id: str):
 # app/services/movie_service.py
 async def get_trending(page: int, limit: int, user_id: Optional[str] = None):
     cache = await get_redis()
-    key = cache_key("trending", page=page, limit=limit, user_id=user_id or "guest")
+    # Kết quả không phụ thuộc user → 1 bản cache chung cho mọi người
+    key = cache_key("trending", page=page, limit=limit)
 
     if cache:
         try:
-            cached = await cache.get(key)
+            cached = cache.get(key)
             if cached:
                 return json.loads(cached)
         except Exception as e:
@@ -376,7 +368,7 @@ async def get_trending(page: int, limit: int, user_id: Optional[str] = None):
 
     if cache:
         try:
-            await cache.setex(key, 300, json.dumps(result))  # 5 phút
+            cache.setex(key, 300, json.dumps(result, default=str))  # 5 phút
         except Exception:
             pass
 
@@ -502,7 +494,7 @@ async def get_random_movies(limit: int = 5):
 
     if cache:
         try:
-            cached = await cache.get(cache_key_str)
+            cached = cache.get(cache_key_str)
             if cached:
                 print(f"[RANDOM MOVIES] Cache hit: {cache_key_str}")
                 return json.loads(cached)
@@ -545,7 +537,7 @@ async def get_random_movies(limit: int = 5):
 
     if cache:
         try:
-            await cache.setex(cache_key_str, 300, json.dumps(movies))  # Cache for 5 minutes
+            cache.setex(cache_key_str, 300, json.dumps(movies, default=str))  # Cache for 5 minutes
         except Exception:
             pass
 
@@ -558,7 +550,7 @@ async def get_movie_of_week():
 
     if cache:
         try:
-            cached = await cache.get(cache_key_str)
+            cached = cache.get(cache_key_str)
             if cached:
                 return json.loads(cached)
         except Exception as e:
@@ -593,7 +585,7 @@ async def get_movie_of_week():
         movie = result[0]
         if cache:
             try:
-                await cache.setex(cache_key_str, 3600, json.dumps(movie))  # Cache for 1 hour
+                cache.setex(cache_key_str, 3600, json.dumps(movie, default=str))  # Cache for 1 hour
             except Exception:
                 pass
         return movie
@@ -0,0 +1,102 @@
+# app/services/user_summary_service.py
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable
+
+from bson import ObjectId
+from app.core.database import users_collection
+from app.core.token_blacklist import redis_client
+
+log = logging.getLogger(__name__)
+
+# Chỉ những field cần để render tên + avatar, KHÔNG lấy cả user document
+SUMMARY_PROJECTION = {"displayName": 1, "username": 1, "avatar": 1}
+
+# Key dùng chung với user_service.update_profile (xoá khi user đổi profile)
+REDIS_KEY = "user_summary:{}"
+REDIS_TTL = 600  # 10 phút
+
+# L1 trong process: TTL ngắn vì không nhận được invalidation từ user_service
+L1_TTL = 30
+L1_MAX_SIZE = 5000
+
+_l1: "OrderedDict[str, tuple]" = OrderedDict()
+
+
+def _l1_get(user_id: str):
+    entry = _l1.get(user_id)
+    if not entry:
+        return None
+    expires_at, summary = entry
+    if expires_at < time.monotonic():
+        _l1.pop(user_id, None)
+        return None
+    _l1.move_to_end(user_id)
+    return summary
+
+
+def _l1_set(user_id: str, summary: dict):
+    _l1[user_id] = (time.monotonic() + L1_TTL, summary)
+    _l1.move_to_end(user_id)
+    while len(_l1) > L1_MAX_SIZE:
+        _l1.popitem(last=False)
+
+
+async def get_user_summaries(user_ids: Iterable[str]) -> Dict[str, dict]:
+    """
+    Batched lookup {user_id: {displayName, username, avatar}}
+    L1 → Redis MGET → 1 query $in cho phần còn thiếu.
+    User không tồn tại sẽ không có trong kết quả.
+    """
+    result = {}
+    missing = []
+    for user_id in dict.fromkeys(user_ids):
+        summary = _l1_get(user_id)
+        if summary is not None:
+            result[user_id] = summary
+        elif ObjectId.is_valid(user_id):
+            missing.append(user_id)
+
+    if missing and redis_client:
+        try:
+            cached = redis_client.mget([REDIS_KEY.format(user_id) for user_id in missing])
+            still_missing = []
+            for user_id, raw in zip(missing, cached):
+                if raw:
+                    summary = json.loads(raw)
+                    result[user_id] = summary
+                    _l1_set(user_id, summary)
+                else:
+                    still_missing.append(user_id)
+            missing = still_missing
+        except Exception as e:
+            log.warning(f"[USER_SUMMARY] Redis read failed: {e}")
+
+    if not missing:
+        return result
+
+    found = {}
+    cursor = users_collection.find({"_id": {"$in": [ObjectId(u) for u in missing]}}, SUMMARY_PROJECTION)
+    async for user in cursor:
+        found[str(user["_id"])] = {
+            "displayName": user.get("displayName"),
+            "username": user.get("username"),
+            "avatar": user.get("avatar")
+        }
+
+    for user_id, summary in found.items():
+        result[user_id] = summary
+        _l1_set(user_id, summary)
+
+    if found and redis_client:
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for user_id, summary in found.items():
+                pipe.setex(REDIS_KEY.format(user_id), REDIS_TTL, json.dumps(summary))
+            pipe.execute()
+        except Exception as e:
+            log.warning(f"[USER_SUMMARY] Redis write failed: {e}")
+
+    return result
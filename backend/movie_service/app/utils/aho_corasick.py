@@ -0,0 +1,54 @@
+# aho_corasick.py
+from collections import deque
+from typing import Iterable, Iterator, Tuple
+
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher.
+    Build: O(tổng độ dài pattern), search: 1 lần duyệt text, O(len(text) + số match)
+    bất kể có bao nhiêu pattern.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        for pattern in patterns:
+            if not pattern:
+                continue
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(pattern)
+
+        # BFS để tính failure link; node ở độ sâu 1 luôn fail về root
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Yield (start, pattern) cho mọi lần xuất hiện, kể cả chồng lên nhau"""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for pattern in out[node]:
+                yield i - len(pattern) + 1, pattern
@@ -0,0 +1,72 @@
+"""
+Script to move embedded comment reports into the comment_reports collection.
+
+Comments used to $push every report into a `reports` array on the comment
+document. This script:
+- copies each embedded report into comment_reports (one per user per comment)
+- sets `reportCount` / `lastReportedAt` on the comment
+- removes the `reports` array
+
+Safe to run more than once. Run this from the movie_service directory:
+python migrate_comment_reports.py
+"""
+
+import os
+import sys
+from pymongo import MongoClient, ASCENDING
+from pymongo.errors import DuplicateKeyError
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB connection
+MONGODB_URL = os.getenv('MONGODB_URL', 'mongodb://localhost:27017')
+DATABASE_NAME = os.getenv('DATABASE_NAME', 'ONLINE_ENTERTAINMENT_PLATFORM')
+
+def connect_to_db():
+    """Connect to MongoDB database"""
+    try:
+        client = MongoClient(MONGODB_URL)
+        db = client[DATABASE_NAME]
+        print(f"✅ Connected to MongoDB: {DATABASE_NAME}")
+        return db
+    except Exception as e:
+        print(f"❌ Failed to connect to MongoDB: {e}")
+        sys.exit(1)
+
+def migrate_comment_reports(db):
+    comments = db['comments']
+    reports = db['comment_reports']
+    reports.create_index([("commentId", ASCENDING), ("userId", ASCENDING)], unique=True)
+
+    migrated_comments = 0
+    migrated_reports = 0
+    for comment in comments.find({"reports": {"$exists": True}}, {"reports": 1}):
+        last_reported_at = None
+        for report in comment.get("reports") or []:
+            try:
+                reports.insert_one({
+                    "commentId": comment["_id"],
+                    "userId": report.get("userId"),
+                    "reason": report.get("reason"),
+                    "createdAt": report.get("createdAt")
+                })
+                migrated_reports += 1
+            except DuplicateKeyError:
+                pass  # Same user reported twice, keep the first one
+            if report.get("createdAt") and (not last_reported_at or report["createdAt"] > last_reported_at):
+                last_reported_at = report["createdAt"]
+
+        report_count = reports.count_documents({"commentId": comment["_id"]})
+        update = {"$unset": {"reports": ""}, "$set": {"reportCount": report_count}}
+        if last_reported_at:
+            update["$set"]["lastReportedAt"] = last_reported_at
+        comments.update_one({"_id": comment["_id"]}, update)
+        migrated_comments += 1
+
+    print(f"✅ Migrated {migrated_reports} reports from {migrated_comments} comments")
+
+if __name__ == "__main__":
+    db = connect_to_db()
+    migrate_comment_reports(db)
@@ -12,6 +12,9 @@ class Settings(BaseSettings):
     JWT_ACCESS_EXPIRE_MINUTES: int = Field(default=15, env="JWT_ACCESS_EXPIRE_MINUTES")
     JWT_REFRESH_EXPIRE_DAYS: int = Field(default=7, env="JWT_REFRESH_EXPIRE_DAYS")
     REDIS_URL: str = Field(..., env="REDIS_URL")
+    # Thread pool hash password: số worker (mặc định = số core) + số job tối đa đang chờ/chạy, vượt → 503
+    HASH_POOL_WORKERS: int = Field(default=os.cpu_count() or 1, env="HASH_POOL_WORKERS")
+    HASH_POOL_MAX_PENDING: int = Field(default=64, env="HASH_POOL_MAX_PENDING")
     PORT: int = Field(default=8002, env="PORT")
     model_config = {
         "env_file": ".env",
@@ -1,8 +1,49 @@
 from app.core.config import get_settings
 from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.circuit_breaker import CircuitBreaker
+from pymongo import monitoring, IndexModel, ASCENDING, DESCENDING
+import logging
+
+log = logging.getLogger(__name__)
 
 settings = get_settings()
-client = AsyncIOMotorClient(settings.MONGO_URI)
+
+# Circuit breaker cho Mongo: lỗi kết nối / timeout (command event có errtype, heartbeat fail)
+# → failure; command thành công → success. MongoGuardMiddleware chặn request khi breaker open.
+# serverSelectionTimeoutMS mặc định 30s → hạ xuống để request không treo nửa phút khi Mongo rớt.
+MONGO_SERVER_SELECTION_TIMEOUT_MS = 5000
+_CONNECTION_ERRORS = {"AutoReconnect", "NetworkTimeout", "ConnectionFailure", "WaitQueueTimeoutError"}
+mongo_breaker = CircuitBreaker("mongo")
+
+
+class _BreakerCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_breaker.record_success()
+
+    def failed(self, event):
+        if event.failure.get("errtype") in _CONNECTION_ERRORS:
+            mongo_breaker.record_failure()
+
+
+class _BreakerHeartbeatListener(monitoring.ServerHeartbeatListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        mongo_breaker.record_failure()
+
+
+client = AsyncIOMotorClient(
+    settings.MONGO_URI,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    event_listeners=[_BreakerCommandListener(), _BreakerHeartbeatListener()]
+)
 db = client[settings.DATABASE_NAME]
 
 users_collection = db.get_collection("users")
@@ -10,4 +51,19 @@ transactions_collection = db.get_collection("transactions")
 notifications_collection = db.get_collection("notifications")
 watching_progress_collection = db.get_collection("watching_progress")
 movies_collection = db.get_collection("movies")
-premium_subscriptions_collection = db.get_collection("premiumSubscriptions")
\ No newline at end of file
+premium_subscriptions_collection = db.get_collection("premiumSubscriptions")
+
+# Index cho các query nóng của service (idempotent, chạy lúc startup)
+WATCHING_PROGRESS_INDEXES = [
+    IndexModel([("userId", ASCENDING), ("viewedAt", DESCENDING)]),
+]
+
+async def ensure_indexes():
+    """Create the indexes the service queries rely on"""
+    for collection, indexes in (
+        (watching_progress_collection, WATCHING_PROGRESS_INDEXES),
+    ):
+        try:
+            await collection.create_indexes(indexes)
+        except Exception as e:
+            log.error(f"[DB] Failed to create indexes on {collection.name}: {e}")
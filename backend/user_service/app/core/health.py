@@ -0,0 +1,84 @@
+# app/core/health.py
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Tuple
+
+log = logging.getLogger(__name__)
+
+# /livez, /readyz không bao giờ chạm dependency trên request path: DependencyProber
+# ping Mongo / Redis mỗi PROBE_INTERVAL giây ở background, endpoint chỉ đọc kết quả.
+PROBE_INTERVAL = 5
+PROBE_TIMEOUT = 2
+# Kết quả cũ hơn 3 chu kỳ (loop bị chặn, task chết) → coi như chưa biết → not ready
+STALE_AFTER = PROBE_INTERVAL * 3
+
+
+class DependencyProber:
+    def __init__(self):
+        # name -> (check, required); dependency không required (Redis) hỏng chỉ làm "degraded"
+        self._checks: Dict[str, Tuple[Callable[[], Awaitable], bool]] = {}
+        self._results: Dict[str, dict] = {}
+        self._task = None
+        self.started_at = time.time()
+
+    def register(self, name: str, check: Callable[[], Awaitable], required: bool = True):
+        self._checks[name] = (check, required)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _probe(self, name: str, check: Callable[[], Awaitable]):
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(check(), PROBE_TIMEOUT)
+            status, error = "up", None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            status, error = "down", f"{type(e).__name__}: {e}"[:200]
+        previous = self._results.get(name, {}).get("status")
+        if previous and previous != status:
+            log.warning(f"[HEALTH] {name} {previous} -> {status}")
+        self._results[name] = {
+            "status": status,
+            "latencyMs": round((time.perf_counter() - started) * 1000, 1),
+            "checkedAt": time.time(),
+            "error": error
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.gather(*[self._probe(name, check) for name, (check, _) in self._checks.items()])
+            await asyncio.sleep(PROBE_INTERVAL)
+
+    def readiness(self) -> Tuple[bool, dict]:
+        now = time.time()
+        dependencies, ready, degraded = {}, True, False
+        for name, (_, required) in self._checks.items():
+            result = self._results.get(name)
+            if result is None:
+                result = {"status": "unknown"}
+            elif now - result["checkedAt"] > STALE_AFTER:
+                result = {**result, "status": "stale"}
+            dependencies[name] = {**result, "required": required}
+            if result["status"] != "up":
+                if required:
+                    ready = False
+                else:
+                    degraded = True
+        status = "ready" if ready and not degraded else "degraded" if ready else "not_ready"
+        return ready, {"status": status, "dependencies": dependencies}
+
+
+prober = DependencyProber()
@@ -6,12 +6,20 @@ from app.core.limiter import limiter
 from slowapi.middleware import SlowAPIMiddleware
 from slowapi.errors import RateLimitExceeded
 from app.core.config import get_settings
-from app.core.database import db, users_collection, transactions_collection, notifications_collection, watching_progress_collection, movies_collection, premium_subscriptions_collection
+from app.core.database import db, users_collection, transactions_collection, notifications_collection, watching_progress_collection, movies_collection, premium_subscriptions_collection, ensure_indexes, mongo_breaker
+from app.core.circuit_breaker import breaker_stats
+from app.middlewares.dependency_guard import MongoGuardMiddleware
+from app.core.health import prober
+from app.utils.security import hash_pool
 import asyncio
+from app.core.token_blacklist import revocations, ping_redis
 
 app = FastAPI(title="User Service")
 app.state.limiter = limiter
 
+# Mongo breaker open → 503 ngay (trong CORS để response vẫn có header CORS)
+app.add_middleware(MongoGuardMiddleware, breaker=mongo_breaker)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -30,6 +38,22 @@ app.add_middleware(SlowAPIMiddleware)
 
 # Fix prefix to match routes - use /api/user to match frontend expectations
 app.include_router(user_routes.router, prefix="/api/user")
+
+@app.on_event("startup")
+async def startup():
+    # /readyz đọc kết quả probe, không ping dependency trên request path
+    prober.register("mongo", lambda: db.command("ping"))
+    prober.register("redis", ping_redis, required=False)
+    prober.start()
+    await ensure_indexes()
+    revocations.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await prober.stop()
+    await revocations.stop()
+    hash_pool.shutdown()
+
 @app.exception_handler(RateLimitExceeded)
 
 async def http_exception_handler(request: Request, exc: HTTPException):
@@ -51,7 +75,20 @@ async def health_check(request: Request):
             "status": "healthy",
             "message": "MongoDB connected!",
             "sample_doc_exists": sample_doc is not None,
-            "collections": collection_list
+            "collections": collection_list,
+            "passwordHashing": hash_pool.stats(),
+            "circuitBreakers": breaker_stats()
         }
     except Exception as e:
-        raise HTTPException(status_code=503, detail=f"Database connection failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=503, detail=f"Database connection failed: {str(e)}")
+
+@app.get("/livez")
+async def livez():
+    # Chỉ xác nhận process + event loop còn phục vụ request, không chạm dependency
+    return {"status": "ok", "service": "user_service"}
+
+@app.get("/readyz")
+async def readyz():
+    ready, report = prober.readiness()
+    report["circuitBreakers"] = breaker_stats()
+    return JSONResponse(status_code=200 if ready else 503, content=report)
@@ -0,0 +1,49 @@
+# app/middlewares/dependency_guard.py
+from typing import Iterable
+
+from fastapi.responses import JSONResponse
+from pymongo.errors import ConnectionFailure
+from app.core.circuit_breaker import CircuitBreaker
+
+
+class MongoGuardMiddleware:
+    """
+    Mongo breaker open → trả 503 + Retry-After ngay thay vì để từng request chờ
+    serverSelectionTimeoutMS. Half-open: 1 request đi qua làm probe.
+    Lỗi kết nối (kể cả server selection timeout, không sinh command event) được tính vào breaker.
+    """
+
+    def __init__(self, app, breaker: CircuitBreaker, exempt: Iterable[str] = ("/health", "/livez", "/readyz")):
+        self.app = app
+        self.breaker = breaker
+        self.exempt = set(exempt)
+
+    async def _unavailable(self, scope, receive, send):
+        response = JSONResponse(
+            status_code=503,
+            content={"success": False, "error": "Database temporarily unavailable"},
+            headers={"Retry-After": str(self.breaker.retry_after())}
+        )
+        await response(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"] in self.exempt:
+            return await self.app(scope, receive, send)
+        if not self.breaker.allow():
+            return await self._unavailable(scope, receive, send)
+
+        started = False
+
+        async def send_wrapper(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except ConnectionFailure:
+            self.breaker.record_failure()
+            if started:
+                raise
+            await self._unavailable(scope, receive, send)
@@ -1,3 +1,6 @@
+import hashlib
+import time
+from collections import OrderedDict
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
@@ -6,13 +9,27 @@ from app.core.token_blacklist import is_blacklisted
 from datetime import datetime
 security = HTTPBearer()
 
+# Payload đã verify chữ ký, key = sha256(token), giữ tới exp → request sau dùng lại
+# cùng token không phải decode + verify HMAC lần nữa (mỗi worker 1 bản, LRU)
+MAX_VERIFIED_TOKENS = 10000
+_verified_tokens: "OrderedDict[bytes, dict]" = OrderedDict()
+
+def _verify_signature(token: str) -> dict:
+    key = hashlib.sha256(token.encode()).digest()
+    payload = _verified_tokens.get(key)
+    if payload is not None and payload.get("exp", 0) > time.time():
+        _verified_tokens.move_to_end(key)
+        return dict(payload)
+    _verified_tokens.pop(key, None)
+    payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+    _verified_tokens[key] = payload
+    if len(_verified_tokens) > MAX_VERIFIED_TOKENS:
+        _verified_tokens.popitem(last=False)
+    return dict(payload)
+
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
-        payload = jwt.decode(
-            credentials.credentials,
-            settings.JWT_SECRET,
-            algorithms=[settings.JWT_ALGORITHM]
-        )
+        payload = _verify_signature(credentials.credentials)
         jti = payload.get("jti")
         if jti and is_blacklisted(jti):
             raise HTTPException(status_code=401, detail={"success": False, "error": "Token revoked"})
@@ -1,18 +1,47 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from bson import ObjectId
 from app.core.database import (
     users_collection, transactions_collection, notifications_collection,
     watching_progress_collection, movies_collection, premium_subscriptions_collection
 )
-from app.utils.security import verify_password, hash_password
+from app.utils.security import verify_password_async, hash_password_async
 from app.core.response import fail # Giả định fail() là hàm tạo Exception/HTTPException
+from app.core.token_blacklist import redis_client
 from typing import Optional, Dict, Any
 from fastapi import HTTPException
+import json
 import logging
 import uuid
 logging.basicConfig(level=logging.DEBUG)
 log = logging.getLogger(__name__)
 
+# Cache {displayName, username, avatar} mà movie_service (comments) đọc qua
+USER_SUMMARY_KEY = "user_summary:{}"
+
+def invalidate_user_summary(user_id: str):
+    if not redis_client:
+        return
+    try:
+        redis_client.delete(USER_SUMMARY_KEY.format(user_id))
+    except Exception as e:
+        log.warning(f"[USER_SUMMARY] Failed to invalidate {user_id}: {e}")
+
+
+# Cache quyền premium mà movie_service đọc khi claim trong token đã cũ (vd. vừa nâng cấp)
+ENTITLEMENT_KEY = "entitlement:{}"
+ENTITLEMENT_TTL = 300
+
+def refresh_entitlement(user_id: str, expires_at: datetime):
+    if not redis_client:
+        return
+    try:
+        redis_client.setex(ENTITLEMENT_KEY.format(user_id), ENTITLEMENT_TTL, json.dumps({
+            "isPremium": True,
+            "premiumExpiresAt": expires_at.replace(tzinfo=timezone.utc).timestamp()
+        }))
+    except Exception as e:
+        log.warning(f"[ENTITLEMENT] Failed to refresh {user_id}: {e}")
+
 
 
 
@@ -85,6 +114,8 @@ async def update_profile(
 
     if result.matched_count == 0:
         raise ValueError("User not found")
+    if update_data:
+        invalidate_user_summary(user_id)
 
     # Lấy user mới nhất
     updated_user = await users_collection.find_one({"_id": ObjectId(user_id)})
@@ -102,13 +133,14 @@ async def change_password(user_id: str, current_password: str, new_password: str
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if not verify_password(current_password, user["passwordHash"]):
+    if not await verify_password_async(current_password, user["passwordHash"]):
         raise HTTPException(status_code=401, detail="Current password incorrect")
 
-    if verify_password(new_password, user["passwordHash"]):
+    # current_password đã khớp hash → so chuỗi là đủ, không cần verify pbkdf2 lần 2
+    if new_password == current_password:
         raise HTTPException(status_code=400, detail="New password same as old")
 
-    new_hash = hash_password(new_password)
+    new_hash = await hash_password_async(new_password)
     await users_collection.update_one(
         {"_id": ObjectId(user_id)},
         {"$set": {"passwordHash": new_hash, "updatedAt": datetime.utcnow()}}
@@ -285,6 +317,8 @@ async def upgrade_premium(user_id: str, duration: int, amount: int):
             }
         }
     )
+    # Ghi đè (không chỉ xoá) → lần check tiếp theo ở movie_service không phải đọc lại users
+    refresh_entitlement(user_id, expiry_date)
 
     # Create transaction record with error handling
     # Generate unique idempotencyKey to avoid duplicate key errors
@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 from jose import jwt
 from app.core.config import settings
 import uuid
+from app.utils.hash_pool import HashPool
 # --- ĐÃ CHỈNH SỬA ---
 # Chuyển sang pbkdf2_sha256 để tránh lỗi thư viện bcrypt và giới hạn 72 byte.
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
@@ -23,6 +24,15 @@ def verify_password(password: str, hashed: str) -> bool:
     return pwd_context.verify(password, hashed)
     # --- END CHỈNH SỬA ---
 
+# Handler async dùng 2 hàm dưới: pbkdf2 chạy trên hash_pool, không block event loop
+hash_pool = HashPool(settings.HASH_POOL_WORKERS, settings.HASH_POOL_MAX_PENDING)
+
+async def hash_password_async(password: str) -> str:
+    return await hash_pool.run(hash_password, password)
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await hash_pool.run(verify_password, password, hashed)
+
 def validate_password(password: str) -> bool:
     # Min 8 chars, 1 uppercase, 1 number, 1 special char
     pattern = r'^(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&]).{8,}$'
@@ -93,7 +93,7 @@ export const OTPForm = ({ email, onBack, onClose, mode = 'register', onSuccess }
                     return
                 }
 
-                await resetPassword(otpCode, newPassword)
+                await resetPassword(email, otpCode, newPassword)
                 setSuccessMessage('Password reset successfully! You can now login with your new password.')
 
                 // Wait 2 seconds before redirecting to login
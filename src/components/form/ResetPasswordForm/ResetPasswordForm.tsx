@@ -55,8 +55,9 @@ export const ResetPasswordForm = ({ email, onBackToForgotPassword, onSuccess }:
 
         try {
             setLoading(true)
-            // Combine OTP and email as token for backend
+            // OTP is stored per email on the backend
             await authService.resetPassword({
+                email,
                 token: otp, // Backend expects OTP as token
                 newPassword
             })
@@ -106,11 +106,11 @@ export const useAuth = () => {
 		}
 	}, [])
 
-	const resetPassword = useCallback(async (token: string, newPassword: string) => {
+	const resetPassword = useCallback(async (email: string, token: string, newPassword: string) => {
 		try {
 			setLoading(true)
 			setError(null)
-			await authService.resetPassword({ token, newPassword })
+			await authService.resetPassword({ email, token, newPassword })
 		} catch (err) {
 			const parsedError = parseApiError(err)
 			const message = getUserFriendlyErrorMessage(parsedError)
@@ -9,6 +9,7 @@ const ResetPasswordPage = () => {
 	const navigate = useNavigate()
 	const [searchParams] = useSearchParams()
 	const token = searchParams.get('token')
+	const email = searchParams.get('email') ?? ''
 
 	const [formData, setFormData] = useState({
 		newPassword: '',
@@ -70,6 +71,7 @@ const ResetPasswordPage = () => {
 		try {
 			setLoading(true)
 			await authService.resetPassword({
+				email,
 				token,
 				newPassword: formData.newPassword
 			})
@@ -90,7 +90,7 @@ export const MovieDetailPage = () => {
 		originalTitle: movie.title,
 		posterUrl: movie.thumbnailUrl,
 		coverUrl: movie.bannerUrl || movie.thumbnailUrl,
-		trailerUrl: movie.videoUrl,
+		trailerUrl: movie.videoUrl ?? "",
 		isPremium: movie.isPremium
 	}
 
@@ -83,6 +83,19 @@ export const MovieWatch = () => {
 		)
 	}
 
+	if (!movie.videoUrl) {
+		return (
+			<Layout>
+				<div className="watch-movie-page">
+					<div className="error-message">
+						<h2>This movie requires a Premium subscription</h2>
+						<button onClick={() => window.history.back()}>Go Back</button>
+					</div>
+				</div>
+			</Layout>
+		)
+	}
+
 	// Prepare movie data
 	const movieData = {
 		id: movie.id,
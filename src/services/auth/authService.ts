@@ -56,6 +56,7 @@ export interface ForgotPasswordData {
 }
 
 export interface ResetPasswordData {
+	email: string
 	token: string
 	newPassword: string
 }
@@ -50,7 +50,8 @@ export interface Movie extends Omit<ContentCard, 'id'> {
 export interface MovieDetail extends Movie {
 	totalRatings: number
 	description: string
-	videoUrl: string
+	videoUrl: string | null
+	canWatch?: boolean
 	thumbnailUrl: string
 	bannerUrl?: string
 	director: string